@@ -0,0 +1,131 @@
+# benchmarks/collision_bench.py
+#
+# Collision time per tick against body count at a fixed density: the grid
+# broadphase + batched narrowphase (contact_pairs), the whole
+# collision_system tick on both worlds, and testing every pair of boxes at
+# once with numpy (O(n^2), skipped for big counts). Time per body staying
+# flat as the count grows is the near-linear scaling.
+#
+#   python -m benchmarks.collision_bench
+#   python -m benchmarks.collision_bench --counts 1000 10000 50000 --density 0.3
+
+import argparse
+import math
+import random
+import time
+
+import numpy as np
+
+from shared.ecs import World, WorldConfig
+from shared.archetype import ArchetypeWorld
+from shared.player import create_player
+from shared.systems.collision_system import collision_system, contact_pairs
+
+BODY_SIZE = 32.0
+WORLDS = {"dict": World, "archetype": ArchetypeWorld}
+
+
+def world_side(count: int, density: float) -> float:
+    """Square world where bodies cover density of the area"""
+    return math.sqrt(count * BODY_SIZE * BODY_SIZE / density)
+
+
+def random_boxes(count: int, side: float, seed: int):
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(0, side - BODY_SIZE, count)
+    y = rng.uniform(0, side - BODY_SIZE, count)
+    size = np.full(count, BODY_SIZE)
+    return x, y, size, size.copy()
+
+
+def pairs_all(x, y, width, height):
+    """Every pair tested, one row of the n x n overlap matrix at a time"""
+    first = []
+    second = []
+    for i in range(len(x) - 1):
+        rx = x[i + 1 :]
+        ry = y[i + 1 :]
+        overlap_x = np.minimum(x[i] + width[i], rx + width[i + 1 :]) > np.maximum(
+            x[i], rx
+        )
+        overlap_y = np.minimum(y[i] + height[i], ry + height[i + 1 :]) > np.maximum(
+            y[i], ry
+        )
+        hit = overlap_x & overlap_y
+        found = np.flatnonzero(hit) + i + 1
+        first.append(np.full(len(found), i))
+        second.append(found)
+    return np.concatenate(first), np.concatenate(second)
+
+
+def build_world(kind: str, count: int, side: float, seed: int):
+    rng = random.Random(seed)
+    world = WORLDS[kind]()
+    world.set_resource(WorldConfig(width=side, height=side))
+    for player_id in range(1, count + 1):
+        create_player(
+            world,
+            rng.uniform(0, side - BODY_SIZE),
+            rng.uniform(0, side - BODY_SIZE),
+            player_id,
+        )
+    return world
+
+
+def best_of(repeat: int, func, *args) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="collision broadphase scaling")
+    parser.add_argument(
+        "--counts", type=int, nargs="+", default=[1_000, 5_000, 20_000, 50_000]
+    )
+    parser.add_argument(
+        "--density", type=float, default=0.2, help="area covered by bodies"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--all-pairs-max", type=int, default=5_000, help="skip the O(n^2) path above"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{BODY_SIZE:g}px bodies covering {args.density:.0%} of the world")
+    print(
+        "  bodies | contacts | grid ms | us/body | dict tick ms"
+        " | archetype tick ms | all pairs ms"
+    )
+    for count in args.counts:
+        side = world_side(count, args.density)
+        boxes = random_boxes(count, side, args.seed)
+        i, _j = contact_pairs(*boxes, BODY_SIZE)
+        grid = best_of(args.repeat, contact_pairs, *boxes, BODY_SIZE)
+
+        ticks = []
+        for kind in WORLDS:
+            world = build_world(kind, count, side, args.seed)
+            # the first tick separates the spawn overlaps, time a settled one
+            collision_system(world, 1.0 / 60.0)
+            ticks.append(best_of(args.repeat, collision_system, world, 1.0 / 60.0))
+
+        if count <= args.all_pairs_max:
+            all_pairs = best_of(1, pairs_all, *boxes)
+            all_col = f"{all_pairs * 1000:12.2f}"
+        else:
+            all_col = f"{'-':>12}"
+
+        print(
+            f"{count:>8} | {len(i):>8} | {grid * 1000:7.2f}"
+            f" | {grid / count * 1e6:7.2f} | {ticks[0] * 1000:12.2f}"
+            f" | {ticks[1] * 1000:17.2f} | {all_col}"
+        )
+
+
+if __name__ == "__main__":
+    main()
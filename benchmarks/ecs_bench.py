@@ -0,0 +1,305 @@
+# benchmarks/ecs_bench.py
+#
+# Microbenchmarks for the ECS core (World and ArchetypeWorld) and the
+# movement system. Results go to a json file so runs on different commits
+# can be compared. The default run includes 1M entity movement ticks and
+# takes several minutes, pass smaller --movement-counts for a quick check.
+#
+#   python -m benchmarks.ecs_bench
+#   python -m benchmarks.ecs_bench --world dict --counts 1000 10000 --repeat 3
+#   python -m benchmarks.ecs_bench --output new.json --compare old.json
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+from dataclasses import dataclass, make_dataclass
+
+from shared.ecs import World, Position, Velocity, Input, Health, WorldConfig
+from shared.archetype import ArchetypeWorld
+from shared.player import create_player
+from shared.spatial import SpatialIndex
+from shared.systems.movement_system import movement_system
+
+WORLDS = {"dict": World, "archetype": ArchetypeWorld}
+
+# fraction of entities matched by the second component in get_components
+SELECTIVITIES = [1.0, 0.1, 0.01]
+
+# extra component types registered in the world for destroy_entity
+EXTRA_TYPES = [0, 32]
+
+# fraction of players holding a direction key in the movement ticks
+MOVING = 0.5
+# ticks timed per run, fewer for big worlds where one tick takes seconds
+MOVEMENT_TICKS = 10
+MOVEMENT_ENTITY_TICKS = 1_000_000
+
+
+@dataclass
+class Tag:
+    pass
+
+
+def _tag_types(count: int) -> list[type]:
+    return [make_dataclass(f"Tag{i}", []) for i in range(count)]
+
+
+def players_world(world_cls, count: int, rng: random.Random):
+    world = world_cls()
+    for player_id in range(count):
+        create_player(world, rng.uniform(0, 1000), rng.uniform(0, 1000), player_id)
+    return world
+
+
+# -- cases, each does its own setup and returns (seconds timed, operations)
+
+
+def bench_create_entity(world_cls, count: int, rng: random.Random):
+    world = world_cls()
+    start = time.perf_counter()
+    for _ in range(count):
+        world.create_entity()
+    return time.perf_counter() - start, count
+
+
+def bench_create_player(world_cls, count: int, rng: random.Random):
+    world = world_cls()
+    # the server always has the movement query registered
+    world.query(Position, Velocity, Input)
+    start = time.perf_counter()
+    for player_id in range(count):
+        create_player(world, 1.0, 2.0, player_id)
+    return time.perf_counter() - start, count
+
+
+def bench_add_component_new(world_cls, count: int, rng: random.Random):
+    world = world_cls()
+    world.query(Position, Velocity)
+    entities = [world.create_entity() for _ in range(count)]
+    for entity in entities:
+        world.add_component(entity, Velocity(0.0, 0.0))
+
+    start = time.perf_counter()
+    for entity in entities:
+        world.add_component(entity, Position(1.0, 2.0))
+    return time.perf_counter() - start, count
+
+
+def bench_add_component_replace(world_cls, count: int, rng: random.Random):
+    world = players_world(world_cls, count, rng)
+    start = time.perf_counter()
+    for entity in range(count):
+        world.add_component(entity, Health(50, 100))
+    return time.perf_counter() - start, count
+
+
+def bench_get_component(world_cls, count: int, rng: random.Random):
+    world = players_world(world_cls, count, rng)
+    lookups = [rng.randrange(count) for _ in range(count)]
+    start = time.perf_counter()
+    for entity in lookups:
+        world.get_component(entity, Position)
+    return time.perf_counter() - start, count
+
+
+def bench_get_components(world_cls, count: int, rng: random.Random, selectivity):
+    world = players_world(world_cls, count, rng)
+    for entity in range(count):
+        if rng.random() < selectivity:
+            world.add_component(entity, Tag())
+    # first call builds the query, time the steady state
+    for _ in world.get_components(Position, Tag):
+        pass
+
+    matched = 0
+    start = time.perf_counter()
+    for _entity, _pos, _tag in world.get_components(Position, Tag):
+        matched += 1
+    return time.perf_counter() - start, max(1, matched)
+
+
+def bench_destroy_entity(world_cls, count: int, rng: random.Random, extra_types):
+    world = players_world(world_cls, count, rng)
+    # other component types and queries live in the world but not on players
+    other = world.create_entity()
+    for tag_type in _tag_types(extra_types):
+        world.add_component(other, tag_type())
+        world.query(tag_type)
+    world.query(Position, Velocity, Input)
+
+    order = list(range(count))
+    rng.shuffle(order)
+    start = time.perf_counter()
+    for entity in order:
+        world.destroy_entity(entity)
+    return time.perf_counter() - start, count
+
+
+def bench_churn(world_cls, count: int, rng: random.Random):
+    """Players leaving and joining a full world, one of each per op"""
+    world = players_world(world_cls, count, rng)
+    world.query(Position, Velocity, Input)
+    alive = world.query(Position).entities().copy()
+
+    start = time.perf_counter()
+    for player_id in range(count, 2 * count):
+        slot = rng.randrange(count)
+        world.destroy_entity(alive[slot])
+        alive[slot] = create_player(world, 1.0, 2.0, player_id)
+    return time.perf_counter() - start, count
+
+
+def bench_movement(world_cls, count: int, rng: random.Random, batched):
+    world = players_world(world_cls, count, rng)
+    world.set_resource(WorldConfig(width=1000.0, height=1000.0))
+    world.set_resource(SpatialIndex(cell_size=32))
+    for _entity, inp in world.get_components(Input):
+        if rng.random() < MOVING:
+            inp.move_x = rng.choice((-1.0, 1.0))
+            inp.move_y = rng.choice((-1.0, 0.0, 1.0))
+    # first tick fills the spatial index
+    movement_system(world, 1.0 / 60.0, batched=batched)
+
+    ticks = max(1, min(MOVEMENT_TICKS, MOVEMENT_ENTITY_TICKS // count))
+    start = time.perf_counter()
+    for _ in range(ticks):
+        movement_system(world, 1.0 / 60.0, batched=batched)
+    # seconds per tick, ns/op is per entity
+    return (time.perf_counter() - start) / ticks, count
+
+
+# name, function, extra keyword arguments, which --*-counts list to use
+CASES = [
+    ("create_entity", bench_create_entity, {}, "counts"),
+    ("create_player", bench_create_player, {}, "counts"),
+    ("add_component.new", bench_add_component_new, {}, "counts"),
+    ("add_component.replace", bench_add_component_replace, {}, "counts"),
+    ("get_component", bench_get_component, {}, "counts"),
+    *(
+        (f"get_components.sel{s:g}", bench_get_components, {"selectivity": s}, "counts")
+        for s in SELECTIVITIES
+    ),
+    *(
+        (f"destroy_entity.extra{n}", bench_destroy_entity, {"extra_types": n}, "counts")
+        for n in EXTRA_TYPES
+    ),
+    ("churn", bench_churn, {}, "counts"),
+    ("movement.scalar", bench_movement, {"batched": False}, "movement_counts"),
+    ("movement.batched", bench_movement, {"batched": True}, "movement_counts"),
+]
+
+
+def run_case(fn, world_cls, count: int, kwargs: dict, repeat: int, seed: int):
+    times = []
+    ops = 1
+    for i in range(repeat):
+        rng = random.Random(seed + i)
+        seconds, ops = fn(world_cls, count, rng, **kwargs)
+        times.append(seconds)
+    return {
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "ops": ops,
+        "per_op_ns": min(times) / ops * 1e9,
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def result_key(result: dict) -> tuple:
+    return (result["case"], result["world"], result["count"])
+
+
+def compare(results: list[dict], path: str) -> None:
+    with open(path, encoding="utf-8") as f:
+        old = json.load(f)
+    baseline = {result_key(r): r for r in old["results"]}
+
+    print(f"\nvs {path} (commit {old.get('commit')}), old/new time, >1 is faster")
+    for r in results:
+        base = baseline.get(result_key(r))
+        if base is None:
+            continue
+        print(
+            f"{r['case']:<24} {r['world']:>9} {r['count']:>9}"
+            f" | {base['min_s'] / r['min_s']:6.2f}x"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ECS core microbenchmarks")
+    parser.add_argument(
+        "--world", choices=["both", *WORLDS], default="both", help="storage to test"
+    )
+    parser.add_argument(
+        "--counts", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument(
+        "--movement-counts",
+        type=int,
+        nargs="+",
+        default=[1_000, 10_000, 100_000, 1_000_000],
+    )
+    parser.add_argument("--cases", nargs="+", help="only cases starting with these")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="ecs_bench.json")
+    parser.add_argument("--compare", help="earlier --output file to compare with")
+    args = parser.parse_args()
+
+    worlds = WORLDS if args.world == "both" else {args.world: WORLDS[args.world]}
+    counts = {"counts": args.counts, "movement_counts": args.movement_counts}
+
+    print("case                         world     count |   min ms  median ms | ns/op")
+    results = []
+    for name, fn, kwargs, count_list in CASES:
+        if args.cases and not name.startswith(tuple(args.cases)):
+            continue
+        for world_name, world_cls in worlds.items():
+            for count in counts[count_list]:
+                # a single run is plenty once a case takes seconds
+                repeat = args.repeat if count < 1_000_000 else 1
+                r = run_case(fn, world_cls, count, kwargs, repeat, args.seed)
+                r.update(case=name, world=world_name, count=count)
+                results.append(r)
+                print(
+                    f"{name:<24} {world_name:>9} {count:>9}"
+                    f" | {r['min_s'] * 1000:8.2f} {r['median_s'] * 1000:10.2f}"
+                    f" | {r['per_op_ns']:9.1f}",
+                    flush=True,
+                )
+
+    data = {
+        "commit": git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    print(f"wrote {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
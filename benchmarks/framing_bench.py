@@ -0,0 +1,191 @@
+# benchmarks/framing_bench.py
+#
+# Time to decode a receive backlog of n messages: appending to a bytes buffer
+# and slicing one message off the front at a time (take_message, what the
+# client and server used to do) vs the FrameReader that cuts frames out of
+# one bytearray by index. The socket rows push the backlog through a
+# socketpair and count the receive passes (rendered frames in the client)
+# needed to decode it, one recv(4096) per pass vs draining with fill().
+#
+#   python -m benchmarks.framing_bench
+#   python -m benchmarks.framing_bench --messages 100 1000 10000 --players 8
+
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+from typing import Optional
+
+from shared.framing import FrameReader
+from shared.protocol import JSON_CODEC, BINARY_CODEC, _FRAME_HEADER, decode_payload
+
+
+def make_backlog(codec, messages: int, players: int, seed: int) -> bytes:
+    rng = random.Random(seed)
+    frames = []
+    for seq in range(1, messages + 1):
+        msg = {
+            "type": "delta",
+            "seq": seq,
+            "tick": seq,
+            "base": seq - 1,
+            "spawn": [],
+            "update": [
+                {
+                    "id": player_id,
+                    "x": rng.uniform(0, 500),
+                    "y": rng.uniform(0, 500),
+                    "hp": 100,
+                    "hp_max": 100,
+                }
+                for player_id in range(1, players + 1)
+            ],
+            "despawn": [],
+        }
+        frames.append(codec.encode(msg))
+    return b"".join(frames)
+
+
+def take_message(codec, buffer: bytes) -> tuple[Optional[dict], bytes]:
+    """Take one message off the front of buffer, returns (msg or None, rest).
+
+    The old decoder: every message splits or slices the rest of the buffer
+    into a new bytes object.
+    """
+    if codec is JSON_CODEC:
+        while b"\n" in buffer:
+            line, buffer = buffer.split(b"\n", 1)
+            if line:
+                return json.loads(line.decode("utf-8")), buffer
+        return None, buffer
+
+    if len(buffer) < _FRAME_HEADER.size:
+        return None, buffer
+    length, msg_type = _FRAME_HEADER.unpack_from(buffer)
+    end = _FRAME_HEADER.size + length
+    if len(buffer) < end:
+        return None, buffer
+    payload = buffer[_FRAME_HEADER.size : end]
+    return decode_payload(msg_type, payload), buffer[end:]
+
+
+def decode_sliced(codec, backlog: bytes) -> int:
+    buffer = b""
+    buffer += backlog
+    count = 0
+    while True:
+        msg, buffer = take_message(codec, buffer)
+        if msg is None:
+            return count
+        count += 1
+
+
+def decode_reader(codec, backlog: bytes) -> int:
+    reader = FrameReader()
+    reader.feed(backlog)
+    count = 0
+    while reader.next_message(codec) is not None:
+        count += 1
+    return count
+
+
+def best_of(repeat: int, func, *args) -> tuple[float, int]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def frames_to_drain(codec, backlog: bytes, messages: int, use_reader: bool) -> int:
+    """Receive passes (one per rendered frame in the client) until a backlog
+    written in one go has been decoded"""
+    sender, receiver = socket.socketpair()
+    receiver.setblocking(False)
+    writer = threading.Thread(target=sender.sendall, args=(backlog,))
+    writer.start()
+
+    reader = FrameReader()
+    buffer = b""
+    decoded = 0
+    frames = 0
+    while decoded < messages:
+        frames += 1
+        if use_reader:
+            reader.fill(receiver)
+            while reader.next_message(codec) is not None:
+                decoded += 1
+        else:
+            try:
+                buffer += receiver.recv(4096)
+            except BlockingIOError:
+                pass
+            while True:
+                msg, buffer = take_message(codec, buffer)
+                if msg is None:
+                    break
+                decoded += 1
+        # let the writer refill the socket buffer
+        time.sleep(0.0005)
+
+    writer.join()
+    sender.close()
+    receiver.close()
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="receive buffer framing")
+    parser.add_argument(
+        "--messages", type=int, nargs="+", default=[100, 1_000, 10_000, 50_000]
+    )
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--sliced-max", type=int, default=20_000, help="skip the O(n^2) path above"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"delta messages of {args.players} players")
+    print("messages | codec | backlog KiB | sliced ms | reader ms | speedup")
+    for messages in args.messages:
+        for codec in (JSON_CODEC, BINARY_CODEC):
+            backlog = make_backlog(codec, messages, args.players, args.seed)
+            reader_time, count = best_of(args.repeat, decode_reader, codec, backlog)
+            assert count == messages
+
+            if messages <= args.sliced_max:
+                sliced_time, count = best_of(
+                    args.repeat, decode_sliced, codec, backlog
+                )
+                assert count == messages
+                sliced_col = (
+                    f"{sliced_time * 1000:9.2f} | {reader_time * 1000:9.2f}"
+                    f" | {sliced_time / reader_time:6.1f}x"
+                )
+            else:
+                sliced_col = f"{'-':>9} | {reader_time * 1000:9.2f} | {'-':>7}"
+
+            print(
+                f"{messages:>8} | {codec.name:>5} | {len(backlog) / 1024:11.1f}"
+                f" | {sliced_col}"
+            )
+
+    print()
+    print("messages | backlog KiB | frames to drain, recv(4096) | fill()")
+    for messages in args.messages:
+        backlog = make_backlog(BINARY_CODEC, messages, args.players, args.seed)
+        single = frames_to_drain(BINARY_CODEC, backlog, messages, use_reader=False)
+        drained = frames_to_drain(BINARY_CODEC, backlog, messages, use_reader=True)
+        print(
+            f"{messages:>8} | {len(backlog) / 1024:11.1f}"
+            f" | {single:>27} | {drained:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
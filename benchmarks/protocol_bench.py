@@ -0,0 +1,81 @@
+# benchmarks/protocol_bench.py
+#
+# Encode/decode cost and downstream bytes per tick of the state message,
+# json vs the packed binary protocol. Decoding goes through a FrameReader
+# like on the client.
+#
+#   python -m benchmarks.protocol_bench
+#   python -m benchmarks.protocol_bench --players 8 64 512 --repeat 2000
+
+import argparse
+import random
+import time
+
+from shared.framing import FrameReader
+from shared.protocol import JSON_CODEC, BINARY_CODEC
+
+TICK_RATE = 60
+
+
+def make_state(players: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    return {
+        "type": "state",
+        "players": [
+            {
+                "id": player_id,
+                "x": rng.uniform(0, 500),
+                "y": rng.uniform(0, 500),
+                "hp": rng.randint(0, 100),
+                "hp_max": 100,
+            }
+            for player_id in range(1, players + 1)
+        ],
+    }
+
+
+def bench_codec(codec, msg: dict, repeat: int) -> tuple[float, float, int]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        data = codec.encode(msg)
+    encode_time = (time.perf_counter() - start) / repeat
+
+    reader = FrameReader()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        reader.feed(data)
+        decoded = reader.next_message(codec)
+    decode_time = (time.perf_counter() - start) / repeat
+
+    assert decoded is not None and not len(reader)
+    assert len(decoded["players"]) == len(msg["players"])
+    return encode_time, decode_time, len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="json vs binary state messages")
+    parser.add_argument("--players", type=int, nargs="+", default=[8, 64, 512])
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(
+        "players | codec | encode us | decode us | bytes/msg"
+        " | bytes/tick (all clients) | KiB/s (all clients)"
+    )
+    for players in args.players:
+        msg = make_state(players, args.seed)
+        # the server sends the full state to every connected player each tick
+        repeat = max(10, args.repeat * 8 // players)
+        for codec in (JSON_CODEC, BINARY_CODEC):
+            encode_time, decode_time, size = bench_codec(codec, msg, repeat)
+            per_tick = size * players
+            print(
+                f"{players:>7} | {codec.name:>5} | {encode_time * 1e6:9.1f}"
+                f" | {decode_time * 1e6:9.1f} | {size:9}"
+                f" | {per_tick:24} | {per_tick * TICK_RATE / 1024:19.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
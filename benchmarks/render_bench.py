@@ -0,0 +1,165 @@
+# benchmarks/render_bench.py
+#
+# Client entity drawing time per frame against entity count: the batched
+# EntityRenderer culling through a SpatialIndex (as the client runs it) and
+# by testing every entity, vs drawing every entity one by one as Game.draw
+# used to (draw.rect, font.render and a linear player id scan per entity).
+#
+#   python -m benchmarks.render_bench
+#   python -m benchmarks.render_bench --counts 1000 10000 --world-size 2000
+
+import argparse
+import os
+import random
+import time
+
+# no window needed
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame  # noqa: E402
+
+from shared.ecs import World, Position, Renderable, Health  # noqa: E402
+from shared.player import create_player  # noqa: E402
+from shared.spatial import SpatialIndex  # noqa: E402
+from shared.systems.movement_system import SPEED  # noqa: E402
+from client.renderer import EntityRenderer  # noqa: E402
+from client.text_cache import TextCache  # noqa: E402
+
+SCREEN_SIZE = (800, 600)
+
+
+def build_world(count: int, world_size: float, seed: int):
+    rng = random.Random(seed)
+    world = World()
+    player_entities: dict[int, int] = {}
+    for player_id in range(1, count + 1):
+        entity = create_player(
+            world, rng.uniform(0, world_size), rng.uniform(0, world_size), player_id
+        )
+        world.get_component(entity, Health).current = rng.randint(0, 100)
+        player_entities[player_id] = entity
+    return world, player_entities
+
+
+def draw_naive(screen, font, world, camera, player_entities, own_player_id):
+    camera_x, camera_y = camera
+    for entity_id, pos, rend in world.get_components(Position, Renderable):
+        screen_x = int(pos.x - camera_x)
+        screen_y = int(pos.y - camera_y)
+        pygame.draw.rect(
+            screen, rend.color, pygame.Rect(screen_x, screen_y, rend.width, rend.height)
+        )
+
+        player_id = None
+        for pid, ent in player_entities.items():
+            if ent == entity_id:
+                player_id = pid
+                break
+
+        health = world.get_component(entity_id, Health)
+        if health is not None and player_id != own_player_id:
+            bar_y = screen_y - 6
+            pygame.draw.rect(screen, (60, 0, 0), (screen_x, bar_y, rend.width, 4))
+            ratio = max(0.0, min(1.0, health.current / health.maximum))
+            fg_width = int(rend.width * ratio)
+            pygame.draw.rect(screen, (0, 200, 0), (screen_x, bar_y, fg_width, 4))
+
+        if player_id is not None:
+            label = font.render(str(player_id), True, (255, 255, 255))
+            screen.blit(
+                label,
+                (
+                    screen_x + rend.width // 2 - label.get_width() // 2,
+                    screen_y - label.get_height() - 2,
+                ),
+            )
+
+
+def camera_path(frames: int, world_size: float, seed: int) -> list[tuple]:
+    """The camera follows a player walking at SPEED, turning now and then"""
+    rng = random.Random(seed)
+    max_x = world_size - SCREEN_SIZE[0]
+    max_y = world_size - SCREEN_SIZE[1]
+    x = rng.uniform(0, max_x)
+    y = rng.uniform(0, max_y)
+    step = SPEED / 60.0
+
+    cameras = []
+    direction = (0.0, 0.0)
+    for frame in range(frames):
+        if frame % 30 == 0:
+            direction = (rng.choice((-1.0, 0.0, 1.0)), rng.choice((-1.0, 0.0, 1.0)))
+        x = min(max_x, max(0.0, x + direction[0] * step))
+        y = min(max_y, max(0.0, y + direction[1] * step))
+        cameras.append((x, y))
+    return cameras
+
+
+def time_frames(draw, screen, cameras) -> float:
+    start = time.perf_counter()
+    for camera in cameras:
+        screen.fill((30, 30, 30))
+        draw(camera)
+    return (time.perf_counter() - start) / len(cameras)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="client entity rendering")
+    parser.add_argument(
+        "--counts", type=int, nargs="+", default=[100, 1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--world-size", type=float, default=4000.0)
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument(
+        "--naive-max", type=int, default=2_000, help="skip the O(n^2) path above"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    pygame.init()
+    screen = pygame.display.set_mode(SCREEN_SIZE)
+    font = pygame.font.Font(None, 24)
+
+    cameras = camera_path(args.frames, args.world_size, args.seed)
+
+    print(f"world {args.world_size:g}x{args.world_size:g}, screen {SCREEN_SIZE}")
+    print(
+        "entities | on screen | indexed ms/frame | scan ms/frame"
+        " | naive ms/frame | naive/indexed"
+    )
+    for count in args.counts:
+        world, player_entities = build_world(count, args.world_size, args.seed)
+        entity_players = {e: pid for pid, e in player_entities.items()}
+        renderer = EntityRenderer(TextCache(font))
+
+        def draw_batched(camera):
+            renderer.draw(screen, world, *camera, entity_players, 1)
+
+        # warm the text and solid caches
+        time_frames(draw_batched, screen, cameras)
+        scan = time_frames(draw_batched, screen, cameras)
+
+        index = SpatialIndex(cell_size=128)
+        index.sync(world)
+        world.set_resource(index)
+        batched = time_frames(draw_batched, screen, cameras)
+        drawn = renderer.drawn
+
+        if count <= args.naive_max:
+            naive = time_frames(
+                lambda c: draw_naive(screen, font, world, c, player_entities, 1),
+                screen,
+                cameras,
+            )
+            naive_col = f"{naive * 1000:14.2f} | {naive / batched:12.1f}x"
+        else:
+            naive_col = f"{'-':>14} | {'-':>13}"
+
+        print(
+            f"{count:>8} | {drawn:>9} | {batched * 1000:16.2f}"
+            f" | {scan * 1000:13.2f} | {naive_col}"
+        )
+
+
+if __name__ == "__main__":
+    main()
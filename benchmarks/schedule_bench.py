@@ -0,0 +1,138 @@
+# benchmarks/schedule_bench.py
+#
+# Tick time of a Schedule of systems run one after another vs on a thread
+# pool. The numpy world runs column kernels on an ArchetypeWorld (numpy lets
+# go of the GIL inside them, so stages overlap on any build), the python
+# world runs plain loops on a dict World, which only overlap on free-threaded
+# python. Systems: regen (Health) and wander (Input) share stage 0, the
+# movement system waits for wander in stage 1.
+#
+#   python -m benchmarks.schedule_bench
+#   python -m benchmarks.schedule_bench --counts 100000 --workers 1 2 4 --work 8
+
+import argparse
+import math
+import os
+import random
+import time
+
+import numpy as np
+
+from shared.ecs import World, Position, Input, Health, WorldConfig
+from shared.archetype import ArchetypeWorld
+from shared.player import create_player
+from shared.scheduler import Schedule, gil_enabled, system
+from shared.systems.movement_system import movement_system
+
+WORLDS = {"numpy": ArchetypeWorld, "python": World}
+
+
+@system(writes=(Health,))
+def regen_system(world, dt: float, work: int):
+    if isinstance(world, ArchetypeWorld):
+        for table in world.archetypes(Health):
+            current = table.column(Health, "current")
+            maximum = table.column(Health, "maximum")
+            # stand-in for heavier per entity math
+            scratch = current.astype(np.float64)
+            for _ in range(work):
+                np.sqrt(scratch * scratch + 1.0, out=scratch)
+            np.minimum(current + 1, maximum, out=current)
+        return
+
+    for _entity, health in world.get_components(Health):
+        value = float(health.current)
+        for _ in range(work):
+            value = (value * value + 1.0) ** 0.5
+        health.current = min(health.current + 1, health.maximum)
+
+
+@system(reads=(Position,), writes=(Input,))
+def wander_system(world, dt: float, work: int):
+    if isinstance(world, ArchetypeWorld):
+        for table in world.archetypes(Position, Input):
+            x = table.column(Position, "x")
+            y = table.column(Position, "y")
+            angle = x * 0.01 + y * 0.02
+            for _ in range(work):
+                np.sin(angle, out=angle)
+            np.cos(angle, out=table.column(Input, "move_x"))
+            np.sin(angle, out=table.column(Input, "move_y"))
+        return
+
+    for _entity, pos, input_component in world.get_components(Position, Input):
+        angle = pos.x * 0.01 + pos.y * 0.02
+        for _ in range(work):
+            angle = math.sin(angle)
+        input_component.move_x = math.cos(angle)
+        input_component.move_y = math.sin(angle)
+
+
+def build_world(kind: str, count: int, seed: int):
+    rng = random.Random(seed)
+    world = WORLDS[kind]()
+    world.set_resource(WorldConfig(width=4000.0, height=4000.0))
+    for player_id in range(1, count + 1):
+        create_player(world, rng.uniform(0, 3900), rng.uniform(0, 3900), player_id)
+    return world
+
+
+def make_schedule(kind: str, workers: int, work: int) -> Schedule:
+    schedule = Schedule(workers=workers)
+    schedule.add(regen_system, work=work)
+    schedule.add(wander_system, work=work)
+    schedule.add(movement_system, batched=kind == "numpy")
+    return schedule
+
+
+def time_ticks(schedule: Schedule, world, ticks: int) -> float:
+    # the first run registers queries and is always sequential
+    schedule.run(world, 1.0 / 60.0)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        schedule.run(world, 1.0 / 60.0)
+    return (time.perf_counter() - start) / ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="system schedule threading")
+    parser.add_argument("--world", choices=(*WORLDS, "all"), default="all")
+    parser.add_argument("--counts", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument(
+        "--work", type=int, default=4, help="kernel repeats per system and entity"
+    )
+    parser.add_argument("--ticks", type=int, default=20)
+    parser.add_argument(
+        "--python-max", type=int, default=20_000, help="skip slow python worlds"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    kinds = list(WORLDS) if args.world == "all" else [args.world]
+    print(f"gil {'on' if gil_enabled() else 'off'}, {os.cpu_count()} cpus")
+    print(make_schedule("numpy", 1, args.work).describe())
+    print()
+
+    worker_cols = " | ".join(f"{w:>2} workers ms" for w in args.workers)
+    print(f"world  | entities | {worker_cols} | speedup vs first")
+    for kind in kinds:
+        for count in args.counts:
+            if kind == "python" and count > args.python_max:
+                continue
+            world = build_world(kind, count, args.seed)
+            times = []
+            for workers in args.workers:
+                schedule = make_schedule(kind, workers, args.work)
+                times.append(time_ticks(schedule, world, args.ticks))
+                schedule.close()
+
+            cols = " | ".join(f"{t * 1000:13.2f}" for t in times)
+            print(
+                f"{kind:<6} | {count:>8} | {cols}"
+                f" | {times[0] / min(times):15.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# benchmarks/spatial_bench.py
+#
+# Compares SpatialIndex radius/rect queries against scanning every Position.
+#
+#   python -m benchmarks.spatial_bench
+#   python -m benchmarks.spatial_bench --counts 1000 10000 --queries 500
+
+import argparse
+import math
+import random
+import time
+
+from shared.ecs import World, Position, Input, WorldConfig
+from shared.player import create_player
+from shared.spatial import SpatialIndex
+from shared.systems.movement_system import movement_system
+
+RADIUS = 128.0
+RECT_SIZE = 256.0
+
+
+def build_world(count: int, seed: int) -> World:
+    rng = random.Random(seed)
+
+    # keep density at roughly one entity per tile whatever the count
+    tile_size = 32
+    side = math.ceil(math.sqrt(count)) * tile_size
+
+    world = World()
+    world.set_resource(
+        WorldConfig(width=float(side), height=float(side), tile_size=tile_size)
+    )
+    world.set_resource(SpatialIndex(cell_size=tile_size))
+
+    for player_id in range(count):
+        create_player(world, rng.uniform(0, side), rng.uniform(0, side), player_id)
+
+    return world
+
+
+def brute_radius(world: World, x: float, y: float, radius: float) -> list[int]:
+    radius_sq = radius * radius
+    found = []
+    for entity_id, pos in world.get_components(Position):
+        dx = pos.x - x
+        dy = pos.y - y
+        if dx * dx + dy * dy <= radius_sq:
+            found.append(entity_id)
+    return found
+
+
+def brute_rect(world: World, x: float, y: float, w: float, h: float) -> list[int]:
+    found = []
+    for entity_id, pos in world.get_components(Position):
+        if x <= pos.x <= x + w and y <= pos.y <= y + h:
+            found.append(entity_id)
+    return found
+
+
+def timed(fn, points) -> tuple[float, int]:
+    hits = 0
+    start = time.perf_counter()
+    for x, y in points:
+        hits += len(fn(x, y))
+    return (time.perf_counter() - start) / len(points), hits
+
+
+def run(count: int, queries: int, seed: int) -> None:
+    world = build_world(count, seed)
+    cfg = world.get_resource(WorldConfig)
+    index = world.get_resource(SpatialIndex)
+
+    start = time.perf_counter()
+    index.sync(world)
+    build_time = time.perf_counter() - start
+
+    rng = random.Random(seed + 1)
+    # brute force is O(n) per query, use fewer queries at large counts
+    points = [
+        (rng.uniform(0, cfg.width), rng.uniform(0, cfg.height))
+        for _ in range(max(10, queries * 1000 // count))
+    ]
+
+    idx_radius, hits_a = timed(lambda x, y: index.query_radius(x, y, RADIUS), points)
+    bf_radius, hits_b = timed(lambda x, y: brute_radius(world, x, y, RADIUS), points)
+    assert hits_a == hits_b, "index and brute force disagree on radius query"
+
+    idx_rect, hits_a = timed(
+        lambda x, y: index.query_rect(x, y, RECT_SIZE, RECT_SIZE), points
+    )
+    bf_rect, hits_b = timed(
+        lambda x, y: brute_rect(world, x, y, RECT_SIZE, RECT_SIZE), points
+    )
+    assert hits_a == hits_b, "index and brute force disagree on rect query"
+
+    # index upkeep: a tick where a tenth of the entities are moving
+    for _entity_id, inp in world.get_components(Input):
+        if rng.random() < 0.1:
+            inp.move_x = rng.choice((-1.0, 1.0))
+    start = time.perf_counter()
+    movement_system(world, 1.0 / 60.0)
+    tick_with_index = time.perf_counter() - start
+
+    print(
+        f"{count:>8} entities | build {build_time * 1000:8.2f} ms"
+        f" | radius idx {idx_radius * 1e6:9.1f} us  brute {bf_radius * 1e6:10.1f} us"
+        f" ({bf_radius / idx_radius:6.1f}x)"
+        f" | rect idx {idx_rect * 1e6:9.1f} us  brute {bf_rect * 1e6:10.1f} us"
+        f" ({bf_rect / idx_rect:6.1f}x)"
+        f" | movement tick {tick_with_index * 1000:7.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SpatialIndex vs brute force scan")
+    parser.add_argument(
+        "--counts", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"radius {RADIUS}, rect {RECT_SIZE}x{RECT_SIZE}, one entity per tile")
+    for count in args.counts:
+        run(count, args.queries, args.seed)
+
+
+if __name__ == "__main__":
+    main()
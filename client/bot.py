@@ -0,0 +1,379 @@
+# client/bot.py
+#
+# Headless load generator: simulated players that speak the game protocol
+# without pygame, many per process on asyncio.
+#
+#   python -m client.bot --clients 50 100 200 --seconds 10
+#   python -m client.bot --clients 400 --processes 4 --mode script --protocol json
+
+import argparse
+import asyncio
+import multiprocessing
+import random
+import statistics
+import time
+
+from shared.protocol import JSON_CODEC, CODECS, SUPPORTED_PROTOCOLS, choose_protocol
+from shared.framing import FrameReader
+from shared.input_channel import InputSender
+
+from .snapshots import SnapshotRing
+
+HOST = "127.0.0.1"
+PORT = 5000
+
+# input loop passes per second, like the real client's frames. Ticks are
+# counted from the elapsed time and input only goes out when it changed or
+# a keepalive is due, as in the real client
+INPUT_RATE = 60
+# the most ticks one pass catches up on
+MAX_STEPS = 5
+
+# (move_x, move_y), seconds - walks a square with pauses in between
+SCRIPT = [
+    ((1.0, 0.0), 1.0),
+    ((0.0, 0.0), 0.5),
+    ((0.0, 1.0), 1.0),
+    ((0.0, 0.0), 0.5),
+    ((-1.0, 0.0), 1.0),
+    ((0.0, 0.0), 0.5),
+    ((0.0, -1.0), 1.0),
+    ((0.0, 0.0), 0.5),
+]
+
+CHAT_LINES = ["hello", "gg", "anyone here?", "lag?", "brb"]
+
+
+class Bot:
+    def __init__(
+        self, index: int, mode: str, chat_interval: float, protocol: str, seed: int
+    ) -> None:
+        self.index = index
+        self.mode = mode
+        self.chat_interval = chat_interval
+        self.preferred_protocols = (
+            SUPPORTED_PROTOCOLS if protocol == "auto" else [protocol]
+        )
+        self.rng = random.Random(seed)
+
+        self.send_codec = JSON_CODEC
+        self.recv_codec = JSON_CODEC
+        self.reader = FrameReader()
+        self.writer: asyncio.StreamWriter | None = None
+
+        self.player_id: int | None = None
+        self.position: tuple[float, float] | None = None
+        # delta snapshots rebuilt so far, the newest gets acked
+        self.ring = SnapshotRing()
+        self.ack_pending = False
+        self.input_seq = 0
+        self.tick_dt = 1.0 / 60
+        self.input_sender = InputSender()
+
+        # movement
+        self.move = (0.0, 0.0)
+        self.move_until = 0.0
+        self.script_step = 0
+        # set when we start moving from rest: (time, position at rest)
+        self.move_started: tuple[float, tuple[float, float] | None] | None = None
+
+        # -- measurements
+        self.connected = False
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.snapshots = 0
+        # (server tick, arrival) of the first and latest snapshot
+        self.first_tick: tuple[int, float] | None = None
+        self.last_tick: tuple[int, float] | None = None
+        self.last_arrival: float | None = None
+        self.arrival_gaps: list[float] = []
+        self.latencies: list[float] = []
+        self.error: str | None = None
+
+    async def run(self, host: str, port: int, seconds: float) -> dict:
+        try:
+            reader, self.writer = await asyncio.open_connection(host, port)
+        except OSError as e:
+            self.error = str(e)
+            return self.result(seconds)
+
+        self.connected = True
+        receiver = asyncio.ensure_future(self.receive_loop(reader))
+        try:
+            await asyncio.wait_for(self.input_loop(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+        except OSError as e:
+            self.error = str(e)
+        finally:
+            receiver.cancel()
+            self.writer.close()
+
+        return self.result(seconds)
+
+    # -- sending
+    def send(self, msg: dict):
+        data = self.send_codec.encode(msg)
+        self.bytes_out += len(data)
+        self.writer.write(data)
+
+    async def input_loop(self):
+        next_chat = time.monotonic() + self.next_chat_delay()
+        last = time.monotonic()
+        tick_time = 0.0
+
+        while True:
+            now = time.monotonic()
+            self.update_move(now)
+            tick_time += now - last
+            last = now
+
+            if self.player_id is not None:
+                move_x, move_y = self.move
+                steps = int(tick_time / self.tick_dt)
+                tick_time -= steps * self.tick_dt
+                for _ in range(min(steps, MAX_STEPS)):
+                    self.input_seq += 1
+                    msg = self.input_sender.update(self.input_seq, move_x, move_y, now)
+                    if msg is not None:
+                        self.send(msg)
+
+                if self.ack_pending:
+                    self.send({"type": "ack", "seq": self.ring.seq})
+                    self.ack_pending = False
+
+                if self.chat_interval > 0 and now >= next_chat:
+                    self.send({"type": "chat", "text": self.rng.choice(CHAT_LINES)})
+                    next_chat = now + self.next_chat_delay()
+
+                await self.writer.drain()
+
+            await asyncio.sleep(1.0 / INPUT_RATE)
+
+    def next_chat_delay(self) -> float:
+        if self.chat_interval <= 0:
+            return float("inf")
+        return self.rng.uniform(0.5, 1.5) * self.chat_interval
+
+    def update_move(self, now: float):
+        if now < self.move_until:
+            return
+
+        was_idle = self.move == (0.0, 0.0)
+
+        if self.mode == "script":
+            self.move, duration = SCRIPT[self.script_step % len(SCRIPT)]
+            self.script_step += 1
+        else:
+            # random walk, about a third of the time standing still
+            if was_idle or self.rng.random() < 0.3:
+                steps = (-1.0, 0.0, 1.0)
+                self.move = (self.rng.choice(steps), self.rng.choice(steps))
+            else:
+                self.move = (0.0, 0.0)
+            duration = self.rng.uniform(0.3, 1.5)
+
+        self.move_until = now + duration
+
+        # time how long it takes for our own movement to show up in a snapshot,
+        # a sample still open when the move changes again (stuck at the world
+        # edge, say) is thrown away
+        if was_idle and self.move != (0.0, 0.0):
+            self.move_started = (now, self.position)
+        else:
+            self.move_started = None
+
+    # -- receiving
+    async def receive_loop(self, reader: asyncio.StreamReader):
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                self.error = self.error or "server closed the connection"
+                return
+            self.bytes_in += len(data)
+            self.reader.feed(data)
+
+            while True:
+                msg = self.reader.next_message(self.recv_codec)
+                if msg is None:
+                    break
+                self.handle_message(msg)
+
+    def handle_message(self, msg: dict):
+        msg_type = msg.get("type")
+        now = time.monotonic()
+
+        if msg_type == "welcome":
+            self.player_id = int(msg["player_id"])
+            self.tick_dt = 1.0 / float(msg.get("tick_rate", 60))
+            offered = msg.get("protocols", [JSON_CODEC.name])
+            name = choose_protocol(offered, self.preferred_protocols)
+            if name != self.send_codec.name:
+                self.send({"type": "protocol", "name": name})
+                self.send_codec = CODECS[name]
+
+        elif msg_type == "protocol":
+            self.recv_codec = CODECS[msg["name"]]
+
+        elif msg_type in ("state", "delta"):
+            if msg_type == "delta":
+                players = self.ring.apply(msg)
+                if players is None:
+                    return
+                self.ack_pending = True
+                own = players.get(self.player_id)
+                records = [own] if own is not None else []
+            else:
+                records = msg.get("players", [])
+
+            if "tick" in msg:
+                if self.first_tick is None:
+                    self.first_tick = (int(msg["tick"]), now)
+                self.last_tick = (int(msg["tick"]), now)
+
+            self.snapshots += 1
+            if self.last_arrival is not None:
+                self.arrival_gaps.append(now - self.last_arrival)
+            self.last_arrival = now
+
+            for p in records:
+                if int(p["id"]) == self.player_id:
+                    self.position = (float(p["x"]), float(p["y"]))
+
+            if self.move_started is not None:
+                started, rest = self.move_started
+                if rest is None or self.position != rest:
+                    if rest is not None:
+                        self.latencies.append(now - started)
+                    self.move_started = None
+
+    def result(self, seconds: float) -> dict:
+        server_hz = 0.0
+        first, last = self.first_tick, self.last_tick
+        if first and last and last[1] > first[1]:
+            server_hz = (last[0] - first[0]) / (last[1] - first[1])
+        return {
+            "connected": self.connected,
+            "error": self.error,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "snapshots": self.snapshots,
+            "server_hz": server_hz,
+            "arrival_gaps": self.arrival_gaps,
+            "latencies": self.latencies,
+            "seconds": seconds,
+        }
+
+
+async def run_bots(count: int, first_index: int, args: dict) -> list[dict]:
+    bots = [
+        Bot(
+            first_index + i,
+            args["mode"],
+            args["chat_interval"],
+            args["protocol"],
+            seed=args["seed"] + first_index + i,
+        )
+        for i in range(count)
+    ]
+    return await asyncio.gather(
+        *(bot.run(args["host"], args["port"], args["seconds"]) for bot in bots)
+    )
+
+
+def _worker(job: tuple[int, int, dict]) -> list[dict]:
+    count, first_index, args = job
+    return asyncio.run(run_bots(count, first_index, args))
+
+
+def run_load(clients: int, processes: int, args: dict) -> list[dict]:
+    if processes <= 1:
+        return asyncio.run(run_bots(clients, 0, args))
+
+    # split the bots as evenly as possible over the worker processes
+    jobs = []
+    first = 0
+    for p in range(processes):
+        count = clients // processes + (1 if p < clients % processes else 0)
+        if count:
+            jobs.append((count, first, args))
+            first += count
+
+    with multiprocessing.Pool(len(jobs)) as pool:
+        return [result for chunk in pool.map(_worker, jobs) for result in chunk]
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))]
+
+
+def summarize(clients: int, results: list[dict]) -> str:
+    connected = [r for r in results if r["connected"]]
+    errors = sum(1 for r in results if r["error"])
+    seconds = results[0]["seconds"] if results else 1.0
+
+    server_hz = [r["server_hz"] for r in connected if r["server_hz"] > 0]
+    gaps = [g for r in connected for g in r["arrival_gaps"]]
+    latencies = [lat for r in connected for lat in r["latencies"]]
+    count = max(1, len(connected))
+    down = sum(r["bytes_in"] for r in connected) / count / seconds
+    up = sum(r["bytes_out"] for r in connected) / count / seconds
+    snaps = sum(r["snapshots"] for r in connected) / count / seconds
+
+    return (
+        f"{clients:>7} | {len(connected):>9} | {errors:>6}"
+        f" | {statistics.median(server_hz) if server_hz else 0.0:>9.1f}"
+        f" | {snaps:>7.1f}"
+        f" | {percentile(gaps, 50) * 1000:>6.1f}"
+        f" {percentile(gaps, 99) * 1000:>6.1f}"
+        f" | {percentile(latencies, 50) * 1000:>6.1f}"
+        f" {percentile(latencies, 99) * 1000:>6.1f}"
+        f" | {down / 1024:>8.1f} | {up / 1024:>6.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="headless load bots")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument(
+        "--clients", type=int, nargs="+", default=[10], help="one run per count"
+    )
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--mode", choices=("random", "script"), default="random")
+    parser.add_argument(
+        "--chat-interval", type=float, default=0.0, help="avg seconds, 0 = no chat"
+    )
+    parser.add_argument(
+        "--protocol", choices=["auto", *CODECS.keys()], default="auto"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    job_args = {
+        "host": args.host,
+        "port": args.port,
+        "seconds": args.seconds,
+        "mode": args.mode,
+        "chat_interval": args.chat_interval,
+        "protocol": args.protocol,
+        "seed": args.seed,
+    }
+
+    print(
+        "clients | connected | errors | server Hz | snaps/s"
+        " | gap p50/p99 ms | move->snap p50/p99 ms | down KiB/s | up KiB/s"
+    )
+    for clients in args.clients:
+        results = run_load(clients, args.processes, job_args)
+        print(summarize(clients, results), flush=True)
+        # let the server notice the disconnects before the next run
+        time.sleep(1.0)
+
+
+if __name__ == "__main__":
+    main()
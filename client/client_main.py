@@ -1,16 +1,44 @@
 # client/client_main.py
 import sys
-import json
+import time
 import socket
+from collections import deque
 
 import pygame
 
-from shared.ecs import World, Position, Renderable, Health
+from shared.ecs import World, Position, Health, Input, WorldConfig
 from shared.player import create_player
+from shared.spatial import SpatialIndex
+from shared.systems.movement_system import movement_system
+from shared.protocol import JSON_CODEC, CODECS, SUPPORTED_PROTOCOLS, choose_protocol
+from shared.protocol import FrameTooLarge
+from shared.framing import FrameReader
+from shared.input_channel import InputSender
+from shared.tilemap import TileMap, chunk_from_message
+
+from .interpolation import InterpolationBuffer
+from .snapshots import SnapshotRing
+from .static_layer import StaticLayer, BACKGROUND_COLOR
+from .text_cache import TextCache
+from .renderer import EntityRenderer
 
 HOST = "127.0.0.1"
 PORT = 5000
 
+# move our own player locally right away instead of waiting for the server
+USE_PREDICTION = True
+# inputs kept for replay, about two seconds worth at 60 ticks/s
+MAX_PENDING_INPUTS = 120
+# ticks simulated in one frame at most, the rest of a longer stall is dropped
+MAX_PREDICTION_STEPS = 5
+
+# other players are drawn this far in the past, between two snapshots. Two
+# snapshot intervals at 20 Hz, so one late or lost snapshot is covered
+INTERPOLATION_DELAY = 0.1
+
+# pixels between chat log lines
+CHAT_LINE_HEIGHT = 20
+
 
 class Game:
     def __init__(self):
@@ -29,22 +57,37 @@ class Game:
 
         self.show_grid: bool = False
         self.tile_size: int = 32
+        # tile chunks the server streamed to us, None for servers without
+        self.tilemap: TileMap | None = None
+
+        # background, border and grid, drawn once and blitted per frame
+        self.static_layer = StaticLayer()
 
         self.clock = pygame.time.Clock()
         self.running = False
 
         # local ECS world used only for rendering
         self.world = World()
+        # newest snapshot position of every player, lets rendering and
+        # interpolation skip everything that is far off screen
+        self.view_index = SpatialIndex(cell_size=128)
+        self.world.set_resource(self.view_index)
 
-        # mapping from player_id -> entity_id in this client's world
+        # mapping from player_id -> entity_id in this client's world, and back
         self.player_entities: dict[int, int] = {}
+        self.entity_players: dict[int, int] = {}
 
         # -- chat
         self.chat_active: bool = False
         self.chat_text: str = ""
         self.chat_log: list[str] = []
+        # the whole log as one surface, rebuilt when a message arrives
+        self.chat_surface: pygame.Surface | None = None
 
         self.font = pygame.font.Font(None, 24)
+        # labels and chat lines are rendered once and reused
+        self.text_cache = TextCache(self.font)
+        self.entity_renderer = EntityRenderer(self.text_cache)
 
         # Networking
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -53,9 +96,43 @@ class Game:
         self.sock.setblocking(False)
         print("Client: connected!")
 
-        self.recv_buffer = b""
+        self.reader = FrameReader()
         self.player_id: int | None = None
 
+        # both directions start as json, switched after the welcome handshake
+        self.preferred_protocols: list[str] = SUPPORTED_PROTOCOLS
+        self.send_codec = JSON_CODEC
+        self.recv_codec = JSON_CODEC
+
+        # delta snapshots: the last ones rebuilt (the newest gets acked), the
+        # players of the one the world shows and whether we still owe an ack
+        self.snapshots = SnapshotRing()
+        self.server_players: dict[int, dict] = {}
+        self.ack_pending: bool = False
+
+        # -- prediction
+        # our own player is also simulated in a world of its own, at the
+        # server's tick rate. When a snapshot arrives it is reset to the
+        # server position and the ticks the server has not applied yet are
+        # replayed on top.
+        self.predict_world = World()
+        self.predicted_entity: int | None = None
+        self.tick_dt: float = 1.0 / 60
+        # frame time not simulated yet
+        self.tick_time: float = 0.0
+        self.input_seq: int = 0
+        # only input changes and keepalives go to the server
+        self.input_sender = InputSender()
+        self.pending_inputs: deque[tuple[int, float, float]] = deque(
+            maxlen=MAX_PENDING_INPUTS
+        )
+        self.input_ack: int = 0
+        self.server_position: tuple[float, float] | None = None
+        self.needs_reconcile: bool = False
+
+        # -- remote players are interpolated between timestamped snapshots
+        self.interpolation = InterpolationBuffer(delay=INTERPOLATION_DELAY)
+
     def run(self):
         self.running = True
         while self.running:
@@ -89,9 +166,7 @@ class Game:
                                 "text": text,
                             }
                             try:
-                                self.sock.sendall(
-                                    (json.dumps(chat_msg) + "\n").encode("utf-8")
-                                )
+                                self.send(chat_msg)
                             except (BrokenPipeError, ConnectionResetError, OSError):
                                 print("Client: lost connection while sending chat")
                                 self.running = False
@@ -135,42 +210,196 @@ class Game:
             if keys[pygame.K_ESCAPE]:
                 self.running = False
 
-        # 2. Send input to server
-        input_msg = {
-            "type": "input",
-            "move_x": move_x,
-            "move_y": move_y,
-        }
+        # 2. Run our ticks for the frame time: tell the server when the input
+        # changed (or a keepalive is due) and apply it locally without waiting
+        # for the round trip
+        self.tick_time += dt
+        steps = int(self.tick_time / self.tick_dt)
+        self.tick_time -= steps * self.tick_dt
+        now = time.monotonic()
+
+        for _ in range(min(steps, MAX_PREDICTION_STEPS)):
+            self.input_seq += 1
+            input_msg = self.input_sender.update(self.input_seq, move_x, move_y, now)
+            if input_msg is not None:
+                try:
+                    self.send(input_msg)
+                except (BrokenPipeError, ConnectionResetError, OSError):
+                    print("Client: lost connection to server")
+                    self.running = False
+                    return
+
+            if self.predicted_entity is not None:
+                self.pending_inputs.append((self.input_seq, move_x, move_y))
+                self.step_prediction(move_x, move_y)
 
+        if steps and self.predicted_entity is not None:
+            self.sync_predicted()
+
+        # 3. Receive state updates from server and apply to local ECS,
+        # everything that arrived since the last frame
         try:
-            self.sock.sendall((json.dumps(input_msg) + "\n").encode("utf-8"))
+            self.reader.fill(self.sock)
+
+            # process any complete messages, one at a time since a
+            # "protocol" message changes how the rest is decoded
+            while True:
+                msg = self.reader.next_message(self.recv_codec)
+                if msg is None:
+                    break
+                self.handle_message(msg)
+
         except (BrokenPipeError, ConnectionResetError, OSError):
-            print("Client: lost connection to server")
+            print("Client: server disconnected")
+            self.running = False
+            return
+        except FrameTooLarge as exc:
+            print(f"Client: bad data from server: {exc}")
             self.running = False
             return
 
-        # 3. Receive state updates from server and apply to local ECS
-        try:
-            data = self.sock.recv(4096)
-            if data:
-                self.recv_buffer += data
-
-                # process any complete lines
-                while b"\n" in self.recv_buffer:
-                    line, self.recv_buffer = self.recv_buffer.split(b"\n", 1)
-                    if not line:
-                        continue
-                    msg = json.loads(line.decode("utf-8"))
-                    self.handle_message(msg)
-
-        except BlockingIOError:
-            # no data this frame
-            pass
-        except (BrokenPipeError, ConnectionResetError, OSError):
+        if self.reader.closed:
             print("Client: server disconnected")
             self.running = False
             return
 
+        # 4. Rewind our player to the server position and replay the rest
+        if self.needs_reconcile:
+            self.reconcile()
+
+        # and place everyone else at the interpolated render time
+        self.interpolate_remote()
+
+        # 5. Acknowledge the newest snapshot, once per frame at most
+        if self.ack_pending:
+            try:
+                self.send({"type": "ack", "seq": self.snapshots.seq})
+            except (BrokenPipeError, ConnectionResetError, OSError):
+                print("Client: lost connection to server")
+                self.running = False
+                return
+            self.ack_pending = False
+
+    def send(self, msg: dict):
+        self.sock.sendall(self.send_codec.encode(msg))
+
+    def step_prediction(self, move_x: float, move_y: float):
+        input_comp = self.predict_world.get_component(self.predicted_entity, Input)
+        input_comp.move_x = move_x
+        input_comp.move_y = move_y
+        movement_system(self.predict_world, self.tick_dt)
+
+    def reconcile(self):
+        self.needs_reconcile = False
+        if self.predicted_entity is None or self.server_position is None:
+            return
+
+        pos = self.predict_world.get_component(self.predicted_entity, Position)
+        pos.x, pos.y = self.server_position
+        # everything up to input_ack is already in the server position, the
+        # older ticks stay around in case the server realigns to one of them
+        for seq, move_x, move_y in self.pending_inputs:
+            if seq > self.input_ack:
+                self.step_prediction(move_x, move_y)
+
+        self.sync_predicted()
+
+    def interpolate_remote(self):
+        render_time = self.interpolation.render_time(time.monotonic())
+        # only what can be drawn this frame, the rest catches up when in view
+        for entity in self.entity_renderer.visible_entities(
+            self.world, self.camera_x, self.camera_y, self.width, self.height
+        ):
+            pid = self.entity_players.get(entity)
+            if pid is None or pid == self.player_id:
+                continue
+            sampled = self.interpolation.sample(pid, render_time)
+            pos = self.world.get_component(entity, Position)
+            if sampled is not None and pos is not None:
+                pos.x, pos.y = sampled
+
+    def sync_predicted(self):
+        """Show our player where the prediction has it"""
+        predicted = self.predict_world.get_component(self.predicted_entity, Position)
+        pos = self.world.get_component(self.player_entities[self.player_id], Position)
+        if pos is None:
+            return
+
+        pos.x = predicted.x
+        pos.y = predicted.y
+
+        # camera
+        self.camera_x = pos.x - self.width / 2
+        self.camera_y = pos.y - self.height / 2
+
+    def apply_player(self, p: dict):
+        pid = int(p["id"])
+        x = float(p["x"])
+        y = float(p["y"])
+
+        hp = int(p.get("hp", 100))
+        hp_max = int(p.get("hp_max", 100))
+
+        # if we don't know this player yet, create local entity
+        if pid not in self.player_entities:
+            if self.player_id is not None and pid == self.player_id:
+                color = (0, 200, 0)  # me = green
+            else:
+                color = (200, 0, 0)  # others = red
+
+            entity = create_player(self.world, x, y, player_id=pid, color=color)
+            self.player_entities[pid] = entity
+            self.entity_players[entity] = pid
+
+            if USE_PREDICTION and pid == self.player_id:
+                self.predicted_entity = create_player(
+                    self.predict_world, x, y, player_id=pid
+                )
+
+        entity = self.player_entities[pid]
+        pos = self.world.get_component(entity, Position)
+
+        if self.predicted_entity is not None and pid == self.player_id:
+            # our position is drawn from the prediction, reconciled later
+            self.server_position = (x, y)
+            self.needs_reconcile = True
+
+        elif pid != self.player_id:
+            # drawn by interpolate_remote once the snapshot is complete
+            self.interpolation.set(pid, x, y)
+
+        elif pos is not None:
+            # positino
+            pos.x = x
+            pos.y = y
+
+            if self.player_id is not None and pid == self.player_id:
+                # camera
+                self.camera_x = pos.x - self.width / 2
+                self.camera_y = pos.y - self.height / 2
+
+        self.view_index.move(entity, x, y)
+
+        # update / sync health
+        health = self.world.get_component(entity, Health)
+        if health is not None:
+            health.current = hp
+            health.maximum = hp_max
+
+    def despawn_player(self, pid: int):
+        entity = self.player_entities.pop(pid, None)
+        if entity is not None:
+            del self.entity_players[entity]
+            self.view_index.remove(entity)
+            self.world.destroy_entity(entity)
+        self.interpolation.remove(pid)
+
+        if pid == self.player_id and self.predicted_entity is not None:
+            self.predict_world.destroy_entity(self.predicted_entity)
+            self.predicted_entity = None
+            self.server_position = None
+            self.pending_inputs.clear()
+
     def handle_message(self, msg: dict):
         msg_type = msg.get("type")
 
@@ -179,61 +408,96 @@ class Game:
             self.player_id = int(msg["player_id"])
             self.world_width = msg.get("world_width")
             self.world_height = msg.get("world_height")
+            self.tile_size = int(msg.get("tile_size") or self.tile_size)
+            chunk_tiles = msg.get("chunk_tiles")
+            if chunk_tiles and self.world_width and self.world_height:
+                self.tilemap = TileMap(
+                    self.world_width,
+                    self.world_height,
+                    self.tile_size,
+                    int(chunk_tiles),
+                    seed=None,
+                )
 
             print(
                 f"Client: my player_id = {self.player_id}, world = {self.world_width}x{self.world_height}"
             )
 
-        elif msg_type == "state":
-            players = msg.get("players", [])
-
-            seen_ids: set[int] = set()
+            # predict with the server's step and world bounds, snapshot ticks
+            # are converted to server time with it too
+            self.tick_dt = 1.0 / float(msg.get("tick_rate", 60))
+            if self.world_width is not None and self.world_height is not None:
+                self.predict_world.set_resource(
+                    WorldConfig(
+                        width=float(self.world_width), height=float(self.world_height)
+                    )
+                )
 
-            for p in players:
-                pid = int(p["id"])
-                x = float(p["x"])
-                y = float(p["y"])
+            # older servers offer nothing and stay on json
+            offered = msg.get("protocols", [JSON_CODEC.name])
+            name = choose_protocol(offered, self.preferred_protocols)
+            if name != self.send_codec.name:
+                self.send({"type": "protocol", "name": name})
+                self.send_codec = CODECS[name]
 
-                hp = int(p.get("hp", 100))
-                hp_max = int(p.get("hp_max", 100))
+        elif msg_type == "protocol":
+            # server acked, everything after this message uses the new codec
+            self.recv_codec = CODECS[msg["name"]]
+            print(f"Client: using {self.recv_codec.name} protocol")
 
-                seen_ids.add(pid)
+        elif msg_type == "input_ack":
+            # last tick of ours the server applied, arrives right before its
+            # snapshot. It can go back when the server realigns to our ticks
+            self.input_ack = int(msg["seq"])
+            self.needs_reconcile = True
 
-                # if we don't know this player yet, create local entity
-                if pid not in self.player_entities:
-                    if self.player_id is not None and pid == self.player_id:
-                        color = (0, 200, 0)  # me = green
-                    else:
-                        color = (200, 0, 0)  # others = red
+        elif msg_type == "state":
+            players = msg.get("players", [])
 
-                    entity = create_player(self.world, x, y, player_id=pid, color=color)
-                    self.player_entities[pid] = entity
+            seen_ids: set[int] = set()
 
-                entity = self.player_entities[pid]
-                pos = self.world.get_component(entity, Position)
+            for p in players:
+                self.apply_player(p)
+                seen_ids.add(int(p["id"]))
 
-                if pos is not None:
-                    # positino
-                    pos.x = x
-                    pos.y = y
+            # despawn players that no longer is connected
+            for pid in list(self.player_entities.keys()):
+                if pid not in seen_ids:
+                    self.despawn_player(pid)
 
-                if self.player_id is not None and pid == self.player_id:
-                    # camera
-                    self.camera_x = pos.x - self.width / 2
-                    self.camera_y = pos.y - self.height / 2
+            self.snapshot_received(msg)
 
-            # update / sync health
-            health = self.world.get_component(entity, Health)
-            if health is not None:
-                health.current = hp
-                health.maximum = hp_max
+        elif msg_type == "delta":
+            players = self.snapshots.apply(msg)
+            if players is None:
+                return
 
-            # despawn players that no longer is connected
+            # make the world match the rebuilt snapshot. Records nothing
+            # changed since the last one are the same objects, skip those
             for pid in list(self.player_entities.keys()):
-                if pid not in seen_ids:
-                    entity = self.player_entities[pid]
-                    self.world.destroy_entity(entity)
-                    del self.player_entities[pid]
+                if pid not in players:
+                    self.despawn_player(pid)
+            applied = self.server_players
+            for pid, p in players.items():
+                if applied.get(pid) is not p or pid not in self.player_entities:
+                    self.apply_player(p)
+            self.server_players = players
+
+            self.ack_pending = True
+            self.snapshot_received(msg)
+
+        elif msg_type == "chunk":
+            if self.tilemap is not None:
+                cx, cy, tiles = chunk_from_message(msg)
+                self.tilemap.set_chunk(cx, cy, tiles)
+                self.invalidate_chunk(cx, cy)
+
+        elif msg_type == "chunk_drop":
+            # the server forgets it sent these too, they come again when near
+            if self.tilemap is not None:
+                for cx, cy in msg.get("chunks", []):
+                    self.tilemap.drop_chunk(int(cx), int(cy))
+                    self.invalidate_chunk(int(cx), int(cy))
 
         elif msg_type == "chat":
             sender = msg.get("from")
@@ -243,122 +507,75 @@ class Game:
             self.chat_log.append(line)
             # keep 10 last msg
             self.chat_log = self.chat_log[-10:]
+            self.chat_surface = None
+
+    def invalidate_chunk(self, cx: int, cy: int):
+        size = self.tilemap.chunk_pixels
+        self.static_layer.invalidate_area(cx * size, cy * size, size, size)
+
+    def snapshot_received(self, msg: dict):
+        now = time.monotonic()
+        # servers without ticks: fall back to when the snapshot arrived
+        tick = msg.get("tick")
+        server_time = tick * self.tick_dt if tick is not None else now
+        self.interpolation.snapshot(server_time, now)
 
     def draw(self):
-        self.screen.fill((30, 30, 30))
+        self.screen.fill(BACKGROUND_COLOR)
 
-        # draw world border ( same size as window; adapt if different)
+        # world border and tile grid (debug, toggled with g)
         if self.world_width is not None and self.world_height is not None:
-            border_x = int(0 - self.camera_x)
-            border_y = int(0 - self.camera_y)
-
-            border_rect = pygame.Rect(
-                border_x, border_y, self.world_width, self.world_height
+            self.static_layer.configure(
+                self.world_width, self.world_height, self.tile_size, self.tilemap
+            )
+            self.static_layer.draw(
+                self.screen, self.camera_x, self.camera_y, self.show_grid
             )
 
-            pygame.draw.rect(self.screen, (80, 80, 80), border_rect, width=2)
-
-        # -- draw tile grid (debug)
-        if self.show_grid:
-            # vertical lines
-            x = 0
-            while x <= self.world_width:
-                sx = int(x - self.camera_x)
-                pygame.draw.line(
-                    self.screen,
-                    (60, 60, 60),
-                    (sx, int(0 - self.camera_y)),
-                    (sx, int(self.world_height - self.camera_y)),
-                    1,
-                )
-                x += self.tile_size
-
-            # horizontal lines
-            y = 0
-            while y <= self.world_height:
-                sy = int(y - self.camera_y)
-                pygame.draw.line(
-                    self.screen,
-                    (60, 60, 60),
-                    (int(0 - self.camera_x), sy),
-                    (int(self.world_width - self.camera_x), sy),
-                    1,
-                )
-                y += self.tile_size
-
-        # --- draw players / entities
-
-        for entity_id, pos, rend in self.world.get_components(Position, Renderable):
-
-            # convert world to screen
-            screen_x = int(pos.x - self.camera_x)
-            screen_y = int(pos.y - self.camera_y)
-
-            # draw squere
-            rect = pygame.Rect(screen_x, screen_y, rend.width, rend.height)
-            pygame.draw.rect(self.screen, rend.color, rect)
-
-            # draw player id label
-            # find wich player_id this entity belongs to
-            player_id = None
-            for pid, ent in self.player_entities.items():
-                if ent == entity_id:
-                    player_id = pid
-                    break
-
-            # -- health bar
-            health = self.world.get_component(entity_id, Health)
-            if health is not None:
-                if player_id == self.player_id:
-                    continue
-
-                bar_width = rend.width
-                bar_height = 4
-                bar_x = screen_x
-                bar_y = screen_y - bar_height - 2
-
-                # background
-                bg_rect = pygame.Rect(bar_x, bar_y, bar_width, bar_height)
-                pygame.draw.rect(self.screen, (60, 0, 0), bg_rect)
-
-                # foreground (clamped)
-                ratio = 0.0
-                if health.maximum > 0:
-                    ratio = max(0.0, min(1.0, health.current / health.maximum))
-                fg_width = int(bar_width * ratio)
-                fg_rect = pygame.Rect(bar_x, bar_y, fg_width, bar_height)
-                pygame.draw.rect(self.screen, (0, 200, 0), fg_rect)
-
-            if player_id is not None:
-
-                if pid == self.player_id:
-                    color = (0, 255, 0)
-                else:
-                    color = (255, 255, 255)
-
-                label_surface = self.font.render(str(player_id), True, color)
-
-                label_x = screen_x + rend.width // 2 - label_surface.get_width() // 2
-                label_y = screen_y - label_surface.get_height() - 2  # above player
-                self.screen.blit(label_surface, (label_x, label_y))
-
-        # draw chat log
-        y = self.height - 40
-        for line in reversed(self.chat_log):
-            surf = self.font.render(line, True, (255, 255, 255))
-            self.screen.blit(surf, (10, y))
-            y -= 20
-            if y < 0:
-                break
+        # --- draw players / entities (culled and batched)
+        self.entity_renderer.draw(
+            self.screen,
+            self.world,
+            self.camera_x,
+            self.camera_y,
+            self.entity_players,
+            self.player_id,
+        )
+
+        # draw chat log, newest line at the bottom
+        if self.chat_log:
+            if self.chat_surface is None:
+                self.chat_surface = self.render_chat_log()
+            top = self.height - 40 - CHAT_LINE_HEIGHT * (len(self.chat_log) - 1)
+            self.screen.blit(self.chat_surface, (10, top))
 
         # draw current chat input
         if self.chat_active:
-            input_surf = self.font.render("> " + self.chat_text, True, (0, 255, 0))
+            input_surf = self.text_cache.render("> " + self.chat_text, (0, 255, 0))
             self.screen.blit(input_surf, (10, self.height - 20))
 
         pygame.display.flip()
 
+    def render_chat_log(self) -> pygame.Surface:
+        white = (255, 255, 255)
+        lines = [self.text_cache.render(line, white) for line in self.chat_log]
+        width = max(surf.get_width() for surf in lines)
+        height = CHAT_LINE_HEIGHT * (len(lines) - 1) + lines[-1].get_height()
+
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        surface.blits(
+            [(surf, (0, i * CHAT_LINE_HEIGHT)) for i, surf in enumerate(lines)],
+            doreturn=False,
+        )
+        return surface
+
     def quit(self):
+        print(f"Client: {self.text_cache.report()}")
+        sender = self.input_sender
+        print(
+            f"Client: input sent on {sender.sent} of"
+            f" {sender.sent + sender.skipped} ticks"
+        )
         print("Client: quitting")
         try:
             self.sock.close()
@@ -0,0 +1,91 @@
+# client/interpolation.py
+from collections import deque
+
+# samples kept per entity, a couple of seconds at 20-60 snapshots/s
+BUFFER_SIZE = 64
+
+# how fast the clock offset follows arrivals that came in later than the
+# best one seen, per snapshot
+OFFSET_CREEP = 0.01
+
+
+class InterpolationBuffer:
+    """Timestamped positions of remote entities, rendered a little in the past.
+
+    Every snapshot is stamped with the server time it was taken at. Drawing
+    at (server time - delay) normally leaves a snapshot on each side of the
+    render time, so entities glide between them instead of jumping when
+    snapshots arrive late or bunched up. Memory is bounded by BUFFER_SIZE
+    samples per entity.
+    """
+
+    def __init__(self, delay: float = 0.1, size: int = BUFFER_SIZE) -> None:
+        self.delay = delay
+        self.size = size
+        # entity -> (server time, x, y), oldest first
+        self._samples: dict[int, deque[tuple[float, float, float]]] = {}
+        # newest position of every entity, deltas leave out unchanged ones
+        self._latest: dict[int, tuple[float, float]] = {}
+        # local clock minus server clock, from the least delayed arrivals
+        self._offset: float | None = None
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+    def set(self, entity: int, x: float, y: float) -> None:
+        """Position of entity in the snapshot being applied"""
+        self._latest[entity] = (x, y)
+
+    def snapshot(self, server_time: float, now: float) -> None:
+        """Close the snapshot taken at server_time that arrived at now"""
+        offset = now - server_time
+        if self._offset is None or offset < self._offset:
+            self._offset = offset
+        else:
+            # follow slowly so one early arrival does not pin the delay
+            self._offset += (offset - self._offset) * OFFSET_CREEP
+
+        # every known entity gets a sample, so a player that stood still for
+        # a few snapshots does not glide over the whole gap once it moves
+        for entity, (x, y) in self._latest.items():
+            samples = self._samples.get(entity)
+            if samples is None:
+                samples = self._samples[entity] = deque(maxlen=self.size)
+            elif samples[-1][0] >= server_time:
+                continue
+            samples.append((server_time, x, y))
+
+    def remove(self, entity: int) -> None:
+        self._samples.pop(entity, None)
+        self._latest.pop(entity, None)
+
+    def render_time(self, now: float) -> float:
+        """Server time to draw remote entities at"""
+        if self._offset is None:
+            return now
+        return now - self._offset - self.delay
+
+    def sample(self, entity: int, render_time: float) -> tuple[float, float] | None:
+        """Interpolated position at render_time, clamped to the buffered range"""
+        samples = self._samples.get(entity)
+        if not samples:
+            return None
+
+        newest = samples[-1]
+        if render_time >= newest[0]:
+            return newest[1], newest[2]
+
+        # render time is normally between the last few samples, search backwards
+        later = newest
+        for i in range(len(samples) - 2, -1, -1):
+            earlier = samples[i]
+            if earlier[0] <= render_time:
+                t = (render_time - earlier[0]) / (later[0] - earlier[0])
+                return (
+                    earlier[1] + (later[1] - earlier[1]) * t,
+                    earlier[2] + (later[2] - earlier[2]) * t,
+                )
+            later = earlier
+
+        oldest = samples[0]
+        return oldest[1], oldest[2]
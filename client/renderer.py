@@ -0,0 +1,157 @@
+# client/renderer.py
+import pygame
+
+from shared.ecs import Position, Renderable, Health
+from shared.spatial import SpatialIndex
+
+from .text_cache import TextCache
+
+HEALTH_BAR_HEIGHT = 4
+HEALTH_BG_COLOR = (60, 0, 0)
+HEALTH_FG_COLOR = (0, 200, 0)
+LABEL_COLOR = (255, 255, 255)
+OWN_LABEL_COLOR = (0, 255, 0)
+
+# labels and health bars stick out of the sprite, keep entities this close
+# to the screen edge so their decorations do not pop in and out
+CULL_MARGIN = 32
+# positions in the SpatialIndex are the newest snapshot, the drawn ones can
+# lag behind them by the interpolation delay
+INDEX_MARGIN = 96
+
+
+class EntityRenderer:
+    """Draws the Position/Renderable entities that overlap the screen.
+
+    With a SpatialIndex resource in the world only entities near the camera
+    are looked at, otherwise everything is tested against the camera rect.
+    Visible entities are collected into blit lists and submitted in three
+    batches (sprites, health bars, labels), sprites and bars being cached
+    solid surfaces instead of draw.rect calls.
+    """
+
+    def __init__(self, text_cache: TextCache) -> None:
+        self.text_cache = text_cache
+        # (width, height, color) -> solid surface
+        self._solids: dict[tuple[int, int, tuple], pygame.Surface] = {}
+        # last frame
+        self.drawn = 0
+        self.culled = 0
+
+    def solid(self, width: int, height: int, color: tuple) -> pygame.Surface:
+        key = (width, height, color)
+        surface = self._solids.get(key)
+        if surface is None:
+            surface = pygame.Surface((width, height))
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert()
+            surface.fill(color)
+            self._solids[key] = surface
+        return surface
+
+    def visible_entities(
+        self, world, camera_x: float, camera_y: float, width: int, height: int
+    ) -> list[int]:
+        """Entities that may be on screen, in id order, a superset when indexed"""
+        index = world.get_resource(SpatialIndex)
+        if index is None:
+            return world.query(Position, Renderable).entities()
+
+        margin = INDEX_MARGIN
+        found = index.query_rect(
+            camera_x - margin,
+            camera_y - margin,
+            width + 2 * margin,
+            height + 2 * margin,
+        )
+        found.sort()
+        return found
+
+    def draw(
+        self,
+        screen: pygame.Surface,
+        world,
+        camera_x: float,
+        camera_y: float,
+        entity_players: dict[int, int],
+        own_player_id: int | None,
+    ):
+        view_width, view_height = screen.get_size()
+        min_x = -CULL_MARGIN
+        min_y = -CULL_MARGIN
+        max_x = view_width + CULL_MARGIN
+        max_y = view_height + CULL_MARGIN
+
+        sprites = []
+        bars = []
+        bar_fills = []
+        labels = []
+        culled = 0
+
+        for entity_id in self.visible_entities(
+            world, camera_x, camera_y, view_width, view_height
+        ):
+            pos = world.get_component(entity_id, Position)
+            rend = world.get_component(entity_id, Renderable)
+            if pos is None or rend is None:
+                continue
+
+            # convert world to screen
+            screen_x = int(pos.x - camera_x)
+            screen_y = int(pos.y - camera_y)
+
+            if (
+                screen_x + rend.width < min_x
+                or screen_x > max_x
+                or screen_y + rend.height < min_y
+                or screen_y > max_y
+            ):
+                culled += 1
+                continue
+
+            sprites.append(
+                (self.solid(rend.width, rend.height, rend.color), (screen_x, screen_y))
+            )
+
+            player_id = entity_players.get(entity_id)
+            is_own = player_id is not None and player_id == own_player_id
+
+            # -- health bar, not for our own player
+            health = world.get_component(entity_id, Health)
+            if health is not None and not is_own:
+                bar_width = rend.width
+                bar_pos = (screen_x, screen_y - HEALTH_BAR_HEIGHT - 2)
+                bars.append(
+                    (self.solid(bar_width, HEALTH_BAR_HEIGHT, HEALTH_BG_COLOR), bar_pos)
+                )
+
+                # foreground (clamped), a slice of a full width bar
+                ratio = 0.0
+                if health.maximum > 0:
+                    ratio = max(0.0, min(1.0, health.current / health.maximum))
+                fill_width = int(bar_width * ratio)
+                if fill_width > 0:
+                    bar_fills.append(
+                        (
+                            self.solid(bar_width, HEALTH_BAR_HEIGHT, HEALTH_FG_COLOR),
+                            bar_pos,
+                            (0, 0, fill_width, HEALTH_BAR_HEIGHT),
+                        )
+                    )
+
+            # -- player id label above the player
+            if player_id is not None:
+                color = OWN_LABEL_COLOR if is_own else LABEL_COLOR
+                label = self.text_cache.render(str(player_id), color)
+                label_x = screen_x + rend.width // 2 - label.get_width() // 2
+                label_y = screen_y - label.get_height() - 2
+                labels.append((label, (label_x, label_y)))
+
+        screen.fblits(sprites)
+        screen.fblits(bars)
+        # fblits has no source area, partial bars go through blits
+        screen.blits(bar_fills, doreturn=False)
+        screen.fblits(labels)
+
+        self.drawn = len(sprites)
+        self.culled = culled
@@ -0,0 +1,59 @@
+# client/snapshots.py
+from typing import Optional
+
+# snapshots kept to apply deltas to, as many as the server keeps to build
+# them from (SNAPSHOT_HISTORY in server/snapshots.py)
+SNAPSHOT_RING = 64
+
+
+class SnapshotRing:
+    """Player records of the last snapshots rebuilt from "delta" messages.
+
+    A delta is built against the snapshot its base names, which is the one
+    the client last acked, not the one it last applied: several deltas can
+    arrive between two acks. So each delta is applied to a copy of its base
+    and the result replaces the client's view of the world.
+    """
+
+    def __init__(self, size: int = SNAPSHOT_RING) -> None:
+        self.size = size
+        # newest seq rebuilt, the one to ack
+        self.seq = 0
+        self._snapshots: dict[int, dict[int, dict]] = {}
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
+
+    def apply(self, msg: dict) -> Optional[dict[int, dict]]:
+        """Players (id -> record) of the snapshot a delta brings.
+
+        None for a delta that is not newer than the last one, or whose base
+        is no longer kept. Records of players the delta leaves alone are
+        the same objects as in the base snapshot.
+        """
+        seq = int(msg["seq"])
+        if seq <= self.seq:
+            return None
+
+        base = int(msg["base"])
+        if base == -1:
+            players: dict[int, dict] = {}
+        else:
+            baseline = self._snapshots.get(base)
+            if baseline is None:
+                return None
+            players = dict(baseline)
+
+        for p in msg.get("spawn", []):
+            players[int(p["id"])] = p
+        for p in msg.get("update", []):
+            players[int(p["id"])] = p
+        for pid in msg.get("despawn", []):
+            players.pop(int(pid), None)
+
+        self._snapshots[seq] = players
+        # seqs only grow, so the first one is the oldest
+        while len(self._snapshots) > self.size:
+            del self._snapshots[next(iter(self._snapshots))]
+        self.seq = seq
+        return players
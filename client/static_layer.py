@@ -0,0 +1,189 @@
+# client/static_layer.py
+import math
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+import pygame
+
+from shared.tilemap import TileMap
+
+BACKGROUND_COLOR = (30, 30, 30)
+BORDER_COLOR = (80, 80, 80)
+GRID_COLOR = (60, 60, 60)
+# colour of each tile id: grass, dirt, sand, water, stone
+TILE_COLORS = np.array(
+    [(34, 58, 34), (66, 54, 40), (110, 102, 70), (32, 48, 84), (72, 72, 78)],
+    dtype=np.uint8,
+)
+
+# world pixels per cached chunk surface
+CHUNK_SIZE = 512
+# chunks kept around (1 MiB each at 32 bpp), least recently drawn go first.
+# An 800x600 view shows at most 6, the rest is margin for walking back
+MAX_CHUNKS = 16
+
+
+class StaticLayer:
+    """Background, tiles, world border and grid rendered once into chunk surfaces.
+
+    The world is cut into CHUNK_SIZE squares that are drawn the first time
+    they come into view and then only blitted, so a frame costs a handful of
+    blits whatever the world or tile size. Call configure() every frame, it
+    throws the chunks away when the world, tile size or tile map changed,
+    and invalidate_area() when tiles under a part of the world arrived.
+    Toggling the grid throws them away too, only one variant is kept.
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, max_chunks: int = MAX_CHUNKS):
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.world_width = 0
+        self.world_height = 0
+        self.tile_size = 0
+        self.tilemap: Optional[TileMap] = None
+        # whether the cached chunks have the grid drawn in
+        self.show_grid = False
+        # (chunk x, chunk y) -> surface
+        self._chunks: OrderedDict[tuple[int, int], pygame.Surface] = OrderedDict()
+        self.chunks_rendered = 0
+
+    def configure(
+        self,
+        world_width: float,
+        world_height: float,
+        tile_size: int,
+        tilemap: Optional[TileMap] = None,
+    ):
+        size = (int(world_width), int(world_height), int(tile_size))
+        if (
+            size != (self.world_width, self.world_height, self.tile_size)
+            or tilemap is not self.tilemap
+        ):
+            self.world_width, self.world_height, self.tile_size = size
+            self.tilemap = tilemap
+            self.invalidate()
+
+    def invalidate(self):
+        self._chunks.clear()
+
+    def invalidate_area(self, left: float, top: float, width: float, height: float):
+        """Drop the chunk surfaces overlapping a world rect"""
+        size = self.chunk_size
+        first_x, first_y = int(left) // size, int(top) // size
+        last_x = int(left + width - 1) // size
+        last_y = int(top + height - 1) // size
+        for key in [
+            key
+            for key in self._chunks
+            if first_x <= key[0] <= last_x and first_y <= key[1] <= last_y
+        ]:
+            del self._chunks[key]
+
+    def draw(
+        self, screen: pygame.Surface, camera_x: float, camera_y: float, show_grid: bool
+    ):
+        """Blit the chunks overlapping the screen, the caller fills the rest"""
+        if self.world_width <= 0 or self.world_height <= 0:
+            return
+        if show_grid != self.show_grid:
+            self.show_grid = show_grid
+            self.invalidate()
+
+        size = self.chunk_size
+        # the last grid line sits on x = world_width, one pixel past the world
+        last_cx = self.world_width // size
+        last_cy = self.world_height // size
+
+        # floored once so every chunk lands on the same pixel grid, int()
+        # would round a fractional camera differently either side of zero
+        left = math.floor(camera_x)
+        top = math.floor(camera_y)
+
+        first_x = max(0, left // size)
+        first_y = max(0, top // size)
+        end_x = min(last_cx, (left + screen.get_width()) // size)
+        end_y = min(last_cy, (top + screen.get_height()) // size)
+
+        blits = []
+        for cy in range(first_y, end_y + 1):
+            for cx in range(first_x, end_x + 1):
+                chunk = self._chunk(cx, cy)
+                blits.append((chunk, (cx * size - left, cy * size - top)))
+        screen.blits(blits, doreturn=False)
+
+    def _chunk(self, cx: int, cy: int) -> pygame.Surface:
+        key = (cx, cy)
+        chunk = self._chunks.get(key)
+        if chunk is not None:
+            self._chunks.move_to_end(key)
+            return chunk
+
+        size = self.chunk_size
+        chunk = self._render_chunk(self.show_grid, cx * size, cy * size)
+        self._chunks[key] = chunk
+        if len(self._chunks) > self.max_chunks:
+            self._chunks.popitem(last=False)
+        self.chunks_rendered += 1
+        return chunk
+
+    def _render_chunk(self, show_grid: bool, left: int, top: int) -> pygame.Surface:
+        size = self.chunk_size
+        # only the part of the chunk inside the world (plus the last grid line)
+        width = min(size, self.world_width + 1 - left)
+        height = min(size, self.world_height + 1 - top)
+
+        surface = pygame.Surface((width, height))
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        surface.fill(BACKGROUND_COLOR)
+        if self.tilemap is not None:
+            self._paint_tiles(surface, left, top, width, height)
+
+        # same drawing order as the old per-frame code: border, then grid
+        border = pygame.Rect(-left, -top, self.world_width, self.world_height)
+        pygame.draw.rect(surface, BORDER_COLOR, border, width=2)
+
+        if show_grid and self.tile_size > 0:
+            tile = self.tile_size
+            # grid lines that fall inside this chunk
+            x = -(-left // tile) * tile
+            while x <= min(left + width - 1, self.world_width):
+                pygame.draw.line(
+                    surface,
+                    GRID_COLOR,
+                    (x - left, -top),
+                    (x - left, self.world_height - top),
+                    1,
+                )
+                x += tile
+
+            y = -(-top // tile) * tile
+            while y <= min(top + height - 1, self.world_height):
+                pygame.draw.line(
+                    surface,
+                    GRID_COLOR,
+                    (-left, y - top),
+                    (self.world_width - left, y - top),
+                    1,
+                )
+                y += tile
+
+        return surface
+
+    def _paint_tiles(self, surface, left: int, top: int, width: int, height: int):
+        """Tile chunks under the surface, missing ones stay background until
+        they arrive and invalidate_area() drops this surface"""
+        tilemap = self.tilemap
+        tile = tilemap.tile_size
+        chunk_pixels = tilemap.chunk_pixels
+        for cx, cy in tilemap.chunks_in_rect(left, top, width - 1, height - 1):
+            tiles = tilemap.get_chunk(cx, cy)
+            if tiles is None:
+                continue
+            # surfarray is indexed [x][y], tile chunks [row][column]
+            image = pygame.surfarray.make_surface(TILE_COLORS[tiles.T])
+            image = pygame.transform.scale(
+                image, (tiles.shape[1] * tile, tiles.shape[0] * tile)
+            )
+            surface.blit(image, (cx * chunk_pixels - left, cy * chunk_pixels - top))
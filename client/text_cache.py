@@ -0,0 +1,60 @@
+# client/text_cache.py
+from collections import OrderedDict
+
+import pygame
+
+# rendered strings kept, enough for every label of a crowded screen (labels
+# and chat lines are a few KiB each)
+MAX_ENTRIES = 2048
+
+
+class TextCache:
+    """LRU of rendered text surfaces keyed by (text, color, antialias).
+
+    Player labels and chat lines hardly ever change, so after the first frame
+    almost every render() is a dict lookup instead of a rasterization.
+    """
+
+    def __init__(self, font: pygame.font.Font, max_entries: int = MAX_ENTRIES):
+        self.font = font
+        self.max_entries = max_entries
+        self._surfaces: OrderedDict[tuple, pygame.Surface] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._surfaces)
+
+    def render(
+        self, text: str, color: tuple[int, int, int], antialias: bool = True
+    ) -> pygame.Surface:
+        key = (text, color, antialias)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = self.font.render(text, antialias, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def clear(self) -> None:
+        self._surfaces.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def report(self) -> str:
+        return (
+            f"text cache: {len(self)}/{self.max_entries} entries,"
+            f" {self.hits} hits, {self.misses} misses"
+            f" ({self.hit_rate * 100:.1f}% hit rate), {self.evictions} evictions"
+        )
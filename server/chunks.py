@@ -0,0 +1,96 @@
+# server/chunks.py
+from typing import Optional
+
+from shared.tilemap import TileMap, ChunkKey, chunk_message, pack_tiles
+
+# chunks within this distance (a square around the player) are streamed,
+# covers half an 800x600 window plus a chunk of margin
+CHUNK_VIEW_RADIUS = 900.0
+# streamed chunks further than this are dropped on both sides, more than
+# the view radius so walking along a border does not resend chunks
+CHUNK_DROP_RADIUS = 1400.0
+# most chunks sent to one client per snapshot, nearest first
+MAX_CHUNKS_PER_SEND = 4
+# send ticks between dropping generated chunks no client holds
+EVICT_INTERVAL = 300
+
+
+class ChunkStreamer:
+    """Sends every client the tile chunks around its player.
+
+    Each client dict keeps "chunks" (the chunks it has) and "chunk_center"
+    (chunk its player was in at the last look). A client is only looked at
+    again when its player changed chunk or it still has chunks to receive,
+    so a standing player costs nothing. Chunks are compressed once and the
+    bytes shared by every client they go to.
+    """
+
+    def __init__(
+        self,
+        tilemap: TileMap,
+        view_radius: float = CHUNK_VIEW_RADIUS,
+        drop_radius: float = CHUNK_DROP_RADIUS,
+        per_send: int = MAX_CHUNKS_PER_SEND,
+    ) -> None:
+        self.tilemap = tilemap
+        self.view_radius = view_radius
+        self.drop_radius = drop_radius
+        self.per_send = per_send
+        self._sends = 0
+        self._packed: dict[ChunkKey, bytes] = {}
+
+    def update(self, client: dict, x: float, y: float) -> list[dict]:
+        """Messages that bring client's chunks up to date for a player at (x, y)"""
+        tilemap = self.tilemap
+        center = tilemap.chunk_of(x, y)
+        if center == client["chunk_center"] and not client["chunks_pending"]:
+            return []
+        client["chunk_center"] = center
+
+        sent: set[ChunkKey] = client["chunks"]
+        messages = []
+
+        keep = set(self._around(x, y, self.drop_radius))
+        dropped = [key for key in sent if key not in keep]
+        if dropped:
+            sent.difference_update(dropped)
+            messages.append(
+                {"type": "chunk_drop", "chunks": [list(key) for key in dropped]}
+            )
+
+        wanted = [
+            key for key in self._around(x, y, self.view_radius) if key not in sent
+        ]
+        # nearest first, the ones under the player matter most
+        wanted.sort(key=lambda key: abs(key[0] - center[0]) + abs(key[1] - center[1]))
+        for key in wanted[: self.per_send]:
+            messages.append(
+                chunk_message(key[0], key[1], tilemap.chunk_tiles, self._pack(key))
+            )
+            sent.add(key)
+        client["chunks_pending"] = len(wanted) > self.per_send
+        return messages
+
+    def maybe_evict(self, clients: list[dict]) -> Optional[int]:
+        """Every EVICT_INTERVAL calls, drop generated chunks no client holds"""
+        self._sends += 1
+        if self._sends % EVICT_INTERVAL:
+            return None
+        held: set[ChunkKey] = set()
+        for client in clients:
+            held.update(client["chunks"])
+        evicted = self.tilemap.evict(held)
+        for key in [key for key in self._packed if key not in self.tilemap]:
+            del self._packed[key]
+        return evicted
+
+    def _pack(self, key: ChunkKey) -> bytes:
+        packed = self._packed.get(key)
+        if packed is None:
+            packed = self._packed[key] = pack_tiles(self.tilemap.chunk(*key))
+        return packed
+
+    def _around(self, x: float, y: float, radius: float) -> list[ChunkKey]:
+        return self.tilemap.chunks_in_rect(
+            x - radius, y - radius, 2 * radius, 2 * radius
+        )
@@ -0,0 +1,269 @@
+# server/net.py
+import selectors
+import socket
+import time
+from collections import deque
+
+from shared.framing import FrameReader
+
+# largest frame a client may send, inputs, acks and chat are tiny
+MAX_CLIENT_FRAME = 64 * 1024
+
+# queued bytes above which stale state snapshots are dropped for a client
+SEND_HIGH_WATER = 256 * 1024
+# queued bytes at which a client is too slow to keep and gets disconnected
+SEND_HARD_LIMIT = 4 * 1024 * 1024
+
+
+class ServerNet:
+    """Selector based socket layer for the game server.
+
+    poll() waits until a socket is ready (or the timeout runs out), accepts
+    every pending connection and reads only the sockets that have data.
+    It returns a list of events:
+
+        ("connect", conn, addr)   new connection, call register() to keep it
+        ("data", client, int)     bytes added to client["reader"]
+        ("closed", client, None)  client hung up or errored
+
+    Every socket call is counted in `syscalls` so the server can report them.
+
+    Outgoing data goes through a per-client queue that is flushed when the
+    socket is writable, so a full kernel buffer never blocks the tick or
+    looks like a disconnect. Messages sent with reliable=False (state
+    snapshots) are dropped once a client is over the high-water mark.
+
+    Incoming data is drained straight into each client's FrameReader, the
+    caller takes the decoded messages out of it.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        high_water: int = SEND_HIGH_WATER,
+        hard_limit: int = SEND_HARD_LIMIT,
+        max_frame: int = MAX_CLIENT_FRAME,
+    ) -> None:
+        self.selector = selectors.DefaultSelector()
+        self.max_frame = max_frame
+        self.high_water = high_water
+        self.hard_limit = hard_limit
+
+        self.server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_sock.bind((host, port))
+        self.server_sock.listen()
+        self.server_sock.setblocking(False)
+        self.selector.register(self.server_sock, selectors.EVENT_READ, data=None)
+
+        # seconds the last poll() spent blocked in select
+        self.last_wait: float = 0.0
+
+        self.syscalls: dict[str, int] = {
+            "select": 0,
+            "accept": 0,
+            "recv": 0,
+            "send": 0,
+            "close": 0,
+        }
+
+    def poll(self, timeout: float) -> list[tuple]:
+        events: list[tuple] = []
+
+        self.syscalls["select"] += 1
+        wait_start = time.monotonic()
+        ready = self.selector.select(max(0.0, timeout))
+        self.last_wait = time.monotonic() - wait_start
+
+        for key, mask in ready:
+            if key.data is None:
+                self._accept_all(events)
+                continue
+            if mask & selectors.EVENT_WRITE and not self._flush(key.data):
+                events.append(("closed", key.data, None))
+                continue
+            if mask & selectors.EVENT_READ:
+                self._read(key.data, events)
+
+        return events
+
+    def register(self, client: dict) -> None:
+        client["conn"].setblocking(False)
+        # outbox entries: [remaining bytes, reliable, partly sent]
+        client["outbox"] = deque()
+        client["out_bytes"] = 0
+        client["dropped"] = 0
+        client["want_write"] = False
+        client["reader"] = FrameReader(max_frame=self.max_frame)
+        self.selector.register(client["conn"], selectors.EVENT_READ, data=client)
+
+    def send(self, client: dict, data: bytes, reliable: bool = True) -> bool:
+        """Queue data for client, returns False if the connection is broken
+        or the client fell so far behind that it should be dropped"""
+        outbox = client["outbox"]
+
+        if not reliable and client["out_bytes"] > self.high_water:
+            self._drop_stale(client)
+
+        was_empty = not outbox
+        outbox.append([memoryview(data), reliable, False])
+        client["out_bytes"] += len(data)
+
+        if client["out_bytes"] > self.hard_limit:
+            return False
+
+        # with data already waiting we are waiting for EVENT_WRITE anyway
+        if was_empty:
+            return self._flush(client)
+        return True
+
+    def queue_depth(self, client: dict) -> tuple[int, int]:
+        """(messages, bytes) waiting to be sent to client"""
+        return len(client["outbox"]), client["out_bytes"]
+
+    def queue_report(self, clients: list[dict]) -> str:
+        lines = ["client | queued msgs | queued bytes | dropped snapshots"]
+        for client in clients:
+            msgs, nbytes = self.queue_depth(client)
+            lines.append(
+                f"{client['player_id']:>6} | {msgs:>11} | {nbytes:>12}"
+                f" | {client['dropped']:>17}"
+            )
+        return "\n".join(lines)
+
+    def close(self, client: dict) -> None:
+        conn = client["conn"]
+        try:
+            self.selector.unregister(conn)
+        except (KeyError, ValueError):
+            pass
+        client["outbox"].clear()
+        client["out_bytes"] = 0
+        self.syscalls["close"] += 1
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+    def shutdown(self) -> None:
+        for key in list(self.selector.get_map().values()):
+            try:
+                key.fileobj.close()
+            except OSError:
+                pass
+        self.selector.close()
+
+    def total_syscalls(self) -> int:
+        return sum(self.syscalls.values())
+
+    def _accept_all(self, events: list[tuple]) -> None:
+        # drain the whole backlog, not just one connection per tick
+        while True:
+            self.syscalls["accept"] += 1
+            try:
+                conn, addr = self.server_sock.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            events.append(("connect", conn, addr))
+
+    def _flush(self, client: dict) -> bool:
+        outbox = client["outbox"]
+        conn = client["conn"]
+
+        while outbox:
+            entry = outbox[0]
+            data = entry[0]
+
+            self.syscalls["send"] += 1
+            try:
+                sent = conn.send(data)
+            except (BlockingIOError, InterruptedError):
+                sent = 0
+            except (
+                ConnectionResetError,
+                BrokenPipeError,
+                ConnectionAbortedError,
+                OSError,
+            ):
+                return False
+
+            client["out_bytes"] -= sent
+            if sent < len(data):
+                # kernel buffer is full, keep the rest for EVENT_WRITE
+                entry[0] = data[sent:]
+                entry[2] = entry[2] or sent > 0
+                break
+            outbox.popleft()
+
+        self._want_write(client, bool(outbox))
+        return True
+
+    def _drop_stale(self, client: dict) -> None:
+        # keep reliable messages and a frame that is half way out the door,
+        # a newer snapshot replaces everything else
+        outbox = client["outbox"]
+        for _ in range(len(outbox)):
+            entry = outbox.popleft()
+            if entry[1] or entry[2]:
+                outbox.append(entry)
+            else:
+                client["out_bytes"] -= len(entry[0])
+                client["dropped"] += 1
+
+    def _want_write(self, client: dict, want: bool) -> None:
+        if client["want_write"] == want:
+            return
+        mask = selectors.EVENT_READ
+        if want:
+            mask |= selectors.EVENT_WRITE
+        self.selector.modify(client["conn"], mask, data=client)
+        client["want_write"] = want
+
+    def _read(self, client: dict, events: list[tuple]) -> None:
+        reader = client["reader"]
+        calls = reader.recv_calls
+        try:
+            count = reader.fill(client["conn"])
+        except (
+            ConnectionResetError,
+            ConnectionAbortedError,
+            BrokenPipeError,
+            OSError,
+        ):
+            self.syscalls["recv"] += reader.recv_calls - calls
+            events.append(("closed", client, None))
+            return
+        self.syscalls["recv"] += reader.recv_calls - calls
+
+        # hand over what arrived before the hang up, it may hold a last chat
+        if count:
+            events.append(("data", client, count))
+        if reader.closed:
+            events.append(("closed", client, None))
+
+
+class NetStats:
+    """Syscalls and tick time bucketed by the number of connected clients"""
+
+    def __init__(self) -> None:
+        # client count -> [ticks, syscalls, tick seconds]
+        self.by_clients: dict[int, list] = {}
+
+    def record(self, client_count: int, syscalls: int, tick_seconds: float) -> None:
+        bucket = self.by_clients.setdefault(client_count, [0, 0, 0.0])
+        bucket[0] += 1
+        bucket[1] += syscalls
+        bucket[2] += tick_seconds
+
+    def report(self) -> str:
+        lines = ["clients | ticks | syscalls/tick | tick ms"]
+        for client_count in sorted(self.by_clients):
+            ticks, syscalls, seconds = self.by_clients[client_count]
+            lines.append(
+                f"{client_count:>7} | {ticks:>5} | {syscalls / ticks:>13.2f}"
+                f" | {seconds / ticks * 1000:7.3f}"
+            )
+        return "\n".join(lines)
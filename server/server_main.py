@@ -1,247 +1,769 @@
 # server/server_main.py
 
+import math
+import struct
 import time
-import json
-import socket
+import argparse
 import threading
+from collections import deque
 
 from shared.ecs import World, Position, Input, WorldConfig, Health
+from shared.archetype import ArchetypeWorld
+from shared.spatial import SpatialIndex
 from shared.player import create_player
 from shared.systems.movement_system import movement_system
+from shared.systems.collision_system import collision_system
+
+from shared.protocol import JSON_CODEC, CODECS, SUPPORTED_PROTOCOLS
+from shared.profiler import Profiler
+from shared.scheduler import Schedule
+from shared.tilemap import TileMap
+
+from .chunks import ChunkStreamer
+from .net import ServerNet, NetStats
+from .snapshots import SnapshotHistory, PlayerStates, EntityState, player_state
+from .snapshots import entity_record, make_delta
+from .tick import TickScheduler
 
 HOST = "127.0.0.1"
 PORT = 5000
 
+# world size in pixels, tiles are generated and streamed in chunks as
+# players come near them so this can grow a lot
+WORLD_WIDTH = 500.0
+WORLD_HEIGHT = 500.0
+TILE_SIZE = 32
+# terrain of the tile map
+TILEMAP_SEED = 1
+
 TICK_RATE = 60
 DT = 1.0 / TICK_RATE
 
+# state snapshots per second, may be lower than TICK_RATE
+SEND_RATE = 60
+# most simulation steps run back to back when the server falls behind
+MAX_CATCH_UP_STEPS = 5
+
+# clients send input changes tagged with their tick number (seq) and the
+# server keeps applying the latest one, one client tick per server tick.
+# changes waiting for their tick, the oldest go first when more pile up
+MAX_QUEUED_INPUTS = 8
+# ticks the server runs behind the newest client tick it knows of, so a
+# change that arrives a little late still lands on its own tick
+INPUT_DELAY_TICKS = 2
+# further behind than this the server skips ahead to the client
+MAX_INPUT_LAG = 8
+# ticks past the newest known client tick the last input is held for, more
+# than the keepalive interval; after that the player stops until it hears
+# from the client again
+INPUT_TIMEOUT_TICKS = 30
+
+# what a garbled client message can raise while it is decoded or its fields
+# are checked, the client is dropped instead of the server (FrameTooLarge
+# and json errors are ValueErrors). Handling a checked message is not
+# covered, a bug there stops the server
+BAD_MESSAGE_ERRORS = (ValueError, UnicodeDecodeError, struct.error, KeyError, TypeError)
+
+# store components in numpy backed archetype tables instead of dicts
+USE_ARCHETYPE_WORLD = False
+
+# send each client only what changed since the snapshot it last acked
+USE_DELTA_SNAPSHOTS = True
+
+# push overlapping players apart after they move
+USE_COLLISIONS = True
+
+# threads for ECS systems that touch different components, None runs them
+# on every core on free-threaded python and one after another otherwise
+SYSTEM_WORKERS: int | None = None
+
+# rebuild the snapshot only for players whose Position or Health changed
+# (world change sets) instead of reading every player each send
+USE_CHANGE_TRACKING = True
+
+# clients only hear about players within this distance of their own
+# position (None sends everyone), 600 covers an 800x600 window with margin
+AOI_RADIUS: float | None = 600.0
+
+# longest the loop may block in select, so console commands are noticed
+CONSOLE_POLL_INTERVAL = 0.25
+# how often --net-stats prints its table
+NET_STATS_INTERVAL = 5.0
+
 SERVER_RUNNING = True
 
+# per-phase tick timings and traffic, see the "stats" console command
+PROFILER = Profiler()
+
 
 def console_listener():
     global SERVER_RUNNING
     while SERVER_RUNNING:
-        cmd = input("[server]:").strip().lower()
+        line = input("[server]:").strip()
+        cmd = line.lower()
         if cmd in ("quit", "exit", "stop", "shutdown"):
             print("Server: shutdown command received.")
             SERVER_RUNNING = False
             break
+        if cmd.startswith("stats"):
+            stats_command(line.split()[1:])
+            continue
         if cmd in ("help"):
             print("to shutdown server use 'quit, exit, stop or shutdown'")
-
-
-def main():
+            print("stats [on|off|reset|dump <file>] shows tick phase timings")
+
+
+def stats_command(args: list[str]):
+    if not args:
+        print(PROFILER.report())
+        return
+
+    action = args[0].lower()
+    if action == "on":
+        PROFILER.enabled = True
+        print("Server: profiler on")
+    elif action == "off":
+        PROFILER.enabled = False
+        print("Server: profiler off")
+    elif action == "reset":
+        PROFILER.reset()
+        print("Server: profiler reset")
+    elif action == "dump":
+        path = args[1] if len(args) > 1 else "server_stats.json"
+        try:
+            PROFILER.dump(path)
+        except OSError as e:
+            print(f"Server: could not write {path}: {e}")
+        else:
+            print(f"Server: stats written to {path}")
+    else:
+        print("usage: stats [on|off|reset|dump <file>]")
+
+
+def main(net_stats: bool = False, world_size: tuple[float, float] | None = None):
     global SERVER_RUNNING
 
-    world = World()
-    world.set_resource(WorldConfig(width=500.0, height=500.0, tile_size=32))
-    # Each client: { "conn", "addr", "player_id", "entity", "buffer" }
+    world_width, world_height = world_size or (WORLD_WIDTH, WORLD_HEIGHT)
+    world = ArchetypeWorld() if USE_ARCHETYPE_WORLD else World()
+    world_config = WorldConfig(
+        width=world_width, height=world_height, tile_size=TILE_SIZE
+    )
+    world.set_resource(world_config)
+    world.set_resource(SpatialIndex(cell_size=world_config.tile_size))
+    tilemap = TileMap(world_width, world_height, TILE_SIZE, seed=TILEMAP_SEED)
+    world.set_resource(tilemap)
+    streamer = ChunkStreamer(tilemap)
+    # systems run every tick, in this order unless they do not conflict
+    schedule = Schedule(workers=SYSTEM_WORKERS)
+    schedule.add(movement_system, batched=USE_ARCHETYPE_WORLD)
+    if USE_COLLISIONS:
+        schedule.add(collision_system)
+
+    player_states = None
+    if USE_CHANGE_TRACKING:
+        world.track_changes(Position, Health)
+        player_states = PlayerStates()
+    # Each client: { "conn", "addr", "player_id", "entity", "reader", "codec",
+    #                "acked", "views", "inputs", "input", "input_seq",
+    #                "client_seq", "last_change", "chunks", "chunk_center",
+    #                "chunks_pending" }
     clients: list[dict] = []
     next_player_id = 1
+    history = SnapshotHistory()
 
     print("Server: world initialized!")
 
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server_sock:
-        server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        server_sock.bind((HOST, PORT))
-        server_sock.listen()
-        server_sock.setblocking(False)  # non-blocking accept
-        print(f"Server: listening on {HOST}:{PORT}")
-        print("type help for info")
+    net = ServerNet(HOST, PORT)
+    stats = NetStats() if net_stats else None
+    last_report = time.monotonic()
+    last_warning = 0.0
+    print(f"Server: listening on {HOST}:{PORT}")
+    print("type help for info")
 
-        threading.Thread(target=console_listener, daemon=True).start()
+    threading.Thread(target=console_listener, daemon=True).start()
 
-        while SERVER_RUNNING:
-            frame_start = time.time()
+    scheduler = TickScheduler(TICK_RATE, SEND_RATE, MAX_CATCH_UP_STEPS)
+    tick_syscalls = net.total_syscalls()
+    tick_io_time = 0.0
 
-            # --- 1. Accept new clients (non-blocking) ---
-            try:
-                conn, addr = server_sock.accept()
-            except BlockingIOError:
-                conn = None
+    try:
+        while SERVER_RUNNING:
+            # --- 1. Wait for socket activity until the next tick is due ---
+            io_start = time.monotonic()
+            timeout = min(scheduler.time_until_next(), CONSOLE_POLL_INTERVAL)
+            events = net.poll(timeout)
+            PROFILER.add("wait", net.last_wait)
+            PROFILER.add("poll", time.monotonic() - io_start - net.last_wait)
+            disconnected_clients: list[dict] = []
 
-            if conn is not None:
-                conn.setblocking(False)
-                player_id = next_player_id
-                next_player_id += 1
+            for kind, target, payload in events:
+                # --- 2. Accept every pending client ---
+                if kind == "connect":
+                    started = PROFILER.start()
+                    client = accept_client(world, target, payload, next_player_id)
+                    next_player_id += 1
+                    net.register(client)
+                    clients.append(client)
+                    if not send(net, client, welcome_message(world, client)):
+                        print(f"Server: failed to send welcome to {client['addr']}")
+                    PROFILER.record("accept", started)
+
+                # --- 3. Receive input from clients that have data ---
+                elif kind == "data":
+                    started = PROFILER.start()
+                    PROFILER.count("bytes_in", payload)
+                    handle_client_data(
+                        world, net, clients, target, disconnected_clients
+                    )
+                    PROFILER.record("receive", started)
 
-                cfg = world.get_resource(WorldConfig)
-                tile_size = cfg.tile_size if cfg is not None else 32
+                elif kind == "closed":
+                    print(f"Server: client {target['player_id']} disconnected")
+                    disconnected_clients.append(target)
 
-                tile_x, tile_y = 10, 15
-                spawn_x = tile_x * tile_size
-                spawn_y = tile_y * tile_size
+            # --- 4. Remove disconnected clients ---
+            started = PROFILER.start()
+            remove_clients(world, net, clients, disconnected_clients)
+            PROFILER.record("remove", started)
+            tick_io_time += time.monotonic() - io_start - net.last_wait
 
-                color = (0, 200, 0) if player_id == 1 else (200, 0, 0)
+            if not SERVER_RUNNING:
+                break
 
-                entity = create_player(
-                    world, spawn_x, spawn_y, player_id=player_id, color=color
+            steps, send_due = scheduler.advance()
+            if steps == 0 and not send_due:
+                continue
+
+            # --- 5. Run ECS tick (several when catching up) ---
+            started = PROFILER.start()
+            for _ in range(steps):
+                apply_inputs(world, clients)
+                schedule.run(world, DT, profiler=PROFILER)
+            PROFILER.record("ecs", started)
+
+            if not send_due:
+                PROFILER.add("tick", scheduler.finish(steps))
+                continue
+
+            # --- 6. Build state of all players ---
+            started = PROFILER.start()
+            if player_states is not None:
+                states = player_states.update(world)
+                # changes pile up over the ticks between two sends
+                world.clear_changes()
+            else:
+                states = snapshot_states(world, clients)
+            views = visible_players(world, clients)
+            PROFILER.record("build", started)
+
+            # --- 7. Send state to all clients ---
+            started = PROFILER.start()
+            # snapshots carry the tick they were taken on, clients use it to
+            # place them in time for interpolation
+            tick = scheduler.sim_ticks
+            if USE_DELTA_SNAPSHOTS:
+                disconnected_clients = send_deltas(
+                    net, clients, history, states, views, tick
+                )
+            else:
+                disconnected_clients = send_states(net, clients, states, views, tick)
+            disconnected_clients += stream_chunks(net, clients, streamer, states)
+            for client in disconnected_clients:
+                print(
+                    f"Server: client {client['player_id']} dropped while sending state"
                 )
 
-                client_info = {
-                    "conn": conn,
-                    "addr": addr,
-                    "player_id": player_id,
-                    "entity": entity,
-                    "buffer": b"",
-                }
-
-                clients.append(client_info)
-
-                print(f"Server: client {player_id} connected from {addr}")
-
-                # send welcome message with player_id
-                welcome_msg = {
-                    "type": "welcome",
-                    "player_id": player_id,
-                    "world_width": cfg.width if cfg else None,
-                    "world_height": cfg.height if cfg else None,
-                }
-                try:
-                    conn.sendall((json.dumps(welcome_msg) + "\n").encode("utf-8"))
-                except OSError:
-                    print(f"Server: failed to send welcome to {addr}")
-
-            # --- 2. Receive input from each client ---
-            disconnected_clients: list[dict] = []
+            remove_clients(world, net, clients, disconnected_clients)
+            PROFILER.record("send", started)
+            tick_work = scheduler.finish(steps)
+            PROFILER.add("tick", tick_work)
 
-            for client in clients:
-                conn = client["conn"]
-                entity = client["entity"]
-
-                try:
-                    data = conn.recv(4096)
-                    if not data:
-                        print(
-                            f"Server: client {client['player_id']} disconnected (empty recv)"
-                        )
-                        disconnected_clients.append(client)
-                        continue
-
-                    client["buffer"] += data
-
-                    while b"\n" in client["buffer"]:
-                        line, client["buffer"] = client["buffer"].split(b"\n", 1)
-                        if not line:
-                            continue
-                        msg = json.loads(line.decode("utf-8"))
-                        msg_type = msg.get("type")
-
-                        if msg.get("type") == "input":
-                            move_x = float(msg.get("move_x", 0.0))
-                            move_y = float(msg.get("move_y", 0.0))
-
-                            input_comp = world.get_component(entity, Input)
-                            if input_comp is not None:
-                                input_comp.move_x = move_x
-                                input_comp.move_y = move_y
-
-                        elif msg_type == "chat":
-                            text = str(msg.get("text", "")).strip()
-                            if text:
-                                sender_id = client["player_id"]
-                                chat_msg = {
-                                    "type": "chat",
-                                    "from": sender_id,
-                                    "text": text,
-                                }
-                                chat_bytes = (json.dumps(chat_msg) + "\n").encode(
-                                    "utf-8"
-                                )
-
-                                for other in clients:
-                                    try:
-                                        other["conn"].sendall(chat_bytes)
-
-                                    except (
-                                        ConnectionResetError,
-                                        BrokenPipeError,
-                                        ConnectionAbortedError,
-                                        OSError,
-                                    ):
-                                        disconnected_clients.append(other)
-
-                except BlockingIOError:
-                    # no data this frame for this client
-                    pass
-                except (
-                    ConnectionResetError,
-                    ConnectionAbortedError,
-                    BrokenPipeError,
-                    OSError,
-                ):
-                    print(
-                        f"Server: client {client['player_id']} disconnected (exception)"
-                    )
-                    disconnected_clients.append(client)
+            if stats is not None:
+                syscalls = net.total_syscalls()
+                stats.record(
+                    len(clients), syscalls - tick_syscalls, tick_work + tick_io_time
+                )
+                tick_syscalls = syscalls
+
+                now = time.monotonic()
+                if now - last_report >= NET_STATS_INTERVAL:
+                    print(stats.report())
+                    print(net.queue_report(clients))
+                    print(scheduler.report())
+                    last_report = now
+            tick_io_time = 0.0
+
+            if scheduler.saturated():
+                now = time.monotonic()
+                if now - last_warning >= 1.0:
+                    print(f"Server: can't keep up! {scheduler.report()}")
+                    last_warning = now
+    finally:
+        net.shutdown()
+        schedule.close()
+
+    if stats is not None:
+        print(stats.report())
+    print(f"Server: {scheduler.report()}")
 
-            # --- 3. Remove disconnected clients ---
-            for client in disconnected_clients:
-                try:
-                    client["conn"].close()
-                except OSError:
-                    pass
-                if client in clients:
-                    clients.remove(client)
+    print("Server: shutting down")
 
-            if not SERVER_RUNNING:
+
+def send(net, client: dict, msg: dict, reliable: bool = True) -> bool:
+    # state snapshots go out through send_snapshot with reliable=False, the net
+    # layer may drop them for a client that is not keeping up since the next
+    # one supersedes them
+    data = client["codec"].encode(msg)
+    PROFILER.count("msgs_out")
+    PROFILER.count("bytes_out", len(data))
+    return net.send(client, data, reliable)
+
+
+def broadcast(
+    net, clients: list[dict], msg: dict, reliable: bool = True
+) -> list[dict]:
+    """Send msg to every client, encoded once per protocol, returns the failures"""
+    encoded: dict[str, bytes] = {}
+    failed = []
+    for client in clients:
+        codec = client["codec"]
+        data = encoded.get(codec.name)
+        if data is None:
+            data = encoded[codec.name] = codec.encode(msg)
+        PROFILER.count("msgs_out")
+        PROFILER.count("bytes_out", len(data))
+        if not net.send(client, data, reliable):
+            failed.append(client)
+    return failed
+
+
+def accept_client(world, conn, addr, player_id: int) -> dict:
+    cfg = world.get_resource(WorldConfig)
+    tile_size = cfg.tile_size if cfg is not None else 32
+
+    tile_x, tile_y = 10, 15
+    spawn_x = tile_x * tile_size
+    spawn_y = tile_y * tile_size
+
+    color = (0, 200, 0) if player_id == 1 else (200, 0, 0)
+
+    entity = create_player(world, spawn_x, spawn_y, player_id=player_id, color=color)
+
+    print(f"Server: client {player_id} connected from {addr}")
+
+    return {
+        "conn": conn,
+        "addr": addr,
+        "player_id": player_id,
+        "entity": entity,
+        # every connection starts on json, the client may switch after welcome
+        "codec": JSON_CODEC,
+        # last snapshot seq the client applied, 0 = none yet
+        "acked": 0,
+        # seq -> player ids that snapshot contained, when AOI is on
+        "views": {},
+        # input changes (seq, move_x, move_y) waiting for their tick, the
+        # move being applied and the client tick it was applied for last
+        # (None until the first input, it can be below 1 at the start)
+        "inputs": deque(),
+        "input": (0.0, 0.0),
+        "input_seq": None,
+        # newest client tick heard of and newest change queued
+        "client_seq": 0,
+        "last_change": 0,
+        # tile chunks the client holds, the chunk its player was in when
+        # last streamed and whether more are due
+        "chunks": set(),
+        "chunk_center": None,
+        "chunks_pending": False,
+    }
+
+
+def welcome_message(world, client: dict) -> dict:
+    cfg = world.get_resource(WorldConfig)
+    tilemap = world.get_resource(TileMap)
+    # send welcome message with player_id
+    return {
+        "type": "welcome",
+        "player_id": client["player_id"],
+        "world_width": cfg.width if cfg else None,
+        "world_height": cfg.height if cfg else None,
+        "tile_size": cfg.tile_size if cfg else None,
+        "chunk_tiles": tilemap.chunk_tiles if tilemap is not None else None,
+        "protocols": SUPPORTED_PROTOCOLS,
+        # the client predicts its own movement with the same step
+        "tick_rate": TICK_RATE,
+        "send_rate": SEND_RATE,
+    }
+
+
+def handle_client_data(
+    world, net, clients: list[dict], client: dict, disconnected: list
+):
+    reader = client["reader"]
+
+    while True:
+        # decode one message at a time, a "protocol" message switches the codec
+        # for everything that follows it in the buffer
+        try:
+            msg = reader.next_message(client["codec"])
+            if msg is None:
                 break
+            msg = checked_message(msg)
+        except BAD_MESSAGE_ERRORS as exc:
+            print(f"Server: dropping client {client['player_id']}: {exc!r}")
+            disconnected.append(client)
+            break
+        handle_message(net, clients, client, msg, disconnected)
+
+
+def checked_message(msg: dict) -> dict:
+    """msg with the fields the server reads checked and converted, raises one
+    of BAD_MESSAGE_ERRORS when the client sent something it cannot use"""
+    msg_type = msg.get("type")
+
+    if msg_type == "protocol":
+        return {"type": "protocol", "name": str(msg.get("name"))}
+
+    if msg_type == "ack":
+        return {"type": "ack", "seq": _seq(msg.get("seq", 0))}
+
+    if msg_type == "input":
+        changes = msg.get("inputs", [])
+        if not isinstance(changes, list):
+            raise TypeError(f"inputs is {type(changes).__name__}, not a list")
+        return {
+            "type": "input",
+            "seq": _seq(msg.get("seq", 0)),
+            "inputs": [_input_change(change) for change in changes],
+        }
+
+    if msg_type == "chat":
+        return {"type": "chat", "text": str(msg.get("text", "")).strip()}
+
+    return msg
+
+
+def handle_message(net, clients: list[dict], client: dict, msg: dict, disconnected):
+    """Act on a message that went through checked_message()"""
+    PROFILER.count("msgs_in")
+    msg_type = msg.get("type")
+
+    if msg_type == "protocol":
+        codec = CODECS.get(msg["name"])
+        if codec is None:
+            return
+        # ack in the old codec, everything after it uses the new one
+        if not send(net, client, {"type": "protocol", "name": codec.name}):
+            disconnected.append(client)
+        client["codec"] = codec
+        print(f"Server: client {client['player_id']} switched to {codec.name}")
+
+    elif msg_type == "ack":
+        if msg["seq"] > client["acked"]:
+            client["acked"] = msg["seq"]
+
+    elif msg_type == "input":
+        client["client_seq"] = max(client["client_seq"], msg["seq"])
+        inputs = client["inputs"]
+        # every message repeats the last few changes, keep the new ones
+        for seq, move_x, move_y in msg["inputs"]:
+            if seq <= client["last_change"]:
+                continue
+            client["last_change"] = seq
+            inputs.append((seq, move_x, move_y))
+            if len(inputs) > MAX_QUEUED_INPUTS:
+                inputs.popleft()
+
+    elif msg_type == "chat":
+        if msg["text"]:
+            chat_msg = {
+                "type": "chat",
+                "from": client["player_id"],
+                "text": msg["text"],
+            }
+            disconnected.extend(broadcast(net, clients, chat_msg))
+
+
+def _seq(value) -> int:
+    """A client tick or snapshot number, ValueError if value is not one"""
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise ValueError(f"bad seq {value!r}")
+    return value
+
+
+def _input_change(change) -> tuple[int, float, float]:
+    """(seq, move_x, move_y) of one input change, moves clamped to -1..1"""
+    if not isinstance(change, (list, tuple)) or len(change) != 3:
+        raise ValueError(f"bad input change {change!r}")
+    seq, move_x, move_y = change
+    moves = []
+    for move in (move_x, move_y):
+        if (
+            isinstance(move, bool)
+            or not isinstance(move, (int, float))
+            or not math.isfinite(move)
+        ):
+            raise ValueError(f"bad input change {change!r}")
+        moves.append(min(1.0, max(-1.0, float(move))))
+    return _seq(seq), moves[0], moves[1]
+
+
+def apply_inputs(world, clients: list[dict]):
+    """Advance every client by one of its ticks and set its Input component.
+
+    The last input change keeps being applied until the next one comes due,
+    so a steady player costs nothing but a keepalive now and then. The tick
+    applied goes back to the client as input_ack for its reconciliation.
+    When a change turns up for a tick that was already simulated, or the
+    server falls too far behind, the client tick count is realigned (that
+    one change gets corrected on the client).
+    """
+    for client in clients:
+        input_comp = world.get_component(client["entity"], Input)
+        if input_comp is None:
+            continue
+
+        newest = client["client_seq"]
+        if newest == 0:
+            # no input yet
+            continue
+
+        inputs = client["inputs"]
+        if client["input_seq"] is None:
+            seq = newest - INPUT_DELAY_TICKS
+        else:
+            seq = client["input_seq"] + 1
+        if newest - seq > MAX_INPUT_LAG:
+            seq = newest - INPUT_DELAY_TICKS
+        elif inputs and inputs[0][0] < seq:
+            # keep the margin after realigning too
+            seq = inputs[0][0] - INPUT_DELAY_TICKS
+        elif seq > newest + INPUT_TIMEOUT_TICKS:
+            # client went quiet, stop instead of walking on forever
+            input_comp.move_x = input_comp.move_y = 0.0
+            continue
+
+        while inputs and inputs[0][0] <= seq:
+            _change_seq, move_x, move_y = inputs.popleft()
+            client["input"] = (move_x, move_y)
+
+        client["input_seq"] = seq
+        input_comp.move_x, input_comp.move_y = client["input"]
+
+
+def snapshot_states(world, clients: list[dict]) -> dict[int, EntityState]:
+    states: dict[int, EntityState] = {}
+    for client in clients:
+        entity = client["entity"]
+        pos = world.get_component(entity, Position)
+        health = world.get_component(entity, Health)
+
+        if pos is not None:
+            states[client["player_id"]] = player_state(pos, health)
+
+    return states
+
+
+def build_state(states: dict[int, EntityState], visible=None, tick: int = 0) -> dict:
+    players_state = [
+        entity_record(pid, state)
+        for pid, state in states.items()
+        if visible is None or pid in visible
+    ]
+    return {"type": "state", "tick": tick, "players": players_state}
+
+
+def visible_players(world, clients: list[dict]) -> dict[int, frozenset] | None:
+    """player_id -> player ids inside that client's area of interest"""
+    index = world.get_resource(SpatialIndex)
+    if AOI_RADIUS is None or index is None:
+        return None
+
+    entity_players = {client["entity"]: client["player_id"] for client in clients}
+    views: dict[int, frozenset] = {}
+
+    for client in clients:
+        player_id = client["player_id"]
+        pos = index.position(client["entity"])
+        if pos is None:
+            views[player_id] = frozenset((player_id,))
+            continue
+
+        nearby = index.query_radius(pos[0], pos[1], AOI_RADIUS)
+        visible = {entity_players[e] for e in nearby if e in entity_players}
+        visible.add(player_id)
+        views[player_id] = frozenset(visible)
+
+    return views
+
+
+def send_deltas(
+    net,
+    clients: list[dict],
+    history: SnapshotHistory,
+    states: dict[int, EntityState],
+    views: dict[int, frozenset] | None = None,
+    tick: int = 0,
+) -> list[dict]:
+    """Send every client a delta against its acked snapshot, returns the failures"""
+    seq = history.record(states)
+
+    if views is not None:
+        return send_filtered_deltas(net, clients, history, seq, states, views, tick)
+
+    # clients acked on the same snapshot get the same delta, build it once
+    deltas: dict[int, dict] = {}
+    encoded: dict[tuple[int, str], bytes] = {}
+    failed = []
+
+    for client in clients:
+        baseline = history.get(client["acked"])
+        base = client["acked"] if baseline is not None else -1
+
+        key = (base, client["codec"].name)
+        data = encoded.get(key)
+        if data is None:
+            delta = deltas.get(base)
+            if delta is None:
+                delta = deltas[base] = make_delta(seq, base, baseline, states, tick)
+            data = encoded[key] = client["codec"].encode(delta)
+
+        if not send_snapshot(net, client, data):
+            failed.append(client)
+
+    return failed
+
+
+def send_filtered_deltas(
+    net,
+    clients: list[dict],
+    history: SnapshotHistory,
+    seq: int,
+    states: dict[int, EntityState],
+    views: dict[int, frozenset],
+    tick: int = 0,
+) -> list[dict]:
+    # every client has its own view, so its baseline is the acked snapshot
+    # limited to what it could see back then, which is exactly the snapshot
+    # the client rebuilt for that seq. Players that walk into or out of the
+    # view show up as spawn/despawn records (enter/leave), also when they
+    # did both in snapshots the client got but did not ack.
+    failed = []
+
+    for client in clients:
+        visible = views[client["player_id"]]
+        current = {pid: states[pid] for pid in visible if pid in states}
+
+        client_views = client["views"]
+        client_views[seq] = visible
+        client_views.pop(seq - history.size, None)
+
+        base = client["acked"]
+        base_states = history.get(base)
+        base_view = client_views.get(base)
+        if base_states is None or base_view is None:
+            base = -1
+            baseline = None
+        else:
+            baseline = {
+                pid: base_states[pid] for pid in base_view if pid in base_states
+            }
+
+        delta = make_delta(seq, base, baseline, current, tick)
+        if not send_snapshot(net, client, client["codec"].encode(delta)):
+            failed.append(client)
+
+    return failed
+
+
+def send_states(
+    net,
+    clients: list[dict],
+    states: dict[int, EntityState],
+    views: dict[int, frozenset] | None = None,
+    tick: int = 0,
+) -> list[dict]:
+    """Send every client a full state message, returns the failures"""
+    # without AOI everyone gets the same state, encode it once per protocol
+    encoded: dict[str, bytes] = {}
+    failed = []
+
+    for client in clients:
+        codec = client["codec"]
+        if views is not None:
+            visible = views[client["player_id"]]
+            data = codec.encode(build_state(states, visible, tick))
+        else:
+            data = encoded.get(codec.name)
+            if data is None:
+                data = encoded[codec.name] = codec.encode(
+                    build_state(states, tick=tick)
+                )
 
-            # --- 4. Run ECS tick ---
-            movement_system(world, DT)
-
-            # --- 5. Build state of all players ---
-            players_state = []
-            for client in clients:
-                entity = client["entity"]
-                player_id = client["player_id"]
-                pos = world.get_component(entity, Position)
-                health = world.get_component(entity, Health)
-
-                if pos is not None:
-                    player_data = {"id": player_id, "x": pos.x, "y": pos.y}
-
-                    if health is not None:
-                        player_data["hp"] = health.current
-                        player_data["hp_max"] = health.maximum
-
-                    players_state.append(player_data)
-
-            state_msg = {"type": "state", "players": players_state}
-            state_bytes = (json.dumps(state_msg) + "\n").encode("utf-8")
-
-            # --- 6. Send state to all clients ---
-            disconnected_clients = []
-            for client in clients:
-                try:
-                    client["conn"].sendall(state_bytes)
-                except (
-                    ConnectionResetError,
-                    BrokenPipeError,
-                    ConnectionAbortedError,
-                    OSError,
-                ):
-                    print(
-                        f"Server: client {client['player_id']} disconnected while sending state"
-                    )
-                    disconnected_clients.append(client)
+        if not send_snapshot(net, client, data):
+            failed.append(client)
+
+    return failed
+
+
+def send_snapshot(net, client: dict, data: bytes) -> bool:
+    # the last input applied goes in front of the snapshot in the same send, so
+    # a snapshot dropped under backpressure takes its input ack with it
+    if client["input_seq"] is not None and client["input_seq"] > 0:
+        input_ack = {"type": "input_ack", "seq": client["input_seq"]}
+        data = client["codec"].encode(input_ack) + data
+        PROFILER.count("msgs_out")
+    PROFILER.count("msgs_out")
+    PROFILER.count("bytes_out", len(data))
+    return net.send(client, data, reliable=False)
+
+
+def stream_chunks(
+    net, clients: list[dict], streamer: ChunkStreamer, states: dict
+) -> list[dict]:
+    """Send each client the tile chunks around its player, returns failures"""
+    failed = []
+    for client in clients:
+        state = states.get(client["player_id"])
+        if state is None:
+            continue
+        for msg in streamer.update(client, state[0], state[1]):
+            if msg["type"] == "chunk":
+                PROFILER.count("chunks_sent")
+            else:
+                PROFILER.count("chunks_dropped", len(msg["chunks"]))
+            if not send(net, client, msg):
+                failed.append(client)
+                break
+    evicted = streamer.maybe_evict(clients)
+    if evicted:
+        PROFILER.count("chunks_evicted", evicted)
+    return failed
 
-            for client in disconnected_clients:
-                try:
-                    client["conn"].close()
-                except OSError:
-                    pass
-                if client in clients:
-                    clients.remove(client)
-
-            # --- 7. Sleep to maintain tickrate ---
-            elapsed = time.time() - frame_start
-            sleep_time = DT - elapsed
-            if sleep_time > 0:
-                time.sleep(sleep_time)
 
-    print("Server: shutting down")
+def remove_clients(world, net, clients: list[dict], disconnected: list[dict]):
+    for client in disconnected:
+        if client in clients:
+            net.close(client)
+            clients.remove(client)
+            # the player leaves the world with the connection
+            world.destroy_entity(client["entity"])
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--net-stats",
+        action="store_true",
+        help="report syscalls and tick time per connected client count",
+    )
+    parser.add_argument(
+        "--world-size",
+        type=float,
+        nargs=2,
+        metavar=("WIDTH", "HEIGHT"),
+        help=f"world size in pixels (default {WORLD_WIDTH:g} {WORLD_HEIGHT:g})",
+    )
+    args = parser.parse_args()
+    main(net_stats=args.net_stats, world_size=args.world_size)
@@ -0,0 +1,135 @@
+# server/snapshots.py
+from typing import Optional
+
+from shared.ecs import Position, Health, Player
+
+# how many past snapshots we keep to delta against
+SNAPSHOT_HISTORY = 64
+
+# per entity state that goes on the wire: (x, y, hp, hp_max)
+EntityState = tuple[float, float, int, int]
+
+
+class SnapshotHistory:
+    """Ring of recent world snapshots, keyed by sequence number.
+
+    Snapshots are shared by all clients, each client only remembers the last
+    seq it acknowledged. A baseline that fell out of the ring means the next
+    delta for that client is a full snapshot.
+    """
+
+    def __init__(self, size: int = SNAPSHOT_HISTORY) -> None:
+        self.size = size
+        self.seq = 0
+        self._states: dict[int, dict[int, EntityState]] = {}
+
+    def record(self, states: dict[int, EntityState]) -> int:
+        self.seq += 1
+        self._states[self.seq] = states
+        self._states.pop(self.seq - self.size, None)
+        return self.seq
+
+    def get(self, seq: int) -> Optional[dict[int, EntityState]]:
+        return self._states.get(seq)
+
+
+def player_state(pos: Position, health: Optional[Health]) -> EntityState:
+    if health is None:
+        # same as what the client assumes when hp is missing
+        return (pos.x, pos.y, 100, 100)
+    return (pos.x, pos.y, health.current, health.maximum)
+
+
+class PlayerStates:
+    """Snapshot states of all players, kept up to date from change sets.
+
+    Only players whose Position or Health changed since the last update are
+    read from the world again, so an idle server builds a snapshot without
+    touching every entity. The world has to track both types from before
+    the first player is created, and have its changes cleared after each
+    update().
+    """
+
+    def __init__(self) -> None:
+        self._states: dict[int, EntityState] = {}
+        # entity -> player id, for entities that were destroyed
+        self._players: dict[int, int] = {}
+
+    def update(self, world) -> dict[int, EntityState]:
+        positions = world.changes(Position)
+        healths = world.changes(Health)
+
+        for entity in positions.removed:
+            player_id = self._players.pop(entity, None)
+            if player_id is not None:
+                self._states.pop(player_id, None)
+
+        for entity in positions.dirty() | healths.dirty():
+            pos = world.get_component(entity, Position)
+            if pos is None:
+                continue
+            player_id = self._players.get(entity)
+            if player_id is None:
+                player = world.get_component(entity, Player)
+                if player is None:
+                    continue
+                player_id = self._players[entity] = player.id
+            self._states[player_id] = player_state(
+                pos, world.get_component(entity, Health)
+            )
+
+        # history keeps the dict it is given, so hand out a copy
+        return dict(self._states)
+
+
+def entity_record(entity_id: int, state: EntityState) -> dict:
+    x, y, hp, hp_max = state
+    return {"id": entity_id, "x": x, "y": y, "hp": hp, "hp_max": hp_max}
+
+
+def make_delta(
+    seq: int,
+    base: int,
+    baseline: Optional[dict[int, EntityState]],
+    current: dict[int, EntityState],
+    tick: int = 0,
+) -> dict:
+    """Delta from baseline to current, or a full snapshot if baseline is None.
+
+    The client has to apply it to its copy of the base snapshot, not to
+    what it last applied: deltas sent before its next ack all share that
+    base, so one that arrives after another would not undo what the first
+    spawned or changed (client/snapshots.py). tick is the server tick the
+    snapshot was taken on.
+    """
+    if baseline is None:
+        return {
+            "type": "delta",
+            "seq": seq,
+            "tick": tick,
+            "base": -1,
+            "spawn": [entity_record(eid, state) for eid, state in current.items()],
+            "update": [],
+            "despawn": [],
+        }
+
+    spawn = []
+    update = []
+    for entity_id, state in current.items():
+        old = baseline.get(entity_id)
+        if old is None:
+            spawn.append(entity_record(entity_id, state))
+        elif old != state:
+            update.append(entity_record(entity_id, state))
+
+    despawn = [entity_id for entity_id in baseline if entity_id not in current]
+
+    return {
+        "type": "delta",
+        "seq": seq,
+        "tick": tick,
+        "base": base,
+        "spawn": spawn,
+        "update": update,
+        "despawn": despawn,
+    }
@@ -0,0 +1,138 @@
+# server/tick.py
+import math
+import time
+
+
+class TickScheduler:
+    """Fixed timestep scheduler driven by a monotonic clock.
+
+    Real elapsed time goes into an accumulator and is paid out in whole
+    simulation steps, so sleep jitter never adds up and the long run rate
+    stays at sim_rate. If the server falls behind, at most max_catch_up
+    steps run back to back and the rest of the backlog is dropped.
+    Network sends have their own rate and accumulator.
+
+        steps, send = scheduler.advance()
+        for _ in range(steps):
+            simulate(scheduler.dt)
+        if send:
+            send_state()
+        scheduler.finish()
+    """
+
+    def __init__(
+        self,
+        sim_rate: float = 60.0,
+        send_rate: float = 60.0,
+        max_catch_up: int = 5,
+        clock=time.monotonic,
+    ) -> None:
+        self.sim_rate = sim_rate
+        self.send_rate = send_rate
+        self.dt = 1.0 / sim_rate
+        self.send_dt = 1.0 / send_rate
+        self.max_catch_up = max_catch_up
+        self.clock = clock
+
+        now = clock()
+        self._last = now
+        self._acc = 0.0
+        self._send_acc = 0.0
+        self._work_start = now
+
+        # -- accounting
+        self.sim_ticks = 0
+        self.sends = 0
+        self.overruns = 0  # advance() batches whose work went over budget
+        self.catch_up_steps = 0  # extra steps run because we were behind
+        self.dropped_steps = 0  # steps skipped past max_catch_up
+        self.late_total = 0.0
+        self.late_max = 0.0
+        self._late_samples = 0
+
+        self._window_start = now
+        self._window_ticks = 0
+        self._window_sends = 0
+        self.achieved_hz = 0.0
+        self.achieved_send_hz = 0.0
+
+    def time_until_next(self) -> float:
+        """Seconds until the next step or send is due (0 if already due)"""
+        now = self.clock()
+        elapsed = now - self._last
+        until_step = self.dt - (self._acc + elapsed)
+        until_send = self.send_dt - (self._send_acc + elapsed)
+        return max(0.0, min(until_step, until_send))
+
+    def advance(self) -> tuple[int, bool]:
+        """Take the time elapsed since the last call, returns
+        (simulation steps to run now, whether a network send is due)"""
+        now = self.clock()
+        elapsed = now - self._last
+        self._last = now
+        self._work_start = now
+
+        self._acc += elapsed
+        self._send_acc += elapsed
+
+        steps = 0
+        if self._acc >= self.dt:
+            steps = math.floor(self._acc / self.dt)
+            # how long ago the oldest pending step was due
+            late = self._acc - self.dt
+            self.late_total += late
+            self.late_max = max(self.late_max, late)
+            self._late_samples += 1
+
+            if steps > self.max_catch_up:
+                self.dropped_steps += steps - self.max_catch_up
+                steps = self.max_catch_up
+                # forget the backlog, keep the phase of the tick grid
+                self._acc %= self.dt
+            else:
+                self._acc -= steps * self.dt
+
+            self.catch_up_steps += steps - 1
+            self.sim_ticks += steps
+            self._window_ticks += steps
+
+        send = False
+        if self._send_acc >= self.send_dt:
+            send = True
+            # never queue up more than one send
+            self._send_acc = min(self._send_acc - self.send_dt, self.send_dt)
+            self.sends += 1
+            self._window_sends += 1
+
+        window = now - self._window_start
+        if window >= 1.0:
+            self.achieved_hz = self._window_ticks / window
+            self.achieved_send_hz = self._window_sends / window
+            self._window_start = now
+            self._window_ticks = 0
+            self._window_sends = 0
+
+        return steps, send
+
+    def finish(self, steps: int = 1) -> float:
+        """Mark the end of the work started by advance(), returns its duration"""
+        work = self.clock() - self._work_start
+        if steps and work > self.dt * steps:
+            self.overruns += 1
+        return work
+
+    def saturated(self) -> bool:
+        """True once the achieved rate is clearly below the target rate"""
+        if self.sim_ticks <= self.sim_rate:
+            return False
+        return self.achieved_hz < 0.95 * self.sim_rate
+
+    def report(self) -> str:
+        late_avg = self.late_total / max(1, self._late_samples)
+        return (
+            f"tick: {self.achieved_hz:.1f}/{self.sim_rate:g} Hz,"
+            f" send {self.achieved_send_hz:.1f}/{self.send_rate:g} Hz,"
+            f" overruns {self.overruns}, catch-up steps {self.catch_up_steps},"
+            f" dropped steps {self.dropped_steps},"
+            f" late avg {late_avg * 1000:.2f} ms max {self.late_max * 1000:.2f} ms"
+        )
@@ -0,0 +1,383 @@
+# shared/archetype.py
+from typing import Iterator, Optional, Type
+
+import numpy as np
+
+from .ecs import Position, Velocity, Input, Health, T
+from .ecs import EntityAllocator, ChangeSet, ChangeTracking, _writing
+
+# components made only of numbers are stored as one numpy column per field,
+# everything else (Renderable, Player, tags) stays a python object per row
+NUMERIC_COMPONENTS: dict[type, dict[str, type]] = {
+    Position: {"x": np.float64, "y": np.float64},
+    Velocity: {"vx": np.float64, "vy": np.float64},
+    Input: {"move_x": np.float64, "move_y": np.float64},
+    Health: {"current": np.int64, "maximum": np.int64},
+}
+
+_INITIAL_CAPACITY = 16
+
+
+class Archetype:
+    """Table holding every entity that has exactly the same set of components"""
+
+    def __init__(self, signature: frozenset[type]) -> None:
+        self.signature = signature
+        self.entities: list[int] = []
+        self.capacity = _INITIAL_CAPACITY
+
+        self.columns: dict[type, dict[str, np.ndarray]] = {}
+        self.objects: dict[type, list] = {}
+        for comp_type in signature:
+            layout = NUMERIC_COMPONENTS.get(comp_type)
+            if layout is None:
+                self.objects[comp_type] = []
+            else:
+                self.columns[comp_type] = {
+                    name: np.zeros(self.capacity, dtype=dtype)
+                    for name, dtype in layout.items()
+                }
+
+        # cached transitions: component type -> archetype with that type added
+        self.add_edges: dict[type, "Archetype"] = {}
+        # arrays built from entities/objects for batch systems, dropped on
+        # every row change
+        self._derived: dict[object, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def column(self, comp_type: type, field: str) -> np.ndarray:
+        """View of the live rows of one numeric field (writes go to the table)"""
+        return self.columns[comp_type][field][: len(self.entities)]
+
+    def entity_array(self) -> np.ndarray:
+        """Entities of the rows as an int64 array, cached until rows change"""
+        array = self._derived.get("entities")
+        if array is None:
+            array = self._derived["entities"] = np.array(self.entities, np.int64)
+        return array
+
+    def object_column(self, comp_type: type, field: str) -> np.ndarray:
+        """One numeric field of an object component (Renderable.width) as a
+        float64 array, cached until rows change or a component is replaced.
+        Changing the objects in place is not seen, replace them with
+        add_component instead.
+        """
+        key = (comp_type, field)
+        array = self._derived.get(key)
+        if array is None:
+            objs = self.objects[comp_type]
+            array = np.fromiter(
+                (getattr(obj, field) for obj in objs), np.float64, len(objs)
+            )
+            self._derived[key] = array
+        return array
+
+    def push(self, entity: int) -> int:
+        """Reserve a row for entity, the caller fills in the components"""
+        row = len(self.entities)
+        if row == self.capacity:
+            self._grow()
+        self._derived.clear()
+        self.entities.append(entity)
+        for objs in self.objects.values():
+            objs.append(None)
+        return row
+
+    def write(self, row: int, comp_type: type, component: object) -> None:
+        cols = self.columns.get(comp_type)
+        if cols is None:
+            self.objects[comp_type][row] = component
+            self._derived.clear()
+            return
+        for name, col in cols.items():
+            col[row] = getattr(component, name)
+
+    def copy_row(self, row: int, dst: "Archetype", dst_row: int) -> None:
+        """Copy the components both tables have from row into dst_row"""
+        for comp_type, cols in self.columns.items():
+            dst_cols = dst.columns.get(comp_type)
+            if dst_cols is None:
+                continue
+            for name, col in cols.items():
+                dst_cols[name][dst_row] = col[row]
+
+        for comp_type, objs in self.objects.items():
+            dst_objs = dst.objects.get(comp_type)
+            if dst_objs is not None:
+                dst_objs[dst_row] = objs[row]
+        dst._derived.clear()
+
+    def swap_remove(self, row: int) -> Optional[int]:
+        """Remove row by moving the last row into it, returns the entity that moved"""
+        last = len(self.entities) - 1
+        moved = None
+        self._derived.clear()
+
+        if row != last:
+            for cols in self.columns.values():
+                for col in cols.values():
+                    col[row] = col[last]
+            for objs in self.objects.values():
+                objs[row] = objs[last]
+            moved = self.entities[last]
+            self.entities[row] = moved
+
+        self.entities.pop()
+        for objs in self.objects.values():
+            objs.pop()
+
+        return moved
+
+    def _grow(self) -> None:
+        self.capacity *= 2
+        for cols in self.columns.values():
+            for name, col in cols.items():
+                grown = np.zeros(self.capacity, dtype=col.dtype)
+                grown[: len(col)] = col
+                cols[name] = grown
+
+
+def _make_ref_class(comp_type: type) -> type:
+    # subclass of the component so isinstance/repr keep working, but every
+    # field reads and writes straight through to the column
+    fields = tuple(NUMERIC_COMPONENTS[comp_type])
+
+    def locate(ref) -> tuple["Archetype", int]:
+        location = ref._world._locations.get(ref._entity)
+        if location is None:
+            raise ReferenceError(
+                f"stale component reference: {comp_type.__name__} of entity"
+                f" {ref._entity}, which was destroyed"
+            )
+        return location
+
+    def make_property(name: str) -> property:
+        def fget(ref):
+            arch, row = locate(ref)
+            return arch.columns[comp_type][name][row].item()
+
+        def fset(ref, value):
+            arch, row = locate(ref)
+            arch.columns[comp_type][name][row] = value
+
+        return property(fget, fset)
+
+    def __eq__(ref, other):
+        # the dataclass __eq__ wants the exact same class, compare by value
+        # with plain components and other refs alike
+        if not isinstance(other, comp_type):
+            return NotImplemented
+        return all(getattr(ref, name) == getattr(other, name) for name in fields)
+
+    namespace: dict = {name: make_property(name) for name in fields}
+    namespace["__eq__"] = __eq__
+    namespace["__slots__"] = ("_world", "_entity")
+    namespace["_component_type"] = comp_type
+    return type(f"{comp_type.__name__}Ref", (comp_type,), namespace)
+
+
+_REF_CLASSES: dict[type, type] = {
+    comp_type: _make_ref_class(comp_type) for comp_type in NUMERIC_COMPONENTS
+}
+
+
+class ArchetypeQuery:
+    """Registered query over an ArchetypeWorld.
+
+    Keeps the list of matching tables up to date as new archetypes appear.
+    Iteration goes table by table in creation order and row order inside a
+    table, so the same sequence of world operations gives the same order.
+    """
+
+    def __init__(self, world: "ArchetypeWorld", component_types: tuple[type, ...]):
+        self.component_types = component_types
+        self._world = world
+        self._signature = frozenset(component_types)
+        self._tables: list[Archetype] = [
+            arch for arch in world._archetypes.values() if self.matches(arch)
+        ]
+
+    @property
+    def version(self) -> int:
+        # any structural change in the world may move entities in or out
+        return self._world._version
+
+    def matches(self, arch: Archetype) -> bool:
+        return self._signature <= arch.signature
+
+    def __len__(self) -> int:
+        return sum(len(arch) for arch in self._tables)
+
+    def tables(self) -> list[Archetype]:
+        return [arch for arch in self._tables if arch.entities]
+
+    def entities(self) -> list[int]:
+        return [entity_id for arch in self._tables for entity_id in arch.entities]
+
+    def __iter__(self):
+        world = self._world
+        component_types = self.component_types
+        # snapshot first, callers may add components (and move rows) while iterating
+        for entity_id in self.entities():
+            if entity_id not in world._locations:
+                continue
+            yield (
+                entity_id,
+                *(world.get_component(entity_id, t) for t in component_types),
+            )
+
+    def writing(self, *component_types: type):
+        """Iterate like the query itself, marking component_types of every
+        row as changed (whether the caller writes them or not)"""
+        yield from _writing(self, self._world, component_types)
+
+
+def _component_type(component: object) -> type:
+    # a ref handed back in should be stored as the component it stands for
+    return getattr(type(component), "_component_type", type(component))
+
+
+class ArchetypeWorld(ChangeTracking):
+    """Drop-in alternative to World that groups entities by component set.
+
+    Numeric components live in numpy columns, get_component returns a small
+    reference object for them so existing `pos.x = ...` code keeps working.
+    Batch systems should use archetypes() and operate on whole columns.
+
+    Unlike World, add_component copies the values of a numeric component
+    into the columns: changing the object passed in afterwards does not
+    change the stored component, write through get_component instead.
+    References outlive their entity only as far as raising ReferenceError.
+    """
+
+    def __init__(self) -> None:
+        # same generational handles as World
+        self._allocator = EntityAllocator()
+        self._empty = Archetype(frozenset())
+        self._archetypes: dict[frozenset[type], Archetype] = {
+            self._empty.signature: self._empty
+        }
+        self._locations: dict[int, tuple[Archetype, int]] = {}
+        self._resources: dict[type, object] = {}
+        self._queries: dict[tuple[type, ...], ArchetypeQuery] = {}
+        # bumped on every structural change (component added, entity destroyed)
+        self._version: int = 0
+        self._tracked: dict[type, ChangeSet] = {}
+
+    # -- entities
+    def create_entity(self) -> int:
+        entity_id = self._allocator.create()
+        self._locations[entity_id] = (self._empty, self._empty.push(entity_id))
+        return entity_id
+
+    def add_component(self, entity: int, component: object) -> None:
+        comp_type = _component_type(component)
+
+        location = self._locations.get(entity)
+        if location is None:
+            raise ValueError(f"entity {entity} is not alive")
+        arch, row = location
+
+        if comp_type in arch.signature:
+            arch.write(row, comp_type, component)
+            if self._tracked:
+                self.mark_changed(entity, comp_type)
+            return
+
+        dst = arch.add_edges.get(comp_type)
+        if dst is None:
+            dst = self._get_archetype(arch.signature | {comp_type})
+            arch.add_edges[comp_type] = dst
+
+        self._version += 1
+        dst_row = dst.push(entity)
+        arch.copy_row(row, dst, dst_row)
+        dst.write(dst_row, comp_type, component)
+
+        self._remove_row(arch, row)
+        self._locations[entity] = (dst, dst_row)
+
+        change_set = self._tracked.get(comp_type)
+        if change_set is not None:
+            change_set._add(entity)
+
+    def is_alive(self, entity: int) -> bool:
+        return self._allocator.is_alive(entity)
+
+    def entity_count(self) -> int:
+        return len(self._allocator)
+
+    def get_component(self, entity: int, comp_type: type):
+        location = self._locations.get(entity)
+        if location is None:
+            return None
+        arch, row = location
+        if comp_type not in arch.signature:
+            return None
+
+        ref_class = _REF_CLASSES.get(comp_type)
+        if ref_class is None:
+            return arch.objects[comp_type][row]
+
+        ref = ref_class.__new__(ref_class)
+        ref._world = self
+        ref._entity = entity
+        return ref
+
+    def get_components(self, *component_types: type):
+
+        if not component_types:
+            return
+
+        yield from self.query(*component_types)
+
+    def query(self, *component_types: type) -> ArchetypeQuery:
+        """Registered query for component_types, created on first use"""
+        if not component_types:
+            raise ValueError("query needs at least one component type")
+
+        query = self._queries.get(component_types)
+        if query is None:
+            query = ArchetypeQuery(self, component_types)
+            self._queries[component_types] = query
+        return query
+
+    def archetypes(self, *component_types: type) -> Iterator[Archetype]:
+        """Non-empty tables that have all of component_types, for column access"""
+        yield from self.query(*component_types).tables()
+
+    def destroy_entity(self, entity: int) -> None:
+        location = self._locations.pop(entity, None)
+        if location is not None:
+            self._allocator.destroy(entity)
+            self._version += 1
+            self._remove_row(*location)
+            for comp_type in location[0].signature:
+                change_set = self._tracked.get(comp_type)
+                if change_set is not None:
+                    change_set._remove(entity)
+
+    def set_resource(self, resource: object) -> None:
+        self._resources[type(resource)] = resource
+
+    def get_resource(self, resource_type: Type[T]) -> Optional[T]:
+        res = self._resources.get(resource_type)
+        return res if isinstance(res, resource_type) else None
+
+    # -- internals
+    def _get_archetype(self, signature: frozenset[type]) -> Archetype:
+        arch = self._archetypes.get(signature)
+        if arch is None:
+            arch = Archetype(signature)
+            self._archetypes[signature] = arch
+            for query in self._queries.values():
+                if query.matches(arch):
+                    query._tables.append(arch)
+        return arch
+
+    def _remove_row(self, arch: Archetype, row: int) -> None:
+        moved = arch.swap_remove(row)
+        if moved is not None:
+            self._locations[moved] = (arch, row)
@@ -69,54 +69,402 @@ class Health:
 
 # -- world / ecs core
 
+# an entity handle is (generation << INDEX_BITS) | index. The index is the
+# slot in the per-entity arrays and gets reused after destroy_entity, the
+# generation tells a reused slot apart from the entity that held it before
+INDEX_BITS = 24
+INDEX_MASK = (1 << INDEX_BITS) - 1
 
-class World:
+
+class EntityAllocator:
+    """Hands out generational entity handles and recycles destroyed slots.
+
+    A fresh allocator gives 0, 1, 2, ... like a plain counter. Destroyed
+    slots go on a free list and come back with the next generation, so the
+    number of slots stays at the most entities alive at once and a stale
+    handle never matches the entity that reuses its slot.
+    """
+
+    def __init__(self) -> None:
+        # generation currently living in each slot
+        self.generations: list[int] = []
+        self._free: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.generations) - len(self._free)
+
+    def create(self) -> int:
+        if self._free:
+            index = self._free.pop()
+        else:
+            index = len(self.generations)
+            if index > INDEX_MASK:
+                raise OverflowError(f"more than {INDEX_MASK + 1} entities alive")
+            self.generations.append(0)
+        return (self.generations[index] << INDEX_BITS) | index
+
+    def is_alive(self, entity: int) -> bool:
+        index = entity & INDEX_MASK
+        generations = self.generations
+        return index < len(generations) and generations[index] == (
+            entity >> INDEX_BITS
+        )
+
+    def destroy(self, entity: int) -> bool:
+        """Retire entity, returns False if it was not alive"""
+        if not self.is_alive(entity):
+            return False
+        index = entity & INDEX_MASK
+        self.generations[index] += 1
+        self._free.append(index)
+        return True
+
+
+class ComponentPool:
+    """Sparse set holding every component of one type.
+
+    Components are packed in dense lists (iteration touches only live
+    components), a sparse list indexed by entity slot points into them.
+    Removal moves the last component into the hole, so it is O(1) too.
+    """
+
+    def __init__(self, component_type: type, bit: int) -> None:
+        self.component_type = component_type
+        # this type's bit in the per-entity component masks
+        self.bit = bit
+        # entity slot -> dense row, -1 when the slot has no component here
+        self._sparse: list[int] = []
+        self.entities: list[int] = []
+        self.components: list = []
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def __contains__(self, entity: int) -> bool:
+        return self.get(entity) is not None
+
+    def get(self, entity: int):
+        # a row of -1 reads the last entity, which is never this one
+        try:
+            row = self._sparse[entity & INDEX_MASK]
+            if self.entities[row] == entity:
+                return self.components[row]
+        except IndexError:
+            pass
+        return None
+
+    def set(self, entity: int, component: object) -> bool:
+        """Add or replace, returns True if entity had no component here"""
+        index = entity & INDEX_MASK
+        sparse = self._sparse
+        if index >= len(sparse):
+            sparse.extend([-1] * (index + 1 - len(sparse)))
+        row = sparse[index]
+        if row >= 0 and self.entities[row] == entity:
+            self.components[row] = component
+            return False
+
+        sparse[index] = len(self.entities)
+        self.entities.append(entity)
+        self.components.append(component)
+        return True
+
+    def remove(self, entity: int) -> None:
+        index = entity & INDEX_MASK
+        row = self._sparse[index]
+        last_entity = self.entities.pop()
+        last_component = self.components.pop()
+        if last_entity != entity:
+            self.entities[row] = last_entity
+            self.components[row] = last_component
+            self._sparse[last_entity & INDEX_MASK] = row
+        self._sparse[index] = -1
+
+
+class ChangeSet:
+    """Entities whose component of one type was added, written or removed.
+
+    Filled by a world that tracks the type (World.track_changes) until the
+    owner of the world calls clear_changes() at the end of its tick. An
+    entity is only in one of the sets: added wins over changed, and
+    removed drops it from both.
+    """
+
+    def __init__(self) -> None:
+        self.added: set[int] = set()
+        self.changed: set[int] = set()
+        self.removed: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.added) + len(self.changed) + len(self.removed)
+
+    def mark(self, entity: int) -> None:
+        """entity's component was written in place"""
+        if entity not in self.added:
+            self.changed.add(entity)
+
+    def mark_many(self, entities) -> None:
+        """mark() for a batch of entities (any iterable of ints)"""
+        self.changed.update(entities)
+        if self.added:
+            self.changed -= self.added
+
+    def dirty(self) -> set[int]:
+        """Entities that have the component and need a look"""
+        return self.added | self.changed
+
+    def clear(self) -> None:
+        self.added.clear()
+        self.changed.clear()
+        self.removed.clear()
+
+    def _add(self, entity: int) -> None:
+        self.removed.discard(entity)
+        self.changed.discard(entity)
+        self.added.add(entity)
+
+    def _remove(self, entity: int) -> None:
+        self.added.discard(entity)
+        self.changed.discard(entity)
+        self.removed.add(entity)
+
+
+class ChangeTracking:
+    """Opt-in change detection, shared by World and ArchetypeWorld.
+
+    Only types passed to track_changes() pay for it. add_component and
+    destroy_entity record what they do, in place writes (pos.x = ...) have
+    to be reported with mark_changed() or by iterating a query through
+    writing().
+    """
+
+    _tracked: dict[type, ChangeSet]
+
+    def track_changes(self, *component_types: type) -> None:
+        for component_type in component_types:
+            self._tracked.setdefault(component_type, ChangeSet())
+
+    def changes(self, comp_type: type) -> Optional[ChangeSet]:
+        """Change set of comp_type, None if it is not tracked"""
+        return self._tracked.get(comp_type)
+
+    def mark_changed(self, entity: int, comp_type: type) -> None:
+        change_set = self._tracked.get(comp_type)
+        if change_set is not None:
+            change_set.mark(entity)
+
+    def clear_changes(self) -> None:
+        """End of tick, every tracked type starts over"""
+        for change_set in self._tracked.values():
+            change_set.clear()
+
+
+class Query:
+    """Persistent set of entities that have all of component_types.
+
+    The world keeps it up to date as components are added and entities
+    destroyed, so iterating costs only the number of matches. Iteration
+    is in ascending entity handle order.
+    """
+
+    def __init__(
+        self,
+        world: "World",
+        component_types: tuple[type, ...],
+        pools: list[ComponentPool],
+    ) -> None:
+        self.component_types = component_types
+        self._world = world
+        self._pools = pools
+        # component mask bits an entity needs to match
+        self.mask = 0
+        for pool in pools:
+            self.mask |= pool.bit
+
+        smallest = min(pools, key=len)
+        self._entities: set[int] = {
+            entity
+            for entity in smallest.entities
+            if all(entity in pool for pool in pools if pool is not smallest)
+        }
+        self._ordered: Optional[list[int]] = None
+        # bumped whenever an entity enters or leaves the query
+        self.version: int = 0
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+    def __contains__(self, entity: int) -> bool:
+        return entity in self._entities
+
+    def entities(self) -> list[int]:
+        if self._ordered is None:
+            self._ordered = sorted(self._entities)
+        return self._ordered
+
+    def __iter__(self):
+        matched = self._entities
+        columns = [(pool._sparse, pool.components) for pool in self._pools]
+        for entity_id in self.entities():
+            # skip entities destroyed while the caller was iterating
+            if entity_id not in matched:
+                continue
+            index = entity_id & INDEX_MASK
+            yield (
+                entity_id,
+                *(components[sparse[index]] for sparse, components in columns),
+            )
+
+    def writing(self, *component_types: type):
+        """Iterate like the query itself, marking component_types of every
+        row as changed (whether the caller writes them or not)"""
+        yield from _writing(self, self._world, component_types)
+
+    def _try_add(self, entity: int, mask: int) -> None:
+        if mask & self.mask == self.mask and entity not in self._entities:
+            self._entities.add(entity)
+            self._ordered = None
+            self.version += 1
+
+    def _discard(self, entity: int) -> None:
+        if entity in self._entities:
+            self._entities.discard(entity)
+            self._ordered = None
+            self.version += 1
+
+
+def _writing(query, world, component_types: tuple[type, ...]):
+    change_sets = [
+        change_set
+        for change_set in map(world.changes, component_types)
+        if change_set is not None
+    ]
+    if not change_sets:
+        yield from query
+        return
+    for row in query:
+        for change_set in change_sets:
+            change_set.mark(row[0])
+        yield row
+
+
+class World(ChangeTracking):
     def __init__(self) -> None:
-        self._next_entity_id: int = 0
-        self._components: dict[type, dict[int, object]] = {}
+        self._allocator = EntityAllocator()
+        # component mask of every entity slot, one bit per component type
+        self._masks: list[int] = []
+        self._pools: dict[type, ComponentPool] = {}
+        # pool of each mask bit, in bit order
+        self._pools_by_bit: list[ComponentPool] = []
         self._resources: dict[type, object] = {}
+        self._queries: dict[tuple[type, ...], Query] = {}
+        self._queries_by_type: dict[type, list[Query]] = {}
+        # component mask -> (pools, queries) destroy_entity has to visit,
+        # entities mostly share a handful of masks
+        self._destroy_plans: dict[int, tuple[list, list]] = {}
+        # component type -> ChangeSet, for the types track_changes() was asked
+        self._tracked: dict[type, ChangeSet] = {}
 
     # -- entities
     def create_entity(self) -> int:
-        entity_id = self._next_entity_id
-        self._next_entity_id += 1
+        entity_id = self._allocator.create()
+        if entity_id & INDEX_MASK == len(self._masks):
+            self._masks.append(0)
         return entity_id
 
+    def is_alive(self, entity: int) -> bool:
+        return self._allocator.is_alive(entity)
+
+    def entity_count(self) -> int:
+        return len(self._allocator)
+
     def add_component(self, entity: int, component: object) -> None:
+        index = entity & INDEX_MASK
+        generations = self._allocator.generations
+        if index >= len(generations) or generations[index] != entity >> INDEX_BITS:
+            raise ValueError(f"entity {entity} is not alive")
+
         comp_type = type(component)
-        if comp_type not in self._components:
-            self._components[comp_type] = {}
-        self._components[comp_type][entity] = component
+        pool = self._pools.get(comp_type)
+        if pool is None:
+            pool = self._pool(comp_type)
+
+        if not pool.set(entity, component):
+            # replaced, the entity matches the same queries as before
+            if self._tracked:
+                self.mark_changed(entity, comp_type)
+            return
+
+        mask = self._masks[index] | pool.bit
+        self._masks[index] = mask
+        for query in self._queries_by_type.get(comp_type, ()):
+            query._try_add(entity, mask)
+        if self._tracked:
+            change_set = self._tracked.get(comp_type)
+            if change_set is not None:
+                change_set._add(entity)
 
     def get_component(self, entity: int, comp_type: type):
-        return self._components.get(comp_type, {}).get(entity)
+        pool = self._pools.get(comp_type)
+        if pool is None:
+            return None
+        # ComponentPool.get inlined, this is the hottest call in the game
+        try:
+            row = pool._sparse[entity & INDEX_MASK]
+            if pool.entities[row] == entity:
+                return pool.components[row]
+        except IndexError:
+            pass
+        return None
 
     def get_components(self, *component_types: type):
 
         if not component_types:
             return
 
-        component_maps = []
+        yield from self.query(*component_types)
 
-        for component_type in component_types:
-            component_dict = self._components.get(component_type)
-            if not component_dict:
-                return
-            component_maps.append(component_dict)
-
-        common_entity_ids = set(component_maps[0].keys())
-        for component_dict in component_maps[1:]:
-            common_entity_ids &= set(component_dict.keys())
-
-        for entity_id in common_entity_ids:
-            components = tuple(
-                component_dict[entity_id] for component_dict in component_maps
-            )
-            yield (entity_id, *components)
+    def query(self, *component_types: type) -> Query:
+        """Registered query for component_types, created on first use"""
+        if not component_types:
+            raise ValueError("query needs at least one component type")
+
+        query = self._queries.get(component_types)
+        if query is not None:
+            return query
+
+        pools = [self._pool(component_type) for component_type in component_types]
+        query = Query(self, component_types, pools)
+        self._queries[component_types] = query
+        self._destroy_plans.clear()
+        for component_type in set(component_types):
+            self._queries_by_type.setdefault(component_type, []).append(query)
+        return query
 
     def destroy_entity(self, entity: int) -> None:
-        for comp_dict in self._components.values():
-            comp_dict.pop(entity, None)
+        """Remove entity and its components, stale handles are ignored"""
+        if not self._allocator.destroy(entity):
+            return
+
+        index = entity & INDEX_MASK
+        mask = self._masks[index]
+        self._masks[index] = 0
+
+        # only the pools (and queries) of components the entity had
+        plan = self._destroy_plans.get(mask)
+        if plan is None:
+            plan = self._destroy_plan(mask)
+        pools, queries = plan
+        for pool in pools:
+            pool.remove(entity)
+        for query in queries:
+            query._discard(entity)
+
+        if self._tracked:
+            for pool in pools:
+                change_set = self._tracked.get(pool.component_type)
+                if change_set is not None:
+                    change_set._remove(entity)
 
     def set_resource(self, resource: object) -> None:
         self._resources[type(resource)] = resource
@@ -124,3 +472,27 @@ class World:
     def get_resource(self, resource_type: Type[T]) -> Optional[T]:
         res = self._resources.get(resource_type)
         return res if isinstance(res, resource_type) else None
+
+    def _destroy_plan(self, mask: int) -> tuple[list, list]:
+        pools = []
+        queries: dict[int, Query] = {}
+        bits = mask
+        while bits:
+            low = bits & -bits
+            bits ^= low
+            pool = self._pools_by_bit[low.bit_length() - 1]
+            pools.append(pool)
+            for query in self._queries_by_type.get(pool.component_type, ()):
+                queries[id(query)] = query
+        plan = self._destroy_plans[mask] = (pools, list(queries.values()))
+        return plan
+
+    def _pool(self, comp_type: type) -> ComponentPool:
+        """Pool for comp_type, created with the next mask bit on first use"""
+        pool = self._pools.get(comp_type)
+        if pool is not None:
+            return pool
+        pool = ComponentPool(comp_type, 1 << len(self._pools_by_bit))
+        self._pools[comp_type] = pool
+        self._pools_by_bit.append(pool)
+        return pool
@@ -0,0 +1,131 @@
+# shared/framing.py
+import socket
+from typing import Optional
+
+from .protocol import MSG_JSON, decode_payload
+
+# largest payload accepted from the other side, a json state of the most
+# players a delta can carry (u16 counts) still fits
+MAX_FRAME_SIZE = 8 * 1024 * 1024
+# starting buffer size and the least free space handed to recv_into
+INITIAL_CAPACITY = 64 * 1024
+MIN_RECV_SPACE = 16 * 1024
+
+
+class FrameReader:
+    """Incremental receive buffer for either codec.
+
+    Bytes land in one bytearray through recv_into (or feed() for streams
+    that hand out bytes) and frames are cut out of it by index, so a backlog
+    of n bytes is decoded in O(n) instead of re-slicing the rest of the
+    buffer once per message. Only a partial frame is ever moved, to the
+    front of the buffer when the free space runs low.
+
+    next_message() takes the codec as an argument because a "protocol"
+    message switches the codec for everything that follows it.
+    """
+
+    def __init__(
+        self, max_frame: int = MAX_FRAME_SIZE, capacity: int = INITIAL_CAPACITY
+    ) -> None:
+        self.max_frame = max_frame
+        self.initial_capacity = capacity
+        self._buffer = bytearray(capacity)
+        # unread data is _buffer[_start:_end]
+        self._start = 0
+        self._end = 0
+        self.closed = False
+        self.recv_calls = 0
+        self.bytes_in = 0
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def fill(self, sock: socket.socket) -> int:
+        """Read everything the non-blocking sock has ready, returns the bytes
+        read. Sets closed when the other side hung up, socket errors other
+        than "would block" are left to the caller.
+        """
+        total = 0
+        while True:
+            self._reserve(MIN_RECV_SPACE)
+            with memoryview(self._buffer) as view:
+                free = len(view) - self._end
+                self.recv_calls += 1
+                try:
+                    count = sock.recv_into(view[self._end :])
+                except (BlockingIOError, InterruptedError):
+                    break
+            if count == 0:
+                self.closed = True
+                break
+            self._end += count
+            total += count
+            # a short read means the kernel buffer is empty, skip the
+            # extra call that would only return "would block"
+            if count < free:
+                break
+            # a complete frame is buffered at this size, decode before reading
+            # more so a flood cannot grow the buffer without bound
+            if len(self) > self.max_frame:
+                break
+        self.bytes_in += total
+        return total
+
+    def feed(self, data: bytes) -> None:
+        """Append bytes received some other way (asyncio streams)"""
+        self._reserve(len(data))
+        self._buffer[self._end : self._end + len(data)] = data
+        self._end += len(data)
+        self.bytes_in += len(data)
+
+    def next_message(self, codec) -> Optional[dict]:
+        """Decode the next complete frame with codec, None when there is none.
+        Raises FrameTooLarge when a frame is over max_frame bytes.
+        """
+        while self._start < self._end:
+            bounds = codec.frame_bounds(
+                self._buffer, self._start, self._end, self.max_frame
+            )
+            if bounds is None:
+                return None
+
+            msg_type, payload_start, payload_end, frame_end = bounds
+            self._start = frame_end
+            # blank lines between json messages
+            if msg_type == MSG_JSON and payload_start == payload_end:
+                continue
+
+            with memoryview(self._buffer)[payload_start:payload_end] as payload:
+                msg = decode_payload(msg_type, payload)
+            if self._start == self._end:
+                self._reset()
+            return msg
+
+        self._reset()
+        return None
+
+    def _reset(self) -> None:
+        self._start = self._end = 0
+        # a burst grew the buffer, give the memory back once it is drained
+        if len(self._buffer) > 4 * self.initial_capacity:
+            self._buffer = bytearray(self.initial_capacity)
+
+    def _reserve(self, space: int) -> None:
+        """Make room for space more bytes after _end"""
+        if len(self._buffer) - self._end >= space:
+            return
+
+        pending = self._end - self._start
+        if self._start > 0:
+            # only the unread tail (usually part of one frame) is copied
+            self._buffer[:pending] = self._buffer[self._start : self._end]
+            self._start = 0
+            self._end = pending
+            if len(self._buffer) - self._end >= space:
+                return
+
+        capacity = len(self._buffer)
+        while capacity - self._end < space:
+            capacity *= 2
+        self._buffer.extend(bytes(capacity - len(self._buffer)))
@@ -0,0 +1,52 @@
+# shared/input_channel.py
+from collections import deque
+from typing import Optional
+
+# input changes repeated in every input message, a late or dropped message
+# is covered by the next one
+INPUT_REDUNDANCY = 4
+# seconds between input messages while the input stays the same, tells the
+# server the client is still there and how far its ticks got
+INPUT_KEEPALIVE = 0.2
+
+
+class InputSender:
+    """Client side of the input channel, sends only what the server needs.
+
+    The client numbers its simulation ticks (seq) and calls update() for
+    every one of them. A message goes out when the movement changes and
+    otherwise only every `keepalive` seconds. Each message carries the newest
+    seq and the last `redundancy` changes as (seq the change starts at,
+    move_x, move_y), the server keeps applying the latest one meanwhile.
+    """
+
+    def __init__(
+        self, redundancy: int = INPUT_REDUNDANCY, keepalive: float = INPUT_KEEPALIVE
+    ) -> None:
+        self.keepalive = keepalive
+        self.changes: deque[tuple[int, float, float]] = deque(maxlen=redundancy)
+        self.current: tuple[float, float] | None = None
+        self.last_sent = float("-inf")
+        # ticks that went out in a message / that did not need one
+        self.sent = 0
+        self.skipped = 0
+
+    def update(
+        self, seq: int, move_x: float, move_y: float, now: float
+    ) -> Optional[dict]:
+        """Input of client tick seq, returns the message to send if one is due"""
+        move = (move_x, move_y)
+        if move != self.current:
+            self.current = move
+            self.changes.append((seq, move_x, move_y))
+        elif now - self.last_sent < self.keepalive:
+            self.skipped += 1
+            return None
+
+        self.last_sent = now
+        self.sent += 1
+        return {
+            "type": "input",
+            "seq": seq,
+            "inputs": [list(change) for change in self.changes],
+        }
@@ -0,0 +1,120 @@
+# shared/profiler.py
+import json
+import time
+from collections import deque
+
+# samples kept per phase for the percentiles
+SAMPLE_WINDOW = 4096
+
+
+class Histogram:
+    """Recent samples of one timed phase plus all-time count/total/max"""
+
+    def __init__(self, window: int = SAMPLE_WINDOW) -> None:
+        self.samples: deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p: float) -> float:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class Profiler:
+    """Per-phase timings and traffic counters, cheap enough to leave on.
+
+        t = profiler.start()
+        do_work()
+        profiler.record("phase", t)
+
+    When disabled start() returns 0 and record()/count() return at once.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.phases: dict[str, Histogram] = {}
+        self.counters: dict[str, int] = {}
+        self._since = time.perf_counter()
+
+    def start(self) -> float:
+        return time.perf_counter() if self.enabled else 0.0
+
+    def record(self, phase: str, started: float) -> None:
+        if not self.enabled or not started:
+            return
+        self.add(phase, time.perf_counter() - started)
+
+    def add(self, phase: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        hist = self.phases.get(phase)
+        if hist is None:
+            hist = self.phases[phase] = Histogram()
+        hist.add(seconds)
+
+    def count(self, counter: str, amount: int = 1) -> None:
+        if self.enabled:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def reset(self) -> None:
+        self.phases = {}
+        self.counters = {}
+        self._since = time.perf_counter()
+
+    def snapshot(self) -> dict:
+        elapsed = time.perf_counter() - self._since
+        return {
+            "enabled": self.enabled,
+            "elapsed_s": elapsed,
+            # list() first, the console thread reads while the tick writes
+            "phases": {
+                name: hist.summary() for name, hist in list(self.phases.items())
+            },
+            "counters": dict(self.counters),
+        }
+
+    def report(self) -> str:
+        snap = self.snapshot()
+        elapsed = max(snap["elapsed_s"], 1e-9)
+
+        lines = [
+            f"profiler {'on' if self.enabled else 'off'}, {elapsed:.1f} s",
+            "phase                        count    p50 ms    p99 ms    max ms",
+        ]
+        for name, s in snap["phases"].items():
+            lines.append(
+                f"{name:<24} {s['count']:>9} {s['p50_ms']:>9.3f}"
+                f" {s['p99_ms']:>9.3f} {s['max_ms']:>9.3f}"
+            )
+        for name, value in sorted(snap["counters"].items()):
+            lines.append(f"{name:<24} {value:>12} ({value / elapsed:.1f}/s)")
+        return "\n".join(lines)
+
+    def dump(self, path: str) -> None:
+        """Write summaries and the raw recent samples as json"""
+        data = self.snapshot()
+        data["samples_ms"] = {
+            name: [s * 1000 for s in list(hist.samples)]
+            for name, hist in list(self.phases.items())
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
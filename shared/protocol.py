@@ -0,0 +1,237 @@
+# shared/protocol.py
+import base64
+import json
+import struct
+from typing import Optional
+
+# -- binary protocol layout
+#
+# every frame: u32 payload length, u8 message type id, payload
+# state, delta, ack, input and input_ack have packed records, chunk carries
+# its compressed tiles as raw bytes, anything else is sent as a json payload
+
+MSG_JSON = 0
+MSG_STATE = 1
+MSG_INPUT = 2
+MSG_DELTA = 3
+MSG_ACK = 4
+MSG_INPUT_ACK = 5
+MSG_CHUNK = 6
+
+_FRAME_HEADER = struct.Struct("<IB")
+# server tick, player count
+_STATE_HEADER = struct.Struct("<IH")
+# player id, x, y, hp, hp_max
+_STATE_PLAYER = struct.Struct("<Iffhh")
+# newest client tick, number of input changes that follow
+_INPUT_HEADER = struct.Struct("<IB")
+# client tick the change starts at, move_x, move_y
+_INPUT_CHANGE = struct.Struct("<Iff")
+# seq, server tick, base seq (-1 for a full snapshot), spawn, update and
+# despawn counts
+_DELTA_HEADER = struct.Struct("<IIiHHH")
+_ENTITY_ID = struct.Struct("<I")
+_ACK = struct.Struct("<I")
+# chunk x, chunk y, tiles per side, then the compressed tiles
+_CHUNK_HEADER = struct.Struct("<iiH")
+
+# hp the client assumes when a player has no Health
+_DEFAULT_HP = 100
+
+
+class FrameTooLarge(ValueError):
+    """A frame is longer than the receiver accepts, the stream is unusable"""
+
+
+class JsonCodec:
+    """Newline delimited json, the original wire format"""
+
+    name = "json"
+
+    def encode(self, msg: dict) -> bytes:
+        if msg.get("type") == "chunk":
+            # the only bytes field, json carries it as base64
+            msg = dict(msg, tiles=base64.b64encode(msg["tiles"]).decode("ascii"))
+        return (json.dumps(msg) + "\n").encode("utf-8")
+
+    def frame_bounds(
+        self, buffer: bytearray, start: int, end: int, max_frame: int
+    ) -> Optional[tuple[int, int, int, int]]:
+        """(message type, payload start, payload end, frame end) of the line
+        starting at buffer[start], None while it is incomplete"""
+        newline = buffer.find(b"\n", start, end)
+        if newline < 0:
+            if end - start > max_frame:
+                raise FrameTooLarge(f"json line over {max_frame} bytes")
+            return None
+        if newline - start > max_frame:
+            raise FrameTooLarge(f"json line of {newline - start} bytes")
+        return MSG_JSON, start, newline, newline + 1
+
+
+class BinaryCodec:
+    """Length prefixed frames with struct packed state and input records"""
+
+    name = "bin1"
+
+    def encode(self, msg: dict) -> bytes:
+        msg_type = msg.get("type")
+
+        if msg_type == "state":
+            players = msg.get("players", [])
+            header = _STATE_HEADER.pack(msg.get("tick", 0), len(players))
+            payload = header + _pack_players(players)
+            return _FRAME_HEADER.pack(len(payload), MSG_STATE) + payload
+
+        if msg_type == "delta":
+            spawn = msg.get("spawn", [])
+            update = msg.get("update", [])
+            despawn = msg.get("despawn", [])
+            payload = b"".join(
+                [
+                    _DELTA_HEADER.pack(
+                        msg["seq"],
+                        msg.get("tick", 0),
+                        msg["base"],
+                        len(spawn),
+                        len(update),
+                        len(despawn),
+                    ),
+                    _pack_players(spawn),
+                    _pack_players(update),
+                ]
+                + [_ENTITY_ID.pack(pid) for pid in despawn]
+            )
+            return _FRAME_HEADER.pack(len(payload), MSG_DELTA) + payload
+
+        if msg_type == "ack":
+            payload = _ACK.pack(msg["seq"])
+            return _FRAME_HEADER.pack(len(payload), MSG_ACK) + payload
+
+        if msg_type == "input":
+            changes = msg.get("inputs", [])
+            payload = _INPUT_HEADER.pack(msg.get("seq", 0), len(changes)) + b"".join(
+                [_INPUT_CHANGE.pack(*change) for change in changes]
+            )
+            return _FRAME_HEADER.pack(len(payload), MSG_INPUT) + payload
+
+        if msg_type == "input_ack":
+            payload = _ACK.pack(msg["seq"])
+            return _FRAME_HEADER.pack(len(payload), MSG_INPUT_ACK) + payload
+
+        if msg_type == "chunk":
+            header = _CHUNK_HEADER.pack(msg["cx"], msg["cy"], msg["size"])
+            payload = header + msg["tiles"]
+            return _FRAME_HEADER.pack(len(payload), MSG_CHUNK) + payload
+
+        payload = json.dumps(msg).encode("utf-8")
+        return _FRAME_HEADER.pack(len(payload), MSG_JSON) + payload
+
+    def frame_bounds(
+        self, buffer: bytearray, start: int, end: int, max_frame: int
+    ) -> Optional[tuple[int, int, int, int]]:
+        """(message type, payload start, payload end, frame end) of the frame
+        starting at buffer[start], None while it is incomplete"""
+        if end - start < _FRAME_HEADER.size:
+            return None
+        length, msg_type = _FRAME_HEADER.unpack_from(buffer, start)
+        if length > max_frame:
+            raise FrameTooLarge(f"frame of {length} bytes")
+        payload_start = start + _FRAME_HEADER.size
+        frame_end = payload_start + length
+        if frame_end > end:
+            return None
+        return msg_type, payload_start, frame_end, frame_end
+
+
+def _pack_players(players: list[dict]) -> bytes:
+    return b"".join(
+        [
+            _STATE_PLAYER.pack(
+                p["id"],
+                p["x"],
+                p["y"],
+                p.get("hp", _DEFAULT_HP),
+                p.get("hp_max", _DEFAULT_HP),
+            )
+            for p in players
+        ]
+    )
+
+
+def _unpack_players(payload: bytes) -> list[dict]:
+    return [
+        {"id": pid, "x": x, "y": y, "hp": hp, "hp_max": hp_max}
+        for pid, x, y, hp, hp_max in _STATE_PLAYER.iter_unpack(payload)
+    ]
+
+
+def decode_payload(msg_type: int, payload: bytes | memoryview) -> dict:
+    if msg_type == MSG_STATE:
+        tick, _count = _STATE_HEADER.unpack_from(payload)
+        players = _unpack_players(payload[_STATE_HEADER.size :])
+        return {"type": "state", "tick": tick, "players": players}
+
+    if msg_type == MSG_DELTA:
+        seq, tick, base, n_spawn, n_update, n_despawn = _DELTA_HEADER.unpack_from(
+            payload
+        )
+        offset = _DELTA_HEADER.size
+        spawn_end = offset + n_spawn * _STATE_PLAYER.size
+        update_end = spawn_end + n_update * _STATE_PLAYER.size
+        return {
+            "type": "delta",
+            "seq": seq,
+            "tick": tick,
+            "base": base,
+            "spawn": _unpack_players(payload[offset:spawn_end]),
+            "update": _unpack_players(payload[spawn_end:update_end]),
+            "despawn": [
+                pid for (pid,) in _ENTITY_ID.iter_unpack(payload[update_end:])
+            ],
+        }
+
+    if msg_type == MSG_ACK:
+        (seq,) = _ACK.unpack(payload)
+        return {"type": "ack", "seq": seq}
+
+    if msg_type == MSG_INPUT:
+        seq, _count = _INPUT_HEADER.unpack_from(payload)
+        changes = _INPUT_CHANGE.iter_unpack(payload[_INPUT_HEADER.size :])
+        return {"type": "input", "seq": seq, "inputs": [list(c) for c in changes]}
+
+    if msg_type == MSG_INPUT_ACK:
+        (seq,) = _ACK.unpack(payload)
+        return {"type": "input_ack", "seq": seq}
+
+    if msg_type == MSG_CHUNK:
+        cx, cy, size = _CHUNK_HEADER.unpack_from(payload)
+        tiles = bytes(payload[_CHUNK_HEADER.size :])
+        return {"type": "chunk", "cx": cx, "cy": cy, "size": size, "tiles": tiles}
+
+    if msg_type == MSG_JSON:
+        msg = json.loads(str(payload, "utf-8"))
+        if not isinstance(msg, dict):
+            raise ValueError(f"json message is {type(msg).__name__}, not an object")
+        if msg.get("type") == "chunk":
+            msg["tiles"] = base64.b64decode(msg["tiles"])
+        return msg
+
+    raise ValueError(f"unknown message type id {msg_type}")
+
+
+JSON_CODEC = JsonCodec()
+BINARY_CODEC = BinaryCodec()
+
+CODECS = {codec.name: codec for codec in (JSON_CODEC, BINARY_CODEC)}
+
+# preference order offered by the server in "welcome"
+SUPPORTED_PROTOCOLS = [BINARY_CODEC.name, JSON_CODEC.name]
+
+
+def choose_protocol(offered: list[str], preferred: list[str]) -> str:
+    """First protocol in preferred that the other side offers, json otherwise"""
+    for name in preferred:
+        if name in offered and name in CODECS:
+            return name
+    return JSON_CODEC.name
@@ -0,0 +1,201 @@
+# shared/scheduler.py
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Optional
+
+
+class Structure:
+    """Access token for creating/destroying entities and adding components.
+
+    A system that changes which entities or components exist writes it, so
+    it never runs next to anything else. Systems that do not declare what
+    they touch are treated the same way.
+    """
+
+
+def system(reads: Iterable = (), writes: Iterable = ()):
+    """Declare the component and resource types a system reads and writes.
+
+    @system(reads=(Input,), writes=(Position, SpatialIndex))
+    def my_system(world, dt): ...
+
+    The function is returned unchanged apart from the two attributes, so it
+    can still be called directly.
+    """
+
+    def declare(func: Callable) -> Callable:
+        func.reads = frozenset(reads)
+        func.writes = frozenset(writes)
+        return func
+
+    return declare
+
+
+def gil_enabled() -> bool:
+    # sys._is_gil_enabled only exists on 3.13+, older builds always have it
+    check = getattr(sys, "_is_gil_enabled", None)
+    return True if check is None else check()
+
+
+def default_workers() -> int:
+    """One thread per core on free-threaded builds, sequential otherwise.
+
+    With the GIL only numpy calls on large arrays overlap, so threads are
+    opt-in there (Schedule(workers=n)).
+    """
+    if gil_enabled():
+        return 1
+    return os.cpu_count() or 1
+
+
+class SystemEntry:
+    """One registered system with its extra arguments and declared access"""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable,
+        args: tuple,
+        kwargs: dict,
+        reads: frozenset,
+        writes: frozenset,
+    ) -> None:
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.reads = reads
+        self.writes = writes
+
+    def conflicts(self, other: "SystemEntry") -> bool:
+        """Both touch a type and at least one of them writes it"""
+        if Structure in self.writes or Structure in other.writes:
+            return True
+        return bool(
+            self.writes & (other.reads | other.writes) or other.writes & self.reads
+        )
+
+    def __repr__(self) -> str:
+        return f"SystemEntry({self.name})"
+
+
+class Schedule:
+    """Ordered list of systems, run in stages of systems that do not conflict.
+
+    A system goes one stage after the last earlier-registered system it
+    conflicts with, so the result is the same as calling every system in
+    registration order, whatever the thread timing. Systems of one stage run
+    on a thread pool when workers > 1, the calling thread takes the first.
+
+    Systems in a stage may only read and write component values and
+    resources; queries are registered on first use, so the first run() is
+    always sequential.
+    """
+
+    def __init__(self, workers: Optional[int] = None) -> None:
+        self.workers = default_workers() if workers is None else max(1, workers)
+        self.systems: list[SystemEntry] = []
+        self._stages: Optional[list[list[SystemEntry]]] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._warm = False
+
+    def add(
+        self,
+        func: Callable,
+        *args,
+        reads: Optional[Iterable] = None,
+        writes: Optional[Iterable] = None,
+        name: Optional[str] = None,
+        **kwargs,
+    ) -> SystemEntry:
+        """Register func, called as func(world, *run_args, *args, **kwargs).
+
+        reads/writes default to what @system declared on func.
+        """
+        reads = getattr(func, "reads", None) if reads is None else frozenset(reads)
+        writes = getattr(func, "writes", None) if writes is None else frozenset(writes)
+        if reads is None and writes is None:
+            writes = frozenset((Structure,))
+
+        entry = SystemEntry(
+            name or func.__name__,
+            func,
+            args,
+            kwargs,
+            reads or frozenset(),
+            writes or frozenset(),
+        )
+        self.systems.append(entry)
+        self._stages = None
+        return entry
+
+    def stages(self) -> list[list[SystemEntry]]:
+        """Systems grouped into stages, in run order"""
+        if self._stages is not None:
+            return self._stages
+
+        levels: list[int] = []
+        stages: list[list[SystemEntry]] = []
+        for i, entry in enumerate(self.systems):
+            level = 0
+            for j in range(i):
+                if levels[j] >= level and entry.conflicts(self.systems[j]):
+                    level = levels[j] + 1
+            levels.append(level)
+            if level == len(stages):
+                stages.append([])
+            stages[level].append(entry)
+
+        self._stages = stages
+        return stages
+
+    def run(self, world, *args, profiler=None) -> None:
+        """Run every system once, timing each as "system.<name>" in profiler"""
+        parallel = self.workers > 1 and self._warm
+        for stage in self.stages():
+            if parallel and len(stage) > 1:
+                timings = self._run_parallel(stage, world, args)
+            else:
+                timings = [_call(entry, world, args) for entry in stage]
+
+            if profiler is not None:
+                for entry, seconds in zip(stage, timings):
+                    profiler.add(f"system.{entry.name}", seconds)
+        self._warm = True
+
+    def describe(self) -> str:
+        lines = []
+        for number, stage in enumerate(self.stages()):
+            names = ", ".join(entry.name for entry in stage)
+            lines.append(f"stage {number}: {names}")
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _run_parallel(self, stage: list[SystemEntry], world, args) -> list[float]:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers - 1, thread_name_prefix="systems"
+            )
+
+        futures = [
+            self._executor.submit(_call, entry, world, args) for entry in stage[1:]
+        ]
+        try:
+            first = _call(stage[0], world, args)
+        finally:
+            # never leave a system running into the next stage
+            wait(futures)
+        # result() re-raises, the earliest registered failure wins
+        return [first] + [future.result() for future in futures]
+
+
+def _call(entry: SystemEntry, world, args: tuple) -> float:
+    started = time.perf_counter()
+    entry.func(world, *args, *entry.args, **entry.kwargs)
+    return time.perf_counter() - started
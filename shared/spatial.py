@@ -0,0 +1,216 @@
+# shared/spatial.py
+import math
+
+import numpy as np
+
+from .ecs import Position, INDEX_MASK
+
+# position slots allocated up front, doubled as entity slots grow
+_INITIAL_SLOTS = 1024
+
+
+class SpatialIndex:
+    """Uniform grid answering "which entities are near this point/rect".
+
+    Stored as a world resource. Entities are bucketed by their Position in
+    cells of cell_size (normally WorldConfig.tile_size). movement_system
+    calls move_many() for entities that moved and sync() to pick up
+    entities that were created or destroyed since the last tick.
+
+    Positions are kept in numpy arrays indexed by the entity's slot
+    (handle & INDEX_MASK), so a batch of moves only does python work for
+    the entities that changed cell.
+    """
+
+    def __init__(self, cell_size: float = 32) -> None:
+        self.cell_size = float(cell_size)
+        self._cells: dict[tuple[int, int], set[int]] = {}
+        self._entity_cells: dict[int, tuple[int, int]] = {}
+        self._xs = np.zeros(_INITIAL_SLOTS)
+        self._ys = np.zeros(_INITIAL_SLOTS)
+        self._synced_version: int = -1
+
+    def __len__(self) -> int:
+        return len(self._entity_cells)
+
+    def __contains__(self, entity: int) -> bool:
+        return entity in self._entity_cells
+
+    def cell_of(self, x: float, y: float) -> tuple[int, int]:
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def position(self, entity: int) -> tuple[float, float] | None:
+        if entity not in self._entity_cells:
+            return None
+        slot = entity & INDEX_MASK
+        return (float(self._xs[slot]), float(self._ys[slot]))
+
+    # -- updates
+    def move(self, entity: int, x: float, y: float) -> None:
+        """Insert entity or update where it is"""
+        slot = entity & INDEX_MASK
+        if slot >= len(self._xs):
+            self._reserve(slot)
+        self._xs[slot] = x
+        self._ys[slot] = y
+
+        cell = self.cell_of(x, y)
+        old_cell = self._entity_cells.get(entity)
+        if old_cell == cell:
+            return
+
+        if old_cell is not None:
+            self._discard_from_cell(entity, old_cell)
+        self._cells.setdefault(cell, set()).add(entity)
+        self._entity_cells[entity] = cell
+
+    def move_many(self, entities: np.ndarray, x: np.ndarray, y: np.ndarray) -> None:
+        """move() for int64 arrays of entities and their new positions.
+
+        Entities not in the index yet are left to sync().
+        """
+        if len(entities) == 0:
+            return
+        slots = entities & INDEX_MASK
+        top = int(slots.max())
+        if top >= len(self._xs):
+            self._reserve(top)
+
+        size = self.cell_size
+        new_cx = np.floor(x / size)
+        new_cy = np.floor(y / size)
+        crossed = (np.floor(self._xs[slots] / size) != new_cx) | (
+            np.floor(self._ys[slots] / size) != new_cy
+        )
+        self._xs[slots] = x
+        self._ys[slots] = y
+        if not crossed.any():
+            return
+
+        cells = self._cells
+        entity_cells = self._entity_cells
+        for entity, cell in zip(
+            entities[crossed].tolist(),
+            zip(
+                new_cx[crossed].astype(np.int64).tolist(),
+                new_cy[crossed].astype(np.int64).tolist(),
+            ),
+        ):
+            old_cell = entity_cells.get(entity)
+            if old_cell is None:
+                continue
+            bucket = cells[old_cell]
+            bucket.discard(entity)
+            if not bucket:
+                del cells[old_cell]
+            cells.setdefault(cell, set()).add(entity)
+            entity_cells[entity] = cell
+
+    def remove(self, entity: int) -> None:
+        cell = self._entity_cells.pop(entity, None)
+        if cell is None:
+            return
+        self._discard_from_cell(entity, cell)
+
+    def sync(self, world) -> None:
+        """Add entities with a Position that are missing, drop ones that are gone"""
+        query = world.query(Position)
+        if query.version == self._synced_version:
+            return
+
+        current = set(query.entities())
+        for entity in self._entity_cells.keys() - current:
+            self.remove(entity)
+        for entity in current - self._entity_cells.keys():
+            pos = world.get_component(entity, Position)
+            self.move(entity, pos.x, pos.y)
+
+        self._synced_version = query.version
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._entity_cells.clear()
+        self._synced_version = -1
+
+    # -- queries
+    def query_radius(self, x: float, y: float, radius: float) -> list[int]:
+        """Entities whose position is within radius of (x, y)"""
+        min_cx, min_cy = self.cell_of(x - radius, y - radius)
+        max_cx, max_cy = self.cell_of(x + radius, y + radius)
+
+        candidates: list[int] = []
+        for _cell, bucket in self._cells_in(min_cx, min_cy, max_cx, max_cy):
+            candidates.extend(bucket)
+        if not candidates:
+            return candidates
+
+        xs, ys = self._positions_of(candidates)
+        xs -= x
+        ys -= y
+        inside = xs * xs + ys * ys <= radius * radius
+        return [entity for entity, hit in zip(candidates, inside.tolist()) if hit]
+
+    def query_rect(
+        self, x: float, y: float, width: float, height: float
+    ) -> list[int]:
+        """Entities whose position is inside the rect (edges included)"""
+        right = x + width
+        bottom = y + height
+        min_cx, min_cy = self.cell_of(x, y)
+        max_cx, max_cy = self.cell_of(right, bottom)
+
+        found: list[int] = []
+        candidates: list[int] = []
+
+        # cells strictly inside the rect need no per-entity test
+        inner = (min_cx + 1, min_cy + 1, max_cx - 1, max_cy - 1)
+
+        for (cx, cy), bucket in self._cells_in(min_cx, min_cy, max_cx, max_cy):
+            if inner[0] <= cx <= inner[2] and inner[1] <= cy <= inner[3]:
+                found.extend(bucket)
+            else:
+                candidates.extend(bucket)
+
+        if candidates:
+            xs, ys = self._positions_of(candidates)
+            inside = (x <= xs) & (xs <= right) & (y <= ys) & (ys <= bottom)
+            found.extend(
+                entity for entity, hit in zip(candidates, inside.tolist()) if hit
+            )
+        return found
+
+    def _positions_of(self, entities: list[int]) -> tuple[np.ndarray, np.ndarray]:
+        slots = np.array(entities, np.int64) & INDEX_MASK
+        return self._xs[slots], self._ys[slots]
+
+    def _reserve(self, slot: int) -> None:
+        size = len(self._xs)
+        while size <= slot:
+            size *= 2
+        self._xs = np.resize(self._xs, size)
+        self._ys = np.resize(self._ys, size)
+
+    def _cells_in(self, min_cx: int, min_cy: int, max_cx: int, max_cy: int):
+        """(cell, bucket) for occupied cells in the inclusive cell range"""
+        cells = self._cells
+        span = (max_cx - min_cx + 1) * (max_cy - min_cy + 1)
+
+        # a large range over a sparse grid is cheaper to answer by walking
+        # the occupied cells than by probing every cell in the range
+        if span > len(cells):
+            for cell, bucket in cells.items():
+                if min_cx <= cell[0] <= max_cx and min_cy <= cell[1] <= max_cy:
+                    yield cell, bucket
+            return
+
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    yield (cx, cy), bucket
+
+    def _discard_from_cell(self, entity: int, cell: tuple[int, int]) -> None:
+        bucket = self._cells[cell]
+        bucket.discard(entity)
+        if not bucket:
+            del self._cells[cell]
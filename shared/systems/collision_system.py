@@ -0,0 +1,230 @@
+# shared/systems/collision_system.py
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from ..ecs import Position, Renderable, WorldConfig
+from ..archetype import ArchetypeWorld
+from ..scheduler import system
+from ..spatial import SpatialIndex
+
+# neighbour cells searched from each cell, half of the 3x3 block so every
+# pair of cells is visited once; pairs inside one cell are handled apart
+_NEIGHBOUR_OFFSETS = ((0, 1), (1, -1), (1, 0), (1, 1))
+
+
+@dataclass
+class Contacts:
+    """World resource with last tick's overlapping pairs, as entity arrays"""
+
+    a: np.ndarray = field(default_factory=lambda: np.empty(0, np.int64))
+    b: np.ndarray = field(default_factory=lambda: np.empty(0, np.int64))
+
+    def __len__(self) -> int:
+        return len(self.a)
+
+
+@system(
+    reads=(Renderable, WorldConfig),
+    writes=(Position, SpatialIndex, Contacts),
+)
+def collision_system(world, dt: float):
+    """Push overlapping boxes (Position + Renderable size) apart.
+
+    Runs after movement_system. Each contact is split evenly along the axis
+    of least overlap, once per tick, so a crowd settles over a few ticks
+    instead of in one.
+    """
+    bodies = _gather(world)
+    if bodies is None:
+        world.set_resource(Contacts())
+        return
+    entities, x, y, width, height, scatter = bodies
+
+    cfg = world.get_resource(WorldConfig)
+    cell_size = float(max(width.max(), height.max()))
+    if cfg is not None:
+        cell_size = max(cell_size, float(cfg.tile_size))
+
+    i, j = contact_pairs(x, y, width, height, cell_size)
+    world.set_resource(Contacts(entities[i], entities[j]))
+    if len(i) == 0:
+        return
+
+    moved = resolve_overlaps(x, y, width, height, i, j)
+    if cfg is not None:
+        # same clamp as movement_system
+        np.clip(x, 0, None, out=x)
+        np.clip(y, 0, None, out=y)
+        np.minimum(x, cfg.width - width, out=x)
+        np.minimum(y, cfg.height - height, out=y)
+
+    scatter(x, y, moved)
+
+    index = world.get_resource(SpatialIndex)
+    if index is not None:
+        index.move_many(entities[moved], x[moved], y[moved])
+    changes = world.changes(Position)
+    if changes is not None:
+        changes.mark_many(entities[moved].tolist())
+
+
+def contact_pairs(
+    x: np.ndarray,
+    y: np.ndarray,
+    width: np.ndarray,
+    height: np.ndarray,
+    cell_size: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Indices (i, j) of every pair of overlapping boxes, each pair once.
+
+    Broadphase: boxes are binned by their top left corner in a grid of
+    cell_size (at least the largest box), so two boxes can only overlap if
+    their cells are neighbours. Candidates are cut out of the cell sorted
+    order with searchsorted, then tested all at once (narrowphase).
+    """
+    count = len(x)
+    if count < 2:
+        empty = np.empty(0, np.int64)
+        return empty, empty
+
+    cx = np.floor(x / cell_size).astype(np.int64)
+    cy = np.floor(y / cell_size).astype(np.int64)
+    cx -= cx.min()
+    cy -= cy.min() - 1
+    # a spare row on both sides so neighbour keys never wrap into the
+    # next column
+    rows = int(cy.max()) + 2
+    keys = cx * rows + cy
+
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    rank = np.empty(count, np.int64)
+    rank[order] = np.arange(count)
+
+    first = [np.empty(0, np.int64)]
+    second = [np.empty(0, np.int64)]
+
+    # same cell: only the boxes after this one in sorted order
+    ends = np.searchsorted(sorted_keys, keys, side="right")
+    _expand(rank + 1, ends, order, first, second)
+
+    for dx, dy in _NEIGHBOUR_OFFSETS:
+        neighbour = keys + (dx * rows + dy)
+        starts = np.searchsorted(sorted_keys, neighbour, side="left")
+        ends = np.searchsorted(sorted_keys, neighbour, side="right")
+        _expand(starts, ends, order, first, second)
+
+    i = np.concatenate(first)
+    j = np.concatenate(second)
+
+    # narrowphase, strict so touching edges are not a contact
+    hit = (
+        (np.minimum(x[i] + width[i], x[j] + width[j]) > np.maximum(x[i], x[j]))
+        & (np.minimum(y[i] + height[i], y[j] + height[j]) > np.maximum(y[i], y[j]))
+    )
+    return i[hit], j[hit]
+
+
+def resolve_overlaps(
+    x: np.ndarray,
+    y: np.ndarray,
+    width: np.ndarray,
+    height: np.ndarray,
+    i: np.ndarray,
+    j: np.ndarray,
+) -> np.ndarray:
+    """Move the boxes of contacts (i, j) apart in place, half each.
+
+    Returns the indices of boxes that moved.
+    """
+    count = len(x)
+    # centre distance and overlap on both axes
+    dx = (x[j] + width[j] * 0.5) - (x[i] + width[i] * 0.5)
+    dy = (y[j] + height[j] * 0.5) - (y[i] + height[i] * 0.5)
+    overlap_x = (width[i] + width[j]) * 0.5 - np.abs(dx)
+    overlap_y = (height[i] + height[j]) * 0.5 - np.abs(dy)
+
+    along_x = overlap_x <= overlap_y
+    # boxes on the same centre: j goes right/down
+    push = np.where(along_x, overlap_x, overlap_y) * 0.5
+    push *= np.where(np.where(along_x, dx, dy) < 0, -1.0, 1.0)
+
+    push_x = np.where(along_x, push, 0.0)
+    push_y = np.where(along_x, 0.0, push)
+    x += np.bincount(j, push_x, count) - np.bincount(i, push_x, count)
+    y += np.bincount(j, push_y, count) - np.bincount(i, push_y, count)
+
+    return np.unique(np.concatenate((i, j)))
+
+
+def _expand(starts, ends, order, first, second) -> None:
+    """Append (box, order[k]) for every k in starts[box]:ends[box]"""
+    counts = np.maximum(ends - starts, 0)
+    total = int(counts.sum())
+    if total == 0:
+        return
+    boxes = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    first.append(boxes)
+    second.append(order[starts[boxes] + offsets])
+
+
+def _gather(world):
+    """(entities, x, y, width, height, scatter) of all boxes, None if none.
+
+    scatter(x, y, moved) writes the positions of the boxes in moved back.
+    """
+    if isinstance(world, ArchetypeWorld):
+        tables = list(world.archetypes(Position, Renderable))
+        if not tables:
+            return None
+
+        def column(comp_type, name):
+            return np.concatenate([table.column(comp_type, name) for table in tables])
+
+        def sizes(attr):
+            return np.concatenate(
+                [table.object_column(Renderable, attr) for table in tables]
+            )
+
+        entities = np.concatenate([table.entity_array() for table in tables])
+
+        def scatter(x, y, _moved):
+            start = 0
+            for table in tables:
+                end = start + len(table)
+                table.column(Position, "x")[:] = x[start:end]
+                table.column(Position, "y")[:] = y[start:end]
+                start = end
+
+        return (
+            entities,
+            column(Position, "x"),
+            column(Position, "y"),
+            sizes("width"),
+            sizes("height"),
+            scatter,
+        )
+
+    # dict backed world: gather into arrays, scatter back only what moved
+    rows = list(world.get_components(Position, Renderable))
+    count = len(rows)
+    if count == 0:
+        return None
+
+    def scatter(x, y, moved):
+        for k, px, py in zip(moved.tolist(), x[moved].tolist(), y[moved].tolist()):
+            position = rows[k][1]
+            position.x = px
+            position.y = py
+
+    return (
+        np.fromiter((row[0] for row in rows), np.int64, count),
+        np.fromiter((row[1].x for row in rows), np.float64, count),
+        np.fromiter((row[1].y for row in rows), np.float64, count),
+        np.fromiter((row[2].width for row in rows), np.float64, count),
+        np.fromiter((row[2].height for row in rows), np.float64, count),
+        scatter,
+    )
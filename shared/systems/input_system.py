@@ -2,8 +2,10 @@
 import pygame
 
 from ..ecs import Input, PlayerControlled, Player
+from ..scheduler import system
 
 
+@system(reads=(PlayerControlled, Player), writes=(Input,))
 def input_system(world):
     """Leser keyboard og skriver til input komponenten fra PlayerControlled entites"""
 
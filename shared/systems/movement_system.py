@@ -1,16 +1,42 @@
 # src/systems/movement_system.@property
 
+import numpy as np
+
 from ..ecs import Position, Velocity, Input, Renderable, WorldConfig
+from ..archetype import ArchetypeWorld
+from ..scheduler import system
+from ..spatial import SpatialIndex
+
+SPEED = 200.0
+
+
+@system(
+    reads=(Input, Renderable, WorldConfig),
+    writes=(Position, Velocity, SpatialIndex),
+)
+def movement_system(world, dt: float, batched: bool = False):
+    index = world.get_resource(SpatialIndex)
+    # entities that moved are marked here when the world tracks Position
+    changes = world.changes(Position)
 
+    if batched:
+        _batched_movement(world, dt, index, changes)
+    else:
+        _scalar_movement(world, dt, index, changes)
 
-def movement_system(world, dt: float):
-    speed = 200.0
+    # pick up entities spawned or destroyed since last tick
+    if index is not None:
+        index.sync(world)
+
+
+def _scalar_movement(world, dt: float, index, changes):
+    speed = SPEED
 
     cfg = world.get_resource(WorldConfig)
     world_width = cfg.width if cfg is not None else None
     world_height = cfg.height if cfg is not None else None
 
-    for _entity_id, position, velocity, input_component, render in world.get_components(
+    for entity_id, position, velocity, input_component, render in world.get_components(
         Position, Velocity, Input, Renderable
     ):
         # 1. apply input -> velocity
@@ -34,3 +60,111 @@ def movement_system(world, dt: float):
                 position.x = world_width - render.width
             if position.y + render.height > world_height:
                 position.y = world_height - render.height
+
+        # 4. keep the spatial index and change set in step with entities
+        # that moved
+        if velocity.vx != 0 or velocity.vy != 0:
+            if index is not None:
+                index.move(entity_id, position.x, position.y)
+            if changes is not None:
+                changes.mark(entity_id)
+
+
+def _batched_movement(world, dt: float, index, changes):
+    """Same steps as _scalar_movement as array math.
+
+    Only worth it on ArchetypeWorld, where the columns are the storage. The
+    dict backed World gathers and scatters every entity in python, which
+    costs about what the scalar loop does, so the server only runs batched
+    with USE_ARCHETYPE_WORLD.
+    """
+    cfg = world.get_resource(WorldConfig)
+    bounds = (cfg.width, cfg.height) if cfg is not None else None
+
+    if isinstance(world, ArchetypeWorld):
+        # columns are views into the tables, so everything is updated in place
+        for table in world.archetypes(Position, Velocity, Input, Renderable):
+            x = table.column(Position, "x")
+            y = table.column(Position, "y")
+            vx = table.column(Velocity, "vx")
+            vy = table.column(Velocity, "vy")
+            _integrate(
+                x,
+                y,
+                vx,
+                vy,
+                table.column(Input, "move_x"),
+                table.column(Input, "move_y"),
+                table.object_column(Renderable, "width"),
+                table.object_column(Renderable, "height"),
+                dt,
+                bounds,
+            )
+            _record_moved(index, changes, table.entity_array(), x, y, vx, vy)
+        return
+
+    # dict backed world: gather into arrays, run the same math, scatter back
+    rows = list(world.get_components(Position, Velocity, Input, Renderable))
+    count = len(rows)
+    if count == 0:
+        return
+
+    x = np.fromiter((row[1].x for row in rows), np.float64, count)
+    y = np.fromiter((row[1].y for row in rows), np.float64, count)
+    vx = np.empty(count)
+    vy = np.empty(count)
+    move_x = np.fromiter((row[3].move_x for row in rows), np.float64, count)
+    move_y = np.fromiter((row[3].move_y for row in rows), np.float64, count)
+    width = np.fromiter((row[4].width for row in rows), np.float64, count)
+    height = np.fromiter((row[4].height for row in rows), np.float64, count)
+
+    _integrate(x, y, vx, vy, move_x, move_y, width, height, dt, bounds)
+
+    for (_entity_id, position, velocity, _input, _render), px, py, pvx, pvy in zip(
+        rows, x.tolist(), y.tolist(), vx.tolist(), vy.tolist()
+    ):
+        position.x = px
+        position.y = py
+        velocity.vx = pvx
+        velocity.vy = pvy
+
+    entities = np.fromiter((row[0] for row in rows), np.int64, count)
+    _record_moved(index, changes, entities, x, y, vx, vy)
+
+
+def _record_moved(index, changes, entities, x, y, vx, vy):
+    if index is None and changes is None:
+        return
+    # only entities with a velocity can have moved
+    moving = (vx != 0) | (vy != 0)
+    if not moving.any():
+        return
+    entities = entities[moving]
+    if changes is not None:
+        changes.mark_many(entities.tolist())
+    if index is not None:
+        index.move_many(entities, x[moving], y[moving])
+
+
+def _integrate(x, y, vx, vy, move_x, move_y, width, height, dt, bounds):
+    # same steps and float64 operations as the scalar loop, so results match exactly
+
+    # 1. apply input -> velocity
+    np.multiply(move_x, SPEED, out=vx)
+    np.multiply(move_y, SPEED, out=vy)
+
+    # 2. integrate position
+    x += vx * dt
+    y += vy * dt
+
+    # 3. Clamp to world bounds
+    if bounds is not None:
+        world_width, world_height = bounds
+
+        x[x < 0] = 0
+        y[y < 0] = 0
+
+        over = x + width > world_width
+        x[over] = world_width - width[over]
+        over = y + height > world_height
+        y[over] = world_height - height[over]
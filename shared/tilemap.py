@@ -0,0 +1,155 @@
+# shared/tilemap.py
+import math
+import zlib
+from typing import Optional
+
+import numpy as np
+
+# tiles along one side of a chunk, 512 px chunks at the default tile size
+CHUNK_TILES = 16
+
+# tile ids, one byte per tile
+TILE_GRASS = 0
+TILE_DIRT = 1
+TILE_SAND = 2
+TILE_WATER = 3
+TILE_STONE = 4
+
+ChunkKey = tuple[int, int]
+
+
+class TileMap:
+    """Tile ids of the world, in square uint8 chunks of chunk_tiles tiles.
+
+    Stored as a world resource on the server and the client. A chunk is only
+    in memory once something asked for it: the server generates it from
+    seed on first use, the client (seed=None) holds what the server streamed
+    to it. Generated chunks can be dropped and generated again later.
+    """
+
+    def __init__(
+        self,
+        width: float,
+        height: float,
+        tile_size: int = 32,
+        chunk_tiles: int = CHUNK_TILES,
+        seed: Optional[int] = 0,
+    ) -> None:
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.chunk_tiles = chunk_tiles
+        self.seed = seed
+        self._chunks: dict[ChunkKey, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def __contains__(self, key: ChunkKey) -> bool:
+        return key in self._chunks
+
+    @property
+    def chunk_pixels(self) -> int:
+        return self.chunk_tiles * self.tile_size
+
+    @property
+    def chunks_x(self) -> int:
+        return math.ceil(self.width / self.chunk_pixels)
+
+    @property
+    def chunks_y(self) -> int:
+        return math.ceil(self.height / self.chunk_pixels)
+
+    def in_bounds(self, cx: int, cy: int) -> bool:
+        return 0 <= cx < self.chunks_x and 0 <= cy < self.chunks_y
+
+    def chunk_of(self, x: float, y: float) -> ChunkKey:
+        size = self.chunk_pixels
+        return (math.floor(x / size), math.floor(y / size))
+
+    def chunks_in_rect(
+        self, left: float, top: float, width: float, height: float
+    ) -> list[ChunkKey]:
+        """Chunks of the map that overlap the rect, row by row"""
+        first_x, first_y = self.chunk_of(left, top)
+        last_x, last_y = self.chunk_of(left + width, top + height)
+        return [
+            (cx, cy)
+            for cy in range(max(0, first_y), min(self.chunks_y - 1, last_y) + 1)
+            for cx in range(max(0, first_x), min(self.chunks_x - 1, last_x) + 1)
+        ]
+
+    def get_chunk(self, cx: int, cy: int) -> Optional[np.ndarray]:
+        """Tiles of a loaded chunk ([row][column]), None if not in memory"""
+        return self._chunks.get((cx, cy))
+
+    def chunk(self, cx: int, cy: int) -> Optional[np.ndarray]:
+        """Tiles of a chunk, generated on first use when the map has a seed"""
+        key = (cx, cy)
+        tiles = self._chunks.get(key)
+        if tiles is None and self.seed is not None and self.in_bounds(cx, cy):
+            tiles = generate_chunk(self.seed, cx, cy, self.chunk_tiles)
+            self._chunks[key] = tiles
+        return tiles
+
+    def set_chunk(self, cx: int, cy: int, tiles: np.ndarray) -> None:
+        """Store a chunk received from elsewhere"""
+        self._chunks[(cx, cy)] = tiles
+
+    def drop_chunk(self, cx: int, cy: int) -> None:
+        self._chunks.pop((cx, cy), None)
+
+    def evict(self, keep: set[ChunkKey]) -> int:
+        """Drop loaded chunks outside keep that can be generated again,
+        returns how many went"""
+        if self.seed is None:
+            return 0
+        gone = [key for key in self._chunks if key not in keep]
+        for key in gone:
+            del self._chunks[key]
+        return len(gone)
+
+
+def generate_chunk(seed: int, cx: int, cy: int, chunk_tiles: int) -> np.ndarray:
+    """Tiles of chunk (cx, cy), the same for a seed whenever it is made.
+
+    Smooth waves over world tile coordinates, so terrain runs on across
+    chunk borders without the neighbours being loaded.
+    """
+    tiles_x = np.arange(chunk_tiles) + cx * chunk_tiles
+    tiles_y = np.arange(chunk_tiles)[:, None] + cy * chunk_tiles
+    phase = (seed % 1000) * 0.37
+    height = (
+        np.sin(tiles_x * 0.11 + phase)
+        + np.sin(tiles_y * 0.13 - phase * 1.7)
+        + 0.6 * np.sin((tiles_x + tiles_y) * 0.05 + phase * 0.3)
+        + 0.4 * np.sin((tiles_x - 2 * tiles_y) * 0.29)
+    )
+
+    tiles = np.full((chunk_tiles, chunk_tiles), TILE_GRASS, np.uint8)
+    tiles[height < -1.3] = TILE_WATER
+    tiles[(height >= -1.3) & (height < -0.9)] = TILE_SAND
+    tiles[(height > 0.9) & (height <= 1.7)] = TILE_DIRT
+    tiles[height > 1.7] = TILE_STONE
+    return tiles
+
+
+def pack_tiles(tiles: np.ndarray) -> bytes:
+    """Compressed bytes of a chunk for the wire"""
+    return zlib.compress(tiles.tobytes())
+
+
+def unpack_tiles(data: bytes, chunk_tiles: int) -> np.ndarray:
+    tiles = np.frombuffer(zlib.decompress(data), np.uint8)
+    return tiles.reshape(chunk_tiles, chunk_tiles).copy()
+
+
+def chunk_message(cx: int, cy: int, chunk_tiles: int, packed: bytes) -> dict:
+    """"chunk" message carrying pack_tiles() bytes"""
+    return {"type": "chunk", "cx": cx, "cy": cy, "size": chunk_tiles, "tiles": packed}
+
+
+def chunk_from_message(msg: dict) -> tuple[int, int, np.ndarray]:
+    """(cx, cy, tiles) of a "chunk" message"""
+    tiles = unpack_tiles(msg["tiles"], int(msg["size"]))
+    return int(msg["cx"]), int(msg["cy"]), tiles
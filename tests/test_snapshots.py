@@ -0,0 +1,133 @@
+# tests/test_snapshots.py
+from client.snapshots import SnapshotRing
+from server.server_main import send_deltas
+from server.snapshots import SnapshotHistory, make_delta
+from shared.framing import FrameReader
+from shared.protocol import JSON_CODEC
+
+
+def state(x: float, y: float = 0.0):
+    return (x, y, 100, 100)
+
+
+def send(history: SnapshotHistory, acked: int, states: dict) -> dict:
+    """The delta send_deltas builds for a client that acked acked"""
+    seq = history.record(states)
+    baseline = history.get(acked)
+    base = acked if baseline is not None else -1
+    return make_delta(seq, base, baseline, states)
+
+
+def positions(players: dict) -> dict:
+    return {pid: (p["x"], p["y"]) for pid, p in players.items()}
+
+
+def test_full_snapshot_then_delta():
+    history = SnapshotHistory()
+    ring = SnapshotRing()
+
+    players = ring.apply(send(history, 0, {1: state(0.0), 2: state(5.0)}))
+    assert positions(players) == {1: (0.0, 0.0), 2: (5.0, 0.0)}
+
+    players = ring.apply(send(history, ring.seq, {1: state(1.0)}))
+    assert positions(players) == {1: (1.0, 0.0)}
+
+
+def test_two_deltas_in_one_frame():
+    history = SnapshotHistory()
+    ring = SnapshotRing()
+    ring.apply(send(history, 0, {1: state(0.0)}))
+    acked = ring.seq
+
+    # both built against the acked snapshot, applied before the next ack:
+    # player 2 spawns and player 1 moves, then both are undone
+    first = send(history, acked, {1: state(3.3), 2: state(50.0)})
+    second = send(history, acked, {1: state(0.0)})
+    ring.apply(first)
+    players = ring.apply(second)
+    assert positions(players) == {1: (0.0, 0.0)}
+
+    # only the newest gets acked, the next delta is empty and still right
+    following = send(history, ring.seq, {1: state(0.0)})
+    assert following["spawn"] == following["update"] == following["despawn"] == []
+    assert positions(ring.apply(following)) == {1: (0.0, 0.0)}
+
+
+def test_old_seq_and_unknown_base_are_ignored():
+    history = SnapshotHistory()
+    ring = SnapshotRing()
+    first = send(history, 0, {1: state(0.0)})
+    ring.apply(first)
+
+    assert ring.apply(first) is None
+    orphan = make_delta(history.seq + 5, history.seq + 4, {}, {1: state(2.0)})
+    assert ring.apply(orphan) is None
+    assert ring.seq == first["seq"]
+
+
+def test_ring_keeps_size_snapshots():
+    history = SnapshotHistory()
+    ring = SnapshotRing(size=4)
+    acked = 0
+    for step in range(10):
+        ring.apply(send(history, acked, {1: state(float(step))}))
+        acked = ring.seq
+
+    assert len(ring) == 4
+    players = ring.apply(send(history, acked, {1: state(99.0)}))
+    assert positions(players) == {1: (99.0, 0.0)}
+
+
+class RecordingNet:
+    """Stands in for ServerNet, keeps what was sent to each client"""
+
+    def __init__(self) -> None:
+        self.sent: list[bytes] = []
+
+    def send(self, client: dict, data: bytes, reliable: bool = True) -> bool:
+        self.sent.append(data)
+        return True
+
+
+def aoi_client() -> dict:
+    """The keys send_deltas uses of a client dict"""
+    return {
+        "player_id": 1,
+        "codec": JSON_CODEC,
+        "acked": 0,
+        "views": {},
+        "input_seq": None,
+    }
+
+
+def test_player_entering_and_leaving_view_between_acks():
+    history = SnapshotHistory()
+    net = RecordingNet()
+    client = aoi_client()
+    ring = SnapshotRing()
+    reader = FrameReader()
+
+    def tick(states: dict, visible: set) -> None:
+        send_deltas(net, [client], history, states, {1: frozenset(visible)})
+
+    def receive() -> dict:
+        for data in net.sent:
+            reader.feed(data)
+        net.sent.clear()
+        players = None
+        while (msg := reader.next_message(JSON_CODEC)) is not None:
+            players = ring.apply(msg)
+        client["acked"] = ring.seq
+        return players
+
+    everyone = {1: state(0.0), 2: state(900.0)}
+    tick(everyone, {1})
+    assert positions(receive()) == {1: (0.0, 0.0)}
+
+    # player 2 walks into the view and out again before the next ack
+    tick({1: state(0.0), 2: state(100.0)}, {1, 2})
+    tick({1: state(0.0), 2: state(900.0)}, {1})
+    assert positions(receive()) == {1: (0.0, 0.0)}
+
+    tick(everyone, {1})
+    assert positions(receive()) == {1: (0.0, 0.0)}